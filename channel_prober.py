@@ -0,0 +1,183 @@
+import os
+import time
+import json
+import asyncio
+import logging
+import aiohttp
+from typing import Dict, List, Optional
+from config import PROBE_RESULTS_FILE, PROBE_HTTP_CONCURRENCY, PROBE_INTERVAL, PROBE_RETRY_INTERVAL
+from m3u_manager import m3u_manager
+from recorders.recorder_utils import STREAM_HEADERS, estimate_stream_bitrate
+from recorders.hls_fetcher import parse_master_playlist
+
+logger = logging.getLogger(__name__)
+
+MAX_PLAYLIST_BYTES = 1024 * 1024
+
+
+class ChannelProber:
+    """
+    Background health check of every channel in every playlist.
+
+    Each round probes the channels that are due, with at most
+    PROBE_HTTP_CONCURRENCY requests in flight over one shared aiohttp session.
+    A probe records whether the stream answers, its time to first byte, the
+    variants a master playlist advertises and a bitrate measured from the last
+    media segment. Healthy channels are re-checked every PROBE_INTERVAL seconds.
+    Failing ones are re-checked every PROBE_RETRY_INTERVAL, so a mirror that
+    comes back is noticed quickly. Results are keyed by stream URL and saved to
+    PROBE_RESULTS_FILE.
+    """
+
+    tick = 60  # Seconds between looks for due channels
+
+    def __init__(self, path: str = PROBE_RESULTS_FILE):
+        self.path = path
+        self.results: Dict[str, dict] = {}  # stream url -> last probe
+        self._slots = asyncio.Semaphore(PROBE_HTTP_CONCURRENCY)
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                self.results = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Ignoring unreadable probe results {self.path}: {e}")
+
+    def save(self):
+        # Only channels still in a playlist are kept
+        urls = self._channel_urls()
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({url: result for url, result in self.results.items() if url in urls}, f)
+        os.replace(temp_path, self.path)
+
+    def start(self):
+        if PROBE_INTERVAL > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                due = self.due_urls(time.time())
+                if due:
+                    started = time.time()
+                    await self.probe_urls(due)
+                    self.save()
+                    up = sum(1 for url in due if self.results.get(url, {}).get('up'))
+                    logger.info(f"Probed {len(due)} channel(s) in {time.time() - started:.0f}s, {up} up")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A bad round must not stop probing for the rest of the process
+                logger.exception(f"Probe round failed: {e}")
+            await asyncio.sleep(self.tick)
+
+    @staticmethod
+    def _channel_urls() -> set:
+        return {
+            info['url'] for channel_id, info in m3u_manager.channels.items()
+            if isinstance(channel_id, str) and ':' in channel_id
+        }
+
+    def due_urls(self, now: float) -> List[str]:
+        due = []
+        for url in self._channel_urls():
+            result = self.results.get(url)
+            interval = PROBE_INTERVAL if result and result['up'] else PROBE_RETRY_INTERVAL
+            if result is None or now - result['checked_at'] >= interval:
+                due.append(url)
+        return due
+
+    async def probe_urls(self, urls: List[str]):
+        timeout = aiohttp.ClientTimeout(total=20, sock_connect=5)
+        connector = aiohttp.TCPConnector(limit=PROBE_HTTP_CONCURRENCY, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(headers=STREAM_HEADERS, timeout=timeout, connector=connector) as session:
+            await asyncio.gather(*(self._probe(session, url) for url in urls))
+
+    async def _probe(self, session: aiohttp.ClientSession, url: str):
+        previous = self.results.get(url, {})
+        result = {
+            'up': False,
+            'ttfb': None,
+            'variants': [],
+            'bitrate': None,
+            'error': None,
+            'checked_at': time.time(),
+            'failures': previous.get('failures', 0),
+        }
+        async with self._slots:
+            try:
+                started = time.monotonic()
+                async with session.get(url, allow_redirects=True) as response:
+                    response.raise_for_status()
+                    first = await response.content.readany()
+                    result['ttfb'] = round(time.monotonic() - started, 3)
+                    base_url = str(response.url)
+                    # A raw transport stream never ends; only playlists are read whole
+                    playlist = ""
+                    if first.lstrip().startswith(b"#EXTM3U"):
+                        body = bytearray(first)
+                        while len(body) < MAX_PLAYLIST_BYTES:
+                            chunk = await response.content.readany()
+                            if not chunk:
+                                break
+                            body += chunk
+                        playlist = body.decode(errors="replace")
+                if not first:
+                    raise RuntimeError("empty response")
+
+                result['up'] = True
+                if playlist:
+                    variants = sorted(parse_master_playlist(playlist, base_url),
+                                      key=lambda v: v['bandwidth'], reverse=True)
+                    result['variants'] = [
+                        {'bandwidth': v['bandwidth'], 'resolution': v['resolution'] or None} for v in variants
+                    ]
+                    if variants:
+                        measured = await estimate_stream_bitrate(variants[0]['url'], session)
+                        result['bitrate'] = measured or variants[0]['bandwidth'] or None
+                    else:
+                        result['bitrate'] = await estimate_stream_bitrate(base_url, session)
+            except Exception as e:
+                result['up'] = False
+                result['error'] = str(e)[:100] or type(e).__name__
+        result['failures'] = 0 if result['up'] else result['failures'] + 1
+        self.results[url] = result
+
+    def result(self, url: str) -> Optional[dict]:
+        return self.results.get(url)
+
+    def is_down(self, url: str) -> bool:
+        result = self.results.get(url)
+        return bool(result) and not result['up']
+
+    def bitrate(self, url: str) -> Optional[int]:
+        result = self.results.get(url)
+        return result['bitrate'] if result and result['up'] else None
+
+    def health_key(self, url: str) -> tuple:
+        """Sort key: live and fast first, then unchecked, then down"""
+        result = self.results.get(url)
+        if result is None:
+            return (1, 0.0)
+        if not result['up']:
+            return (2, result['failures'])
+        return (0, result['ttfb'] or 0.0)
+
+    def rank(self, channels: List[dict]) -> List[dict]:
+        return sorted(channels, key=lambda info: self.health_key(info['url']))
+
+    def badge(self, url: str) -> str:
+        """Short health marker for channel lists"""
+        result = self.results.get(url)
+        if result is None:
+            return "❔"
+        if not result['up']:
+            return "🔴"
+        return f"🟢 {result['ttfb']:.1f}s" if result['ttfb'] is not None else "🟢"
+
+
+channel_prober = ChannelProber()
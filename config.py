@@ -9,10 +9,36 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN is not set in the environment variables.")
 
+# One Bot instance is shared by the whole process; its HTTP pool is sized for many
+# concurrent caption edits and keeps connections open between them
+BOT_POOL_SIZE = int(os.getenv("BOT_POOL_SIZE", 32))
+BOT_KEEPALIVE_SECONDS = float(os.getenv("BOT_KEEPALIVE_SECONDS", 60))
+# Progress dashboards: at least this many seconds between edits of one chat's message,
+# and at most this many edits per second across all chats
+PROGRESS_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", 3))
+PROGRESS_EDITS_PER_SECOND = float(os.getenv("PROGRESS_EDITS_PER_SECOND", 5))
+
 API_ID = os.getenv("API_ID")
 API_HASH = os.getenv("API_HASH")
 SESSION_STRING = os.getenv("SESSION_STRING")
+# Several uploader sessions (comma-separated session strings) share the upload load
+raw_session_strings = os.getenv("SESSION_STRINGS", "")
+SESSION_STRINGS = [s.strip() for s in raw_session_strings.split(',') if s.strip()]
+UPLOADS_PER_SESSION = int(os.getenv("UPLOADS_PER_SESSION", 2))  # Concurrent uploads on one session
+# Acknowledged upload parts are recorded here, so retries and restarts resume instead of starting over
+UPLOAD_STATE_DIR = os.getenv("UPLOAD_STATE_DIR", "upload_state")
+UPLOAD_STATE_TTL = int(os.getenv("UPLOAD_STATE_TTL", 12 * 3600))  # Telegram drops unfinished parts after a while
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", 3))  # Resumes after a dropped connection before giving up
+UPLOAD_PARTS_IN_FLIGHT = int(os.getenv("UPLOAD_PARTS_IN_FLIGHT", 4))  # Parts of one big file sent at once
+# Telethon: big files go up as parts over several connections at once (1 = plain upload_file)
+PARALLEL_UPLOAD_CONNECTIONS = int(os.getenv("PARALLEL_UPLOAD_CONNECTIONS", 4))
+PARALLEL_UPLOAD_MAX_IN_FLIGHT = int(os.getenv("PARALLEL_UPLOAD_MAX_IN_FLIGHT", 16))  # Parts on the wire at once
+PARALLEL_UPLOAD_PART_RETRIES = int(os.getenv("PARALLEL_UPLOAD_PART_RETRIES", 5))
 SESSION_NAME = os.getenv("SESSION_NAME", "session_iptv")
+TELETHON_SESSION_STRING = os.getenv("TELETHON_SESSION_STRING")
+# Uploader clients stay connected; they are pinged this often and reconnected if they don't answer
+UPLOADER_HEALTH_INTERVAL = int(os.getenv("UPLOADER_HEALTH_INTERVAL", 120))
+UPLOADER_WARMUP_SECONDS = int(os.getenv("UPLOADER_WARMUP_SECONDS", 60))  # Connect this long before a recording ends
 
 # --- Admin and Channel Configuration ---
 raw_admin_id = os.getenv("ADMIN_ID")
@@ -29,6 +55,45 @@ STORE_CHANNEL_ID = int(os.getenv("STORE_CHANNEL_ID", 0))
 # --- Recording and Uploading ---
 RECORDINGS_DIR = os.getenv("RECORDINGS_DIR", "recordings")
 MAX_PART_SIZE = 2 * 1024 * 1024 * 1024  # 2 GB
+# Streaming mode: ffmpeg writes rolling parts that are uploaded while recording continues
+STREAMING_UPLOAD = os.getenv("STREAMING_UPLOAD", "false").lower() in ("1", "true", "yes")
+SEGMENT_SECONDS = int(os.getenv("SEGMENT_SECONDS", 600))  # Length of each part in streaming mode
+# Output container: "mkv", or "mp4" for fragmented MP4 that Telegram clients can play while downloading
+RECORDING_FORMAT = os.getenv("RECORDING_FORMAT", "mkv").lower()
+# Ingest engine: "ffmpeg" lets ffmpeg fetch the stream itself, "hls" downloads HLS
+# segments concurrently in Python and pipes them into ffmpeg (other streams use ffmpeg)
+INGEST_ENGINE = os.getenv("INGEST_ENGINE", "ffmpeg").lower()
+HLS_FETCH_CONCURRENCY = int(os.getenv("HLS_FETCH_CONCURRENCY", 4))
+HLS_SEGMENT_RETRIES = int(os.getenv("HLS_SEGMENT_RETRIES", 3))
+# Pending scheduled recordings are journaled here and restored on start-up
+SCHEDULE_JOURNAL = os.getenv("SCHEDULE_JOURNAL", "scheduled_jobs.jsonl")
+# Scheduled recordings resolve the stream and connect the uploader this many seconds early
+PREWARM_SECONDS = int(os.getenv("PREWARM_SECONDS", 30))
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", 4))  # ffprobe runs at once
+# Supervisor: restart a dead or stalled ingest for the remaining time
+STALL_TIMEOUT = int(os.getenv("STALL_TIMEOUT", 30))  # Seconds without the media time moving on before restarting
+MAX_RECONNECTS = int(os.getenv("MAX_RECONNECTS", 10))
+# Timeshift: channels (names or ids) kept in an on-disk ring so /rec can start in the past
+raw_timeshift = os.getenv("TIMESHIFT_CHANNELS", "")
+TIMESHIFT_CHANNELS = [c.strip() for c in raw_timeshift.split(',') if c.strip()]
+TIMESHIFT_WINDOW = int(os.getenv("TIMESHIFT_WINDOW", 1800))  # Seconds kept per channel
+TIMESHIFT_SEGMENT_SECONDS = int(os.getenv("TIMESHIFT_SEGMENT_SECONDS", 10))
+# Parts are cut so that they stay below MAX_PART_SIZE; the bitrate is estimated per stream
+PART_SIZE_HEADROOM = float(os.getenv("PART_SIZE_HEADROOM", 0.9))  # Fraction of MAX_PART_SIZE to aim for
+DEFAULT_BITRATE = int(os.getenv("DEFAULT_BITRATE", 8_000_000))  # bits/s, used when a stream cannot be measured
+# Size-targeted transcode (/rec --fit): chunks of the recording are encoded in parallel
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", os.cpu_count() or 1))
+TRANSCODE_PRESET = os.getenv("TRANSCODE_PRESET", "veryfast")
+TRANSCODE_AUDIO_BITRATE = int(os.getenv("TRANSCODE_AUDIO_BITRATE", 128_000))
+TRANSCODE_CHUNK_SECONDS = int(os.getenv("TRANSCODE_CHUNK_SECONDS", 60))  # Shortest chunk handed to one worker
+
+# --- Recording Admission ---
+# Limits checked before an ingest starts; jobs over a limit wait in a queue
+MAX_CONCURRENT_RECORDINGS = int(os.getenv("MAX_CONCURRENT_RECORDINGS", 10))
+MAX_INGEST_BITRATE = int(os.getenv("MAX_INGEST_BITRATE", 0))  # Total bits/s across ingests, 0 = no limit
+MIN_FREE_DISK = int(os.getenv("MIN_FREE_DISK_MB", 1024)) * 1024 * 1024
+MAX_LOAD_PER_CPU = float(os.getenv("MAX_LOAD_PER_CPU", 1.5))  # 1-minute load average per core, 0 = ignore
+MAX_QUEUED_RECORDINGS = int(os.getenv("MAX_QUEUED_RECORDINGS", 20))
 
 # --- M3U Playlists ---
 # Load playlists from a comma-separated string in the environment variable
@@ -37,6 +102,19 @@ M3U_PLAYLISTS = [url.strip() for url in raw_playlists.split(',')] if raw_playlis
 if not M3U_PLAYLISTS:
     print("Warning: M3U_PLAYLISTS is not set. The bot may not have any channels to record.")
 
+# Channel prober: every playlist channel is checked in the background, results kept across restarts
+PROBE_RESULTS_FILE = os.getenv("PROBE_RESULTS_FILE", "channel_health.json")
+PROBE_HTTP_CONCURRENCY = int(os.getenv("PROBE_HTTP_CONCURRENCY", 20))
+PROBE_INTERVAL = int(os.getenv("PROBE_INTERVAL", 3600))  # Seconds between checks of a live channel, 0 = off
+PROBE_RETRY_INTERVAL = int(os.getenv("PROBE_RETRY_INTERVAL", 600))  # Seconds between checks of a failing one
+
+# --- EPG ---
+# XMLTV guides (plain or .gz), comma-separated; programmes are matched to channels by tvg-id
+raw_epg = os.getenv("EPG_URLS", "")
+EPG_URLS = [url.strip() for url in raw_epg.split(',') if url.strip()]
+EPG_DAYS = int(os.getenv("EPG_DAYS", 3))  # Days ahead to keep
+EPG_REFRESH_HOURS = float(os.getenv("EPG_REFRESH_HOURS", 12))
+
 # --- Verification ---
 VERIFICATION_BASE_URL = os.getenv("VERIFICATION_BASE_URL", "https://vplinks.com/api?api_key=YOUR_API_KEY&url=")
 BOT_NAME = os.getenv("BOT_NAME", "iptvrecording_bot")
@@ -0,0 +1,172 @@
+import sys
+import gzip
+import time
+import asyncio
+import logging
+import requests
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional
+from xml.etree.ElementTree import iterparse
+from config import EPG_URLS, EPG_DAYS, EPG_REFRESH_HOURS
+from m3u_manager import m3u_manager
+
+logger = logging.getLogger(__name__)
+
+
+def parse_xmltv_time(value: str) -> int:
+    """Unix time of an XMLTV timestamp like `20240101203000 +0530`"""
+    value = value.strip()
+    if len(value) > 14:
+        return int(datetime.strptime(value, "%Y%m%d%H%M%S %z").timestamp())
+    return int(datetime.strptime(value[:14], "%Y%m%d%H%M%S").timestamp())
+
+
+class ChannelGuide:
+    """Programmes of one channel as parallel arrays sorted by start time"""
+
+    __slots__ = ("starts", "stops", "titles")
+
+    def __init__(self):
+        self.starts = array("q")
+        self.stops = array("q")
+        self.titles: List[str] = []
+
+    def add(self, start: int, stop: int, title: str):
+        self.starts.append(start)
+        self.stops.append(stop)
+        self.titles.append(title)
+
+    def sort(self):
+        order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+        self.starts = array("q", (self.starts[i] for i in order))
+        self.stops = array("q", (self.stops[i] for i in order))
+        self.titles = [self.titles[i] for i in order]
+
+    def programme(self, i: int) -> dict:
+        return {'start': self.starts[i], 'stop': self.stops[i], 'title': self.titles[i]}
+
+    def at(self, when: float) -> Optional[dict]:
+        i = bisect_right(self.starts, when) - 1
+        if i >= 0 and self.stops[i] > when:
+            return self.programme(i)
+        return None
+
+    def upcoming(self, when: float, count: int = 5) -> List[dict]:
+        """The programme on at `when` (if any) and the ones after it"""
+        i = max(0, bisect_right(self.starts, when) - 1)
+        if i < len(self.stops) and self.stops[i] <= when:
+            i += 1
+        return [self.programme(j) for j in range(i, min(i + count, len(self.starts)))]
+
+    def find(self, query: str, after: float) -> Optional[dict]:
+        """Next programme from `after` whose title contains `query`"""
+        query = query.lower()
+        for i in range(max(0, bisect_right(self.starts, after) - 1), len(self.starts)):
+            if self.stops[i] > after and query in self.titles[i].lower():
+                return self.programme(i)
+        return None
+
+
+class EPGManager:
+    """
+    XMLTV guides indexed per channel.
+
+    Guides are streamed and parsed with iterparse; every element is cleared as
+    soon as it has been read, so the document never exists as a tree. Only
+    programmes of channels present in the m3u playlists (matched by tvg-id)
+    and inside the EPG_DAYS window are kept, as compact sorted arrays.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.urls = urls
+        self.guides: Dict[str, ChannelGuide] = {}  # lower-case tvg-id -> guide
+        self.loaded_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Load the guides in the background and refresh them every EPG_REFRESH_HOURS"""
+        if self.urls and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.to_thread(self.load)
+            await asyncio.sleep(EPG_REFRESH_HOURS * 3600)
+
+    def load(self):
+        """Fetch and index every guide (blocking; run it in a thread)"""
+        wanted = {
+            info['original_id'].lower()
+            for channel_id, info in m3u_manager.channels.items()
+            if isinstance(channel_id, str) and ':' in channel_id and info.get('original_id')
+        }
+        guides: Dict[str, ChannelGuide] = {}
+        for url in self.urls:
+            try:
+                count = self._load_url(url, wanted, guides)
+                logger.info(f"Loaded {count} programmes from EPG {url}")
+            except Exception as e:
+                logger.error(f"Error loading EPG {url}: {e}")
+
+        for guide in guides.values():
+            guide.sort()
+        self.guides = guides
+        self.loaded_at = time.time()
+
+    def _load_url(self, url: str, wanted: set, guides: Dict[str, ChannelGuide]) -> int:
+        now = time.time()
+        window_start, window_end = now - 86400, now + EPG_DAYS * 86400
+        count = 0
+
+        with requests.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            stream = response.raw
+            if url.endswith(".gz"):
+                stream = gzip.GzipFile(fileobj=stream)
+
+            root = None
+            for event, elem in iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    continue
+                if elem.tag == "programme":
+                    channel = m3u_manager.clean_channel_id(elem.get("channel", "")).lower()
+                    if channel in wanted:
+                        try:
+                            start = parse_xmltv_time(elem.get("start", ""))
+                            stop = parse_xmltv_time(elem.get("stop", ""))
+                        except ValueError:
+                            start = stop = 0
+                        if stop > window_start and start < window_end:
+                            # Titles repeat a lot (daily shows); keep one string per title
+                            title = sys.intern((elem.findtext("title") or "Untitled").strip())
+                            guides.setdefault(channel, ChannelGuide()).add(start, stop, title)
+                            count += 1
+                    elem.clear()
+                    # Finished programmes also hang off the root; drop them there too
+                    root.clear()
+                elif elem.tag == "channel":
+                    elem.clear()
+        return count
+
+    def guide(self, identifier: str) -> Optional[ChannelGuide]:
+        info = m3u_manager.get_channel_info(identifier)
+        if not info or not info.get('original_id'):
+            return None
+        return self.guides.get(info['original_id'].lower())
+
+    def whats_on(self, identifier: str, when: Optional[float] = None) -> Optional[dict]:
+        guide = self.guide(identifier)
+        return guide.at(when or time.time()) if guide else None
+
+    def find_programme(self, identifier: str, query: str, after: Optional[float] = None) -> Optional[dict]:
+        """Next (or current) programme on the channel whose title contains `query`"""
+        guide = self.guide(identifier)
+        return guide.find(query, after or time.time()) if guide else None
+
+
+epg_manager = EPGManager(EPG_URLS)
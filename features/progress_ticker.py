@@ -0,0 +1,186 @@
+import time
+import asyncio
+from typing import Callable, Dict, Optional
+from telegram.error import RetryAfter, BadRequest
+from config import PROGRESS_MIN_INTERVAL, PROGRESS_EDITS_PER_SECOND
+from utils.bot_client import get_bot
+
+SEPARATOR = "\n\n➖➖➖➖➖➖➖➖\n\n"
+MAX_MESSAGE_LENGTH = 4096
+FINISHED_LINGER = 60  # Seconds a finished job stays on a dashboard that still has running jobs
+
+
+class ProgressTicker:
+    """
+    One loop that keeps every progress message up to date.
+
+    Recordings and uploads register a job with a render callable (or a fixed
+    text). Jobs of the same chat share one dashboard message. Each tick renders
+    the dashboards and edits only those whose text actually changed. The edit
+    rate per chat slows down as more chats are active, so the bot stays under
+    PROGRESS_EDITS_PER_SECOND overall.
+    """
+
+    tick = 1.0
+
+    def __init__(self):
+        self.jobs: Dict[str, dict] = {}
+        self.chats: Dict[int, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, job_id: str, chat_id: int, render: Optional[Callable[[], str]] = None,
+            text: str = "", reply_to: Optional[int] = None):
+        """Show a job on its chat's dashboard, rendered by `render()` or as `text`"""
+        self.jobs[job_id] = {
+            'chat_id': chat_id,
+            'render': render,
+            'text': text,
+            'done_at': None,
+        }
+        chat = self.chats.setdefault(chat_id, {
+            'message_id': None,
+            'reply_to': reply_to,
+            'sent_text': None,
+            'next_edit': 0.0,
+            'failures': 0,
+        })
+        if chat['reply_to'] is None:
+            chat['reply_to'] = reply_to
+        self._ensure_running()
+
+    def set_render(self, job_id: str, render: Optional[Callable[[], str]]):
+        if job_id in self.jobs:
+            self.jobs[job_id]['render'] = render
+
+    def set_text(self, job_id: str, text: str):
+        """Replace the job's live rendering with a fixed text"""
+        if job_id in self.jobs:
+            self.jobs[job_id]['render'] = None
+            self.jobs[job_id]['text'] = text
+
+    def finish(self, job_id: str, text: Optional[str] = None):
+        """Show the job's final text and retire it from the dashboard"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return
+        if text is not None:
+            self.set_text(job_id, text)
+        elif job['render']:
+            # A failing render must not cost the job its final message
+            self.set_text(job_id, self._render_job(job))
+        job['done_at'] = time.time()
+        # Final states should not wait for the chat's regular slot
+        self.chats[job['chat_id']]['next_edit'] = 0.0
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    @staticmethod
+    def _render_job(job: dict) -> str:
+        try:
+            return job['render']() if job['render'] else job['text']
+        except Exception as e:
+            return f"⚠️ Progress unavailable: {e}"
+
+    def _render_chat(self, chat_id: int) -> str:
+        texts = []
+        for job in self.jobs.values():
+            if job['chat_id'] != chat_id:
+                continue
+            texts.append(self._render_job(job))
+
+        text = SEPARATOR.join(t for t in texts if t)
+        if len(text) > MAX_MESSAGE_LENGTH:
+            # Keep the newest jobs readable and count the rest
+            shown = []
+            for t in reversed(texts):
+                if len(SEPARATOR.join([t, *shown])) > MAX_MESSAGE_LENGTH - 64:
+                    break
+                shown.insert(0, t)
+            text = f"…and {len(texts) - len(shown)} more job(s){SEPARATOR}" + SEPARATOR.join(shown)
+        return text
+
+    def _interval(self) -> float:
+        return max(PROGRESS_MIN_INTERVAL, len(self.chats) / PROGRESS_EDITS_PER_SECOND)
+
+    async def _run(self):
+        while self.chats:
+            started = time.time()
+            budget = max(1, int(PROGRESS_EDITS_PER_SECOND * self.tick))
+
+            # Chats that have waited longest go first
+            for chat_id in sorted(self.chats, key=lambda c: self.chats[c]['next_edit']):
+                chat = self.chats[chat_id]
+                if budget <= 0 or chat['next_edit'] > started:
+                    continue
+                text = self._render_chat(chat_id)
+                if text and text != chat['sent_text']:
+                    budget -= 1
+                    await self._publish(chat_id, chat, text)
+                    # A flood wait from _publish may already push next_edit further out
+                    chat['next_edit'] = max(chat['next_edit'], time.time() + self._interval())
+
+            self._retire(started)
+            await asyncio.sleep(self.tick)
+
+    def _retire(self, now: float):
+        for chat_id in list(self.chats):
+            chat = self.chats[chat_id]
+            jobs = {job_id: job for job_id, job in self.jobs.items() if job['chat_id'] == chat_id}
+            all_done = all(job['done_at'] for job in jobs.values())
+
+            # Finished jobs hold fixed texts, so this is no second render of live ones
+            if all_done and chat['sent_text'] == self._render_chat(chat_id):
+                # Message keeps its final text; the next job gets a fresh dashboard
+                for job_id in jobs:
+                    del self.jobs[job_id]
+                del self.chats[chat_id]
+                continue
+
+            for job_id, job in jobs.items():
+                if job['done_at'] and now - job['done_at'] > FINISHED_LINGER and not all_done:
+                    del self.jobs[job_id]
+
+    async def _publish(self, chat_id: int, chat: dict, text: str):
+        bot = get_bot()
+        try:
+            if chat['message_id'] is None:
+                message = await bot.send_message(
+                    chat_id=chat_id,
+                    text=text,
+                    parse_mode="Markdown",
+                    reply_to_message_id=chat['reply_to'],
+                )
+                chat['message_id'] = message.message_id
+            else:
+                await bot.edit_message_text(
+                    text=text,
+                    chat_id=chat_id,
+                    message_id=chat['message_id'],
+                    parse_mode="Markdown",
+                )
+            chat['sent_text'] = text
+            chat['failures'] = 0
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            retry_after = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else retry_after
+            chat['next_edit'] = time.time() + float(retry_after)
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                chat['sent_text'] = text
+            elif "not found" in str(e).lower():
+                # Dashboard was deleted; post a new one next tick
+                chat['message_id'] = None
+            else:
+                print(f"[Progress] Edit failed for chat {chat_id}: {e}")
+                chat['sent_text'] = text
+        except Exception as e:
+            print(f"[Progress] Update failed for chat {chat_id}: {e}")
+            chat['failures'] += 1
+            if chat['failures'] >= 5:
+                # Stop retrying this text so finished dashboards can be retired
+                chat['sent_text'] = text
+
+
+progress_ticker = ProgressTicker()
@@ -3,6 +3,12 @@ from telegram.ext import ContextTypes
 from config import ADMIN_ID, ACTIVE_RECORDINGS
 import asyncio
 from datetime import datetime
+from recorders.admission import admission
+from utils.metrics import latency_summary, gauge
+
+def format_media_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show current active recordings"""
@@ -11,22 +17,63 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Only admin can use this command")
         return
     
+    load = admission.snapshot()
+    load_summary = (
+        f"🎛 Ingests: {load['active']}/{load['max_active']} | Queued: {load['queued']}\n"
+        f"📶 Bitrate: {load['bitrate'] / 1_000_000:.1f} Mbps"
+        + (f" / {load['max_bitrate'] / 1_000_000:.1f} Mbps" if load['max_bitrate'] else "") + "\n"
+        f"💽 Free disk: {load['free_disk'] / 1024 ** 3:.1f} GB"
+        f" ({load['reserved_disk'] / 1024 ** 3:.1f} GB reserved) | Load/CPU: {load['load_per_cpu']:.2f}\n"
+        f"📤 Uploads: {int(gauge('uploads_active'))} | {gauge('upload_bytes_per_second') / 1024 ** 2:.1f} MB/s\n\n"
+    )
+
     if not ACTIVE_RECORDINGS:
-        await update.message.reply_text("ℹ️ No active recordings currently")
+        await update.message.reply_text(load_summary + "ℹ️ No active recordings currently")
         return
     
-    message = "📊 Current Active Recordings:\n\n"
+    message = load_summary + "📊 Current Active Recordings:\n\n"
     for recording_id, recording in ACTIVE_RECORDINGS.items():
         message += (
             f"📌 Title: {recording['title']}\n"
             f"📺 Channel: {recording['channel']}\n"
             f"⏱ Duration: {recording['duration']}\n"
             f"🕒 Started: {recording['start_time']}\n"
-            f"👤 User: {recording['user_id']}\n\n"
+            f"👤 User: {recording['user_id']}\n"
         )
+        stats = recording.get('stats')
+        if stats:
+            message += (
+                f"▶️ Recorded: {format_media_time(stats.out_time)} of {format_media_time(recording['duration'])}"
+                f" (ETA {format_media_time(stats.eta(recording['duration']))})\n"
+                f"💾 Size: {stats.total_size / 1024 / 1024:.1f} MB\n"
+                f"📶 Bitrate: {stats.bitrate:.0f} kbps | ⚡ Speed: {stats.speed:.2f}x\n"
+            )
+            if stats.stalled_for > 30:
+                message += f"⚠️ No progress for {int(stats.stalled_for)}s\n"
+        message += "\n"
     
     await update.message.reply_text(message)
 
+async def latency_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show per-method Bot API latency counters"""
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_ID:
+        await update.message.reply_text("❌ Only admin can use this command")
+        return
+
+    stats = latency_summary()
+    if not stats:
+        await update.message.reply_text("ℹ️ No API calls recorded yet")
+        return
+
+    message = "⏱ API Latency (count | avg | max | errors):\n\n"
+    for name, entry in sorted(stats.items(), key=lambda item: -item[1]['count']):
+        message += (
+            f"{name}: {entry['count']} | {entry['avg'] * 1000:.0f}ms | "
+            f"{entry['max'] * 1000:.0f}ms | {entry['errors']}\n"
+        )
+    await update.message.reply_text(message)
+
 async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Broadcast message to all users with active recordings"""
     user_id = update.effective_user.id
@@ -70,12 +117,17 @@ def add_active_recording(details):
     from config import ACTIVE_RECORDINGS
     import time
     recording_id = str(int(time.time()))  # Simple ID based on timestamp
+    suffix = 1
+    while recording_id in ACTIVE_RECORDINGS:  # Several recordings can start in the same second
+        recording_id = f"{int(time.time())}-{suffix}"
+        suffix += 1
     ACTIVE_RECORDINGS[recording_id] = {
         'title': details['title'],
         'channel': details['channel'],
         'duration': details['duration'],
         'start_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        'user_id': details['user_id']
+        'user_id': details['user_id'],
+        'stats': details.get('stats')  # Live ffmpeg progress, if the recorder provides it
     }
     return recording_id
 
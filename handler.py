@@ -2,7 +2,8 @@ from telegram.ext import Application, CommandHandler, CallbackQueryHandler
 from handlers.start_handler import start
 from handlers.admin_handler import handle_admin_request
 from handlers.help_handler import send_help
-from handlers.schedule_handler import handle_schedule
+from handlers.schedule_handler import handle_schedule, list_scheduled, cancel_scheduled, handle_every, list_rules, remove_rule
+from handlers.epg_handler import handle_epg, handle_epg_record
 from handlers.record_handler import handle_instant_record
 from handlers.temp_admin_handler import add_temp_admin, remove_admin
 from features.messaging import get_message_handlers
@@ -11,7 +12,7 @@ from handlers.record_handler import handle_find_channel
 from handlers.record_handler import show_help
 from handlers.help_handler import cancel_recording_callback
 from telegram.ext import CommandHandler
-from features.status_broadcast import status_command, broadcast_command
+from features.status_broadcast import status_command, broadcast_command, latency_command
 
 
 def register_handlers(application: Application):
@@ -21,6 +22,13 @@ def register_handlers(application: Application):
     application.add_handler(CallbackQueryHandler(handle_admin_request, pattern="^request_admin$"))
     application.add_handler(CommandHandler(["h"], send_help))
     application.add_handler(CommandHandler(["schedule", "s"], handle_schedule))
+    application.add_handler(CommandHandler("jobs", list_scheduled))
+    application.add_handler(CommandHandler("cancel", cancel_scheduled))
+    application.add_handler(CommandHandler("every", handle_every))
+    application.add_handler(CommandHandler("rules", list_rules))
+    application.add_handler(CommandHandler("unrule", remove_rule))
+    application.add_handler(CommandHandler("epg", handle_epg))
+    application.add_handler(CommandHandler("epgrec", handle_epg_record))
     application.add_handler(CommandHandler(["rec", "r"], handle_instant_record))
     application.add_handler(CommandHandler(["addadmin", "add"], add_temp_admin))
     application.add_handler(CommandHandler(["removeadmin", "rem", "rm"], remove_admin))
@@ -38,6 +46,7 @@ def register_handlers(application: Application):
         )
     )
     application.add_handler(CommandHandler("status", status_command))
+    application.add_handler(CommandHandler("latency", latency_command))
     application.add_handler(CommandHandler("broadcast", broadcast_command))
     
     from features.verify import setup_verify_handlers
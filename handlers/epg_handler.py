@@ -0,0 +1,96 @@
+import time
+from datetime import datetime
+from pytz import timezone
+from telegram import Update
+from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
+from utils.admin_checker import is_temp_admin
+from scheduler import schedule_recording
+from config import ADMIN_ID
+from m3u_manager import m3u_manager
+from epg_manager import epg_manager
+
+
+def format_programme(programme: dict) -> str:
+    ist = timezone("Asia/Kolkata")
+    start = datetime.fromtimestamp(programme['start'], ist).strftime("%H:%M")
+    stop = datetime.fromtimestamp(programme['stop'], ist).strftime("%H:%M")
+    # Guide titles are free text; `*`, `_` or a backtick would break the Markdown
+    return f"`{start}-{stop}` {escape_markdown(programme['title'])}"
+
+
+async def handle_epg(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/epg <channel> - what is on now and next"""
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_ID and not await is_temp_admin(user_id):
+        await update.message.reply_text("⚠️ Unauthorized Access", parse_mode="Markdown")
+        return
+
+    if not context.args:
+        await update.message.reply_text(
+            "❗ *Usage:* `/epg <channel>`\nExample: `/epg star sports`",
+            parse_mode="Markdown"
+        )
+        return
+
+    identifier = " ".join(context.args)
+    info = m3u_manager.get_channel_info(identifier)
+    guide = epg_manager.guide(identifier)
+    if not info or not guide:
+        await update.message.reply_text(f"❌ No guide for {identifier}")
+        return
+
+    programmes = guide.upcoming(time.time(), count=6)
+    if not programmes:
+        await update.message.reply_text(f"📭 Nothing listed for {info['name']}")
+        return
+
+    now = time.time()
+    lines = [f"📺 *{escape_markdown(info['name'])}*\n"]
+    for programme in programmes:
+        marker = "▶️" if programme['start'] <= now < programme['stop'] else "•"
+        lines.append(f"{marker} {format_programme(programme)}")
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+
+async def handle_epg_record(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/epgrec <channel> | <title> - schedule the next airing of a programme"""
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_ID and not await is_temp_admin(user_id):
+        await update.message.reply_text("⚠️ Unauthorized Access", parse_mode="Markdown")
+        return
+
+    text = " ".join(context.args)
+    if "|" not in text:
+        await update.message.reply_text(
+            "❗ *Usage:* `/epgrec <channel> | <programme title>`\n"
+            "Example: `/epgrec star sports | cricket live`",
+            parse_mode="Markdown"
+        )
+        return
+
+    identifier, query = (part.strip() for part in text.split("|", 1))
+    info = m3u_manager.get_channel_info(identifier)
+    programme = epg_manager.find_programme(identifier, query) if info else None
+    if not programme:
+        await update.message.reply_text(f"❌ No upcoming programme matching '{query}' on {identifier}")
+        return
+
+    # A programme that is already on is recorded from now until it ends
+    start = max(programme['start'], int(time.time()))
+    seconds = programme['stop'] - start
+    duration = f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    start_time_str = datetime.fromtimestamp(start, timezone("Asia/Kolkata")).strftime("%d-%m-%Y %H:%M:%S")
+
+    await schedule_recording(
+        info['url'], start_time_str, duration, info['name'], programme['title'],
+        update.effective_chat.id, update.message.message_id
+    )
+    await update.message.reply_text(
+        f"**Recording Scheduled Successfully!**\n\n"
+        f"**Title:** {escape_markdown(programme['title'])}\n"
+        f"**Channel:** {escape_markdown(info['name'])}\n"
+        f"**Time:** `{start_time_str}`\n"
+        f"**Duration:** `{duration}`",
+        parse_mode="Markdown"
+    )
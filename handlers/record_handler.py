@@ -7,8 +7,10 @@ from telegram.ext import ContextTypes
 from utils.admin_checker import is_temp_admin
 from scheduler import start_recording_instantly
 from utils.logging import log_to_channel
-from config import ADMIN_ID
+from config import ADMIN_ID, MAX_PART_SIZE
 from m3u_manager import m3u_manager
+from recorders.timeshift import timeshift
+from channel_prober import channel_prober
 from telegram.ext import Application, CommandHandler, ContextTypes
 
 
@@ -21,6 +23,24 @@ async def send_long_message(update: Update, text: str, parse_mode: str = None):
         chunk = text[i:i + max_length]
         await update.message.reply_text(chunk, parse_mode=parse_mode)
 
+def parse_rewind(option: str) -> int:
+    """Seconds from a `--from=-MM:SS` / `--from=-HH:MM:SS` / `--from=-SS` option"""
+    value = option.split("=", 1)[1].strip().lstrip("-")
+    seconds = 0
+    for field in value.split(":"):
+        seconds = seconds * 60 + int(field)
+    return seconds
+
+def parse_size(option: str) -> int:
+    """Bytes from a `--fit` / `--fit=1.5G` / `--fit=700M` option (default: one full part)"""
+    if "=" not in option:
+        return MAX_PART_SIZE
+    value = option.split("=", 1)[1].strip().upper().rstrip("B")
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
 async def handle_instant_record(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     
@@ -38,13 +58,37 @@ async def handle_instant_record(update: Update, context: ContextTypes.DEFAULT_TY
         
         # Parse arguments
         parts = shlex.split(update.message.text)
+        rewind = None
+        for part in [p for p in parts if p.startswith("--from=")]:
+            parts.remove(part)
+            try:
+                rewind = parse_rewind(part)
+            except ValueError:
+                await update.message.reply_text(
+                    "❌ *Invalid offset!* Use e.g. `--from=-10:00`",
+                    parse_mode="Markdown"
+                )
+                return
+        fit = None
+        for part in [p for p in parts if p.startswith("--fit")]:
+            parts.remove(part)
+            try:
+                fit = parse_size(part)
+            except ValueError:
+                await update.message.reply_text(
+                    "❌ *Invalid size!* Use e.g. `--fit` or `--fit=1.5G`",
+                    parse_mode="Markdown"
+                )
+                return
         if len(parts) < 3:
             await update.message.reply_text(
                 "❗ *Usage:*\n"
-                "`/rec <channel_id> <duration> [title]`\n"
+                "`/rec <channel_id> <duration> [title] [--from=-MM:SS] [--fit[=SIZE]]`\n"
                 "`/p1 <channel_id> <duration> [title]`\n"
                 "`/p2 <channel_id> <duration> [title]`\n"
-                "Example: `/rec 666 20 test`",
+                "Example: `/rec 666 20 test`\n"
+                "Timeshift channels can start in the past: `/rec 666 30:00 test --from=-10:00`\n"
+                "Re-encode to fit one part (or a size): `/rec 666 3:00:00 match --fit=1.5G`",
                 parse_mode="Markdown"
             )
             return
@@ -94,8 +138,10 @@ async def handle_instant_record(update: Update, context: ContextTypes.DEFAULT_TY
                             channel_info = info
                             break
             else:
-                # Search in all playlists
+                # Search in all playlists, preferring a live, fast mirror of the channel
                 channel_info = m3u_manager.get_channel_info(identifier)
+                if channel_info:
+                    channel_info = channel_prober.rank(m3u_manager.find_mirrors(channel_info))[0]
             
             if not channel_info:
                 # Try finding similar channels
@@ -115,13 +161,35 @@ async def handle_instant_record(update: Update, context: ContextTypes.DEFAULT_TY
                 return
             url = channel_info['url']
             channel_name = channel_info.get('name', identifier)
+            if channel_prober.is_down(url):
+                probe = channel_prober.result(url)
+                checked = timedelta(seconds=int(time.time() - probe['checked_at']))
+                await update.message.reply_text(
+                    f"⚠️ {channel_name} failed its last health check {checked} ago "
+                    f"({probe['error']}); the recording may not work",
+                )
+
+        if rewind:
+            buffer = timeshift.get(channel_name)
+            if buffer is None:
+                await update.message.reply_text(
+                    f"❌ Timeshift is not enabled for {channel_name}",
+                    parse_mode="Markdown"
+                )
+                return
+            available = int(time.time() - buffer.oldest) if buffer.oldest else 0
+            if rewind > available:
+                await update.message.reply_text(
+                    f"⏪ Only `{timedelta(seconds=available)}` is buffered, starting from there",
+                    parse_mode="Markdown"
+                )
 
         # Start recording
         message_id = update.message.message_id
         
         asyncio.create_task(start_recording_instantly(
             url, duration_display, channel_name, title, 
-            chat_id, message_id
+            chat_id, message_id, rewind, fit
         ))
       #  log_to_channel(chat_id, message.from_user.username or "Unknown", message.text, start_time_str, title)
         
@@ -175,8 +243,10 @@ async def handle_find_channel(update: Update, context: ContextTypes.DEFAULT_TYPE
                          for term in search_query.split()):
                     partial_results[channel_id] = info
 
-        # Combine results (exact matches first)
-        results = {**exact_results, **partial_results}
+        # Combine results (exact matches first, live and fast mirrors ahead of dead ones)
+        by_health = lambda item: channel_prober.health_key(item[1]['url'])
+        results = {**dict(sorted(exact_results.items(), key=by_health)),
+                   **dict(sorted(partial_results.items(), key=by_health))}
 
         if not results:
             await update.message.reply_text(
@@ -192,7 +262,7 @@ async def handle_find_channel(update: Update, context: ContextTypes.DEFAULT_TYPE
             if playlist_id not in grouped_results:
                 grouped_results[playlist_id] = []
             grouped_results[playlist_id].append(
-                f"{info['name']} (ID: {info['original_id']})"
+                f"{channel_prober.badge(info['url'])} {info['name']} (ID: {info['original_id']})"
             )
 
         # Send results with pagination (max 10 items per message)
@@ -1,9 +1,10 @@
 import shlex  # Add this import at the top
 from datetime import datetime
+from pytz import timezone
 from telegram import Update
 from telegram.ext import ContextTypes
 from utils.admin_checker import is_temp_admin
-from scheduler import schedule_recording
+from scheduler import schedule_recording, timer_scheduler, parse_rule, describe_rule, duration_seconds
 from utils.logging import log_to_channel
 from config import ADMIN_ID
 
@@ -57,6 +58,12 @@ async def handle_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
 
+        try:
+            duration_seconds(duration)
+        except ValueError:
+            await update.message.reply_text("❌ *Invalid duration!*\nUse `HH:MM:SS`", parse_mode="Markdown")
+            return
+
         await update.message.reply_text(
             f"**Recording Scheduled Successfully!**\n\n"
             f"**Title:** `{title}`\n"
@@ -73,3 +80,146 @@ async def handle_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     except Exception as e:
         await update.message.reply_text(f"❌ Error: `{str(e)}`", parse_mode="Markdown")
+
+
+async def list_scheduled(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/jobs - the next scheduled recordings of this chat"""
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_ID and not await is_temp_admin(user_id):
+        await update.message.reply_text("⚠️ Unauthorized Access", parse_mode="Markdown")
+        return
+
+    jobs = timer_scheduler.upcoming(update.effective_chat.id)
+    if not jobs:
+        await update.message.reply_text("📭 No scheduled recordings")
+        return
+
+    ist = timezone("Asia/Kolkata")
+    lines = ["🗓 *Scheduled Recordings*\n"]
+    for job in jobs:
+        start = datetime.fromtimestamp(job['at'], ist).strftime("%d-%m-%Y %H:%M:%S")
+        lines.append(f"`#{job['id']}` {start} • `{job['duration']}` • {job['channel']} • {job['title']}")
+    lines.append("\nCancel with `/cancel <id>`")
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+
+async def cancel_scheduled(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/cancel <id> - drop a scheduled recording before it starts"""
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_ID and not await is_temp_admin(user_id):
+        await update.message.reply_text("⚠️ Unauthorized Access", parse_mode="Markdown")
+        return
+
+    if not context.args or not context.args[0].lstrip("#").isdigit():
+        await update.message.reply_text("❗ *Usage:* `/cancel <id>` (see /jobs)", parse_mode="Markdown")
+        return
+
+    job_id = int(context.args[0].lstrip("#"))
+    job = timer_scheduler.jobs.get(job_id)
+    if job is None or job['chat_id'] != update.effective_chat.id and user_id not in ADMIN_ID:
+        await update.message.reply_text(f"❌ No scheduled recording `#{job_id}`", parse_mode="Markdown")
+        return
+
+    timer_scheduler.cancel(job_id)
+    await update.message.reply_text(f"🗑 Cancelled `#{job_id}` ({job['title']})", parse_mode="Markdown")
+
+
+async def handle_every(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/every - record a stream on a recurring schedule"""
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_ID and not await is_temp_admin(user_id):
+        await update.message.reply_text("⚠️ Unauthorized Access", parse_mode="Markdown")
+        return
+
+    try:
+        parts = shlex.split(update.message.text)
+        if len(parts) < 7:
+            await update.message.reply_text(
+                "❗ *Invalid Format!*\n\n"
+                "Use this format:\n"
+                "`/every \"url\" daily|weekdays|mon..sun HH:MM:SS duration channel title`\n"
+                "`/every \"url\" cron \"MM HH day month weekday\" duration channel title`",
+                parse_mode="Markdown"
+            )
+            return
+
+        url = parts[1].strip('"')
+        try:
+            recurrence = parse_rule(parts[2], parts[3])
+        except ValueError as e:
+            await update.message.reply_text(f"❌ *Invalid recurrence:* `{e}`", parse_mode="Markdown")
+            return
+        duration = parts[4]
+        channel = parts[5]
+        title = " ".join(parts[6:])
+        try:
+            duration_seconds(duration)
+        except ValueError:
+            await update.message.reply_text("❌ *Invalid duration!*\nUse `HH:MM:SS`", parse_mode="Markdown")
+            return
+
+        rule = timer_scheduler.add_rule(recurrence, url, duration, channel, title, update.effective_chat.id)
+        timer_scheduler.start()
+
+        job = timer_scheduler.next_of(rule['id'])
+        next_start = "never"
+        if job:
+            next_start = datetime.fromtimestamp(job['at'], timezone("Asia/Kolkata")).strftime("%d-%m-%Y %H:%M:%S")
+        await update.message.reply_text(
+            f"**Recurring Recording Added!**\n\n"
+            f"**Rule:** `#{rule['id']}` {describe_rule(rule)}\n"
+            f"**Title:** `{title}`\n"
+            f"**Channel:** `{channel}`\n"
+            f"**Next:** `{next_start}`\n"
+            f"**Duration:** `{duration}`",
+            parse_mode="Markdown"
+        )
+
+    except Exception as e:
+        await update.message.reply_text(f"❌ Error: `{str(e)}`", parse_mode="Markdown")
+
+
+async def list_rules(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/rules - the recurring recordings of this chat"""
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_ID and not await is_temp_admin(user_id):
+        await update.message.reply_text("⚠️ Unauthorized Access", parse_mode="Markdown")
+        return
+
+    rules = [rule for rule in timer_scheduler.rules.values() if rule['chat_id'] == update.effective_chat.id]
+    if not rules:
+        await update.message.reply_text("📭 No recurring recordings")
+        return
+
+    ist = timezone("Asia/Kolkata")
+    lines = ["🔁 *Recurring Recordings*\n"]
+    for rule in rules:
+        job = timer_scheduler.next_of(rule['id'])
+        next_start = datetime.fromtimestamp(job['at'], ist).strftime("%d-%m-%Y %H:%M") if job else "-"
+        lines.append(
+            f"`#{rule['id']}` {describe_rule(rule)} • `{rule['duration']}` • {rule['channel']} • "
+            f"{rule['title']} (next {next_start})"
+        )
+    lines.append("\nRemove with `/unrule <id>`, skip one occurrence with `/cancel <id>` from /jobs")
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+
+async def remove_rule(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/unrule <id> - stop a recurring recording"""
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_ID and not await is_temp_admin(user_id):
+        await update.message.reply_text("⚠️ Unauthorized Access", parse_mode="Markdown")
+        return
+
+    if not context.args or not context.args[0].lstrip("#").isdigit():
+        await update.message.reply_text("❗ *Usage:* `/unrule <id>` (see /rules)", parse_mode="Markdown")
+        return
+
+    rule_id = int(context.args[0].lstrip("#"))
+    rule = timer_scheduler.rules.get(rule_id)
+    if rule is None or rule['chat_id'] != update.effective_chat.id and user_id not in ADMIN_ID:
+        await update.message.reply_text(f"❌ No recurring recording `#{rule_id}`", parse_mode="Markdown")
+        return
+
+    timer_scheduler.remove_rule(rule_id)
+    await update.message.reply_text(f"🗑 Removed rule `#{rule_id}` ({rule['title']})", parse_mode="Markdown")
@@ -6,6 +6,7 @@ import json
 import logging
 from typing import Dict, Optional, List
 import hashlib
+import asyncio
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -63,22 +64,31 @@ class M3UManager:
             self._register_channels(playlist_id)
             return
 
-        logger.info(f"Fetching new playlist: {playlist_url}")
         try:
-            response = requests.get(playlist_url, timeout=10)
-            response.raise_for_status()
-            
-            self.playlists[playlist_id] = {
-                'url': playlist_url,
-                'channels': {},
-                'number': playlist_num
-            }
-            
-            self._parse_and_add_channels(response.text, playlist_id)
-            self._save_to_cache(playlist_url, self.playlists[playlist_id])
-            
+            playlist_text = self._fetch_playlist(playlist_url)
         except requests.exceptions.RequestException as e:
             logger.error(f"Error loading playlist {playlist_url}: {e}")
+            return
+        self._apply_playlist(playlist_url, playlist_num, playlist_text)
+
+    @staticmethod
+    def _fetch_playlist(playlist_url: str) -> str:
+        """Download a playlist; touches no shared state, so it may run in a worker thread"""
+        logger.info(f"Fetching new playlist: {playlist_url}")
+        response = requests.get(playlist_url, timeout=10)
+        response.raise_for_status()
+        return response.text
+
+    def _apply_playlist(self, playlist_url: str, playlist_num: int, playlist_text: str):
+        playlist_id = f"p{playlist_num}"
+        self._unregister_channels(playlist_id)
+        self.playlists[playlist_id] = {
+            'url': playlist_url,
+            'channels': {},
+            'number': playlist_num
+        }
+        self._parse_and_add_channels(playlist_text, playlist_id)
+        self._save_to_cache(playlist_url, self.playlists[playlist_id])
 
     def _parse_and_add_channels(self, playlist_text: str, playlist_id: str):
         channel_info = {}
@@ -90,7 +100,7 @@ class M3UManager:
                 channel_info = {
                     'id': f"{playlist_id}:{channel_id_match.group(1) if channel_id_match else ''}",
                     'name': channel_name_match.group(1).strip() if channel_name_match else "Unknown",
-                    'original_id': self._clean_channel_id(channel_id_match.group(1)) if channel_id_match else '',
+                    'original_id': self.clean_channel_id(channel_id_match.group(1)) if channel_id_match else '',
                     'playlist': playlist_id
                 }
             elif line.startswith('http'):
@@ -114,8 +124,20 @@ class M3UManager:
                 self.channels[info['original_id']] = info
             self.channels[info['name'].lower()] = info
             self.url_to_source[info['url']] = playlist_id
+
+    def _unregister_channels(self, playlist_id: str):
+        """Drop a playlist's entries from the lookups, so a re-fetch leaves no stale URLs behind"""
+        playlist_data = self.playlists.get(playlist_id, {})
+        for combined_id, info in playlist_data.get('channels', {}).items():
+            for key in (combined_id, info.get('original_id'), info['name'].lower()):
+                # Keys shared with another playlist's channel are left to it
+                if key and self.channels.get(key) is info:
+                    del self.channels[key]
+            if self.url_to_source.get(info['url']) == playlist_id:
+                del self.url_to_source[info['url']]
             
-    def _clean_channel_id(self, channel_id: str) -> str:
+    def clean_channel_id(self, channel_id: str) -> str:
+        """A tvg-id as stored in `original_id`; guides match their channel ids through it"""
         if not channel_id:
             return ""
         # Keep alphanumeric, dots, and hyphens, remove others
@@ -170,6 +192,54 @@ class M3UManager:
         
         return None
 
+    def find_mirrors(self, info: dict) -> List[dict]:
+        """The same channel in every playlist (matched by tvg-id, or by name without one)"""
+        mirrors = []
+        for channel_id, other in self.channels.items():
+            if not (isinstance(channel_id, str) and ':' in channel_id):
+                continue
+            if info.get('original_id'):
+                same = other.get('original_id', '').lower() == info['original_id'].lower()
+            else:
+                same = other['name'].lower() == info['name'].lower()
+            if same:
+                mirrors.append(other)
+        return mirrors or [info]
+
+    async def refresh_channel_url(self, url: str) -> Optional[str]:
+        """
+        Re-download the playlist `url` came from and return the channel's current URL.
+
+        Used when an ingest keeps failing, since tokenised stream links expire.
+        Only the download runs in a thread; the lookup tables are rebuilt on the
+        event loop, where handlers read them. Returns None if the channel is not
+        in any playlist or the playlist could not be fetched.
+        """
+        playlist_id = self.url_to_source.get(url)
+        playlist = self.playlists.get(playlist_id)
+        if not playlist:
+            return None
+        old = next(
+            ((cid, info) for cid, info in playlist['channels'].items() if info['url'] == url), None
+        )
+        if not old:
+            return None
+        combined_id, old_info = old
+
+        try:
+            playlist_text = await asyncio.to_thread(self._fetch_playlist, playlist['url'])
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error refreshing playlist {playlist['url']}: {e}")
+            return None
+        self._apply_playlist(playlist['url'], playlist['number'], playlist_text)
+        channels = self.playlists.get(playlist_id, {}).get('channels', {})
+        if combined_id in channels:
+            return channels[combined_id]['url']
+        for info in channels.values():
+            if info['name'] == old_info['name']:
+                return info['url']
+        return None
+
 # Initialize with multiple playlists
 m3u_manager = M3UManager([
     "https://example.com/playlist.m3u",
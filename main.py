@@ -1,6 +1,7 @@
 from telegram.ext import ApplicationBuilder
-from config import BOT_TOKEN
+from utils.bot_client import get_bot
 import sys
+import asyncio
 import logging
 import warnings
 
@@ -25,6 +26,37 @@ def escape_markdown(text):
     escape_chars = '_*[]()~`>#+-=|{}.!'
     return ''.join('\\' + char if char in escape_chars else char for char in text)
 
+async def post_init(application):
+    """Start the background services once the bot is up"""
+    from recorders.timeshift import timeshift
+    from scheduler import timer_scheduler
+    from epg_manager import epg_manager
+    from channel_prober import channel_prober
+    timer_scheduler.load()
+    timer_scheduler.start()
+    timeshift.start()
+    epg_manager.start()
+    from uploader.client_pool import client_pool
+    channel_prober.load()
+    channel_prober.start()
+    from uploader.pyrogram_uploader import resume_pending_uploads
+    client_pool.start()
+    # Kept so it is not garbage-collected mid-run and can be cancelled on shutdown
+    application.bot_data['resume_uploads'] = asyncio.create_task(resume_pending_uploads())
+
+async def post_shutdown(application):
+    from recorders.timeshift import timeshift
+    from scheduler import timer_scheduler
+    from uploader.client_pool import client_pool
+    resume_uploads = application.bot_data.pop('resume_uploads', None)
+    if resume_uploads:
+        resume_uploads.cancel()
+        await asyncio.gather(resume_uploads, return_exceptions=True)
+    await timeshift.stop()
+    await client_pool.stop()
+    # Journal lines still queued for the writer thread
+    await timer_scheduler.flush()
+
 def main():
     """Main synchronous bot function"""
     try:
@@ -33,8 +65,10 @@ def main():
         # Build application
         application = (
             ApplicationBuilder()
-            .token(BOT_TOKEN)
+            .bot(get_bot())  # Same pooled Bot the recorder and uploader use
             .concurrent_updates(True)
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
             .build()
         )
         
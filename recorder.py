@@ -5,11 +5,28 @@ import time
 from datetime import datetime, timedelta
 from pytz import timezone
 import aiohttp
-from config import RECORDINGS_DIR, BOT_TOKEN, STORE_CHANNEL_ID
-from utils.utils import format_bytes, format_duration
-from uploader.pyrogram_uploader import send_video_pyrogram
-from telegram import Bot, error
-from recorders.recorder_utils import resolve_stream, get_stream_quality
+import glob
+from config import (
+    RECORDINGS_DIR, STORE_CHANNEL_ID, STREAMING_UPLOAD, SEGMENT_SECONDS,
+    MAX_PART_SIZE, PART_SIZE_HEADROOM, DEFAULT_BITRATE, STALL_TIMEOUT, MAX_RECONNECTS,
+    UPLOADER_WARMUP_SECONDS
+)
+from utils.utils import format_bytes, format_duration, cleanup_files, split_video, get_video_duration
+from uploader.pyrogram_uploader import send_video_pyrogram, connect_uploader, warm_up_uploader
+from telegram import error
+from utils.bot_client import get_bot
+from features.progress_ticker import progress_ticker
+from recorders.recorder_utils import get_stream_quality, quality_label
+from recorders.segments import max_part_seconds, concat_segments, group_by_size, OUTPUT_EXTENSION
+from recorders.admission import admission, AdmissionRejected
+from recorders.capture import prepare_ingest, run_capture, COMPLETE_TOLERANCE
+from recorders.ffmpeg_progress import FFmpegProgress
+from recorders.timeshift import timeshift
+from recorders.ingest_hub import ingest_hub
+from recorders.transcode import transcode_to_fit
+from recorders.planner import plan_recording, written_bytes
+from m3u_manager import m3u_manager
+from channel_prober import channel_prober
 from features.status_broadcast import add_active_recording, remove_active_recording
 import re
 
@@ -36,7 +53,7 @@ def caption_recording_started(title, channel, duration_sec, start_time_str):
         f"🔄 *Status:* Preparing to record..."
     )
 
-def caption_recording_progress(title, channel, total_duration, start_time_str, elapsed_sec, remaining_sec, error_msg=None):
+def caption_recording_progress(title, channel, total_duration, start_time_str, elapsed_sec, remaining_sec, error_msg=None, stats=None, status=None):
     progress = min(elapsed_sec / total_duration, 1)
     progress_bar = create_progress_bar(progress)
     
@@ -44,8 +61,14 @@ def caption_recording_progress(title, channel, total_duration, start_time_str, e
     remaining_hms = seconds_to_hms(remaining_sec)
     total_hms = seconds_to_hms(total_duration)
     
-    status = "❌ Failed" if error_msg else "🔄 Recording..."
+    status = "❌ Failed" if error_msg else (status or "🔄 Recording...")
     error_line = f"\n❗ *Error:* `{error_msg}`" if error_msg else ""
+    stats_line = ""
+    if stats:
+        stats_line = (
+            f"💾 *Size:* `{stats.total_size / 1024 / 1024:.1f} MB`\n"
+            f"📶 *Bitrate:* `{stats.bitrate:.0f} kbps` | ⚡ *Speed:* `{stats.speed:.2f}x`\n\n"
+        )
     
     return (
         f"⏳ *Recording in Progress*\n\n"
@@ -56,250 +79,658 @@ def caption_recording_progress(title, channel, total_duration, start_time_str, e
         f"[{progress_bar}] {progress * 100:.1f}%\n"  # Added percentage here
         f"▶️ *Elapsed:* `{elapsed_hms}`\n"
         f"⏭ *Remaining:* `{remaining_hms}`\n\n"
+        f"{stats_line}"
         f"*Status:* {status}{error_line}"
     )
 
 
-def caption_recording_completed(title, channel, duration_sec, start_time_str):
+def caption_recording_queued(title, channel, duration_sec, start_time_str, position, reason):
+    duration_hms = seconds_to_hms(duration_sec)
+    return (
+        f"🕐 *Recording Queued*\n\n"
+        f"📌 *Title:* `{title}`\n"
+        f"📺 *Channel:* `{channel}`\n"
+        f"⏱ *Duration:* `{duration_hms}`\n"
+        f"⏰ *Requested At:* `{start_time_str}`\n\n"
+        f"🔢 *Queue Position:* `{position}`\n"
+        f"*Status:* Waiting ({reason})"
+    )
+
+
+def caption_recording_completed(title, channel, duration_sec, start_time_str, gaps=None):
     duration_hms = seconds_to_hms(duration_sec)
     end_time_str = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+    gap_line = ""
+    if gaps:
+        gap_line = f"⚠️ *Gaps:* `{len(gaps)}` (`{seconds_to_hms(sum(gaps))}` lost to reconnects)\n"
     return (
         f"✅ *Recording Completed*\n\n"
         f"📌 *Title:* `{title}`\n"
         f"📺 *Channel:* `{channel}`\n"
         f"⏱ *Duration:* `{duration_hms}`\n"
         f"⏰ *Started At:* `{start_time_str}`\n"
-        f"🕒 *Ended At:* `{end_time_str}`\n\n"
+        f"🕒 *Ended At:* `{end_time_str}`\n"
+        f"{gap_line}\n"
         f"📤 *Status:* Preparing for upload..."
     )
 
 
+def build_filename(title, channel, start_time, end_time, part=None):
+    sanitized_title = re.sub(r'[<>:"/\\|?*]', '_', title)
+    sanitized_channel = re.sub(r'[<>:"/\\|?*]', '_', channel)
+    time_format = "%H-%M-%S"
+    part_suffix = f".part{part:02d}" if part else ""
+    return (
+        f"{sanitized_title}.{sanitized_channel}.{start_time.strftime(time_format)}-{end_time.strftime(time_format)}"
+        f".{start_time.strftime('%d-%m-%Y')}.IPTV.WEB-DL.@Krinry{part_suffix}{OUTPUT_EXTENSION}"
+    )
 
 
-async def start_recording(url: str, duration: str, channel: str, title: str, chat_id: int, message_id: int):
-    bot = Bot(token=BOT_TOKEN)
-    recording_message = None
-    last_caption = ""
-    process = None
-    start_ts = time.time()
-    error_occurred = False
-    
-    try:
-        ist = timezone("Asia/Kolkata")
-        now = datetime.now(ist)
-
+async def make_thumbnail(video_path):
+    """
+    Grab the thumbnail from the part's first keyframe.
+
+    Parts are cut on keyframes, so with `-skip_frame nokey` ffmpeg decodes the
+    very first frame and stops; only the head of the file is read.
+    """
+    thumbnail_path = f"{video_path}.jpg"
+    thumbnail_cmd = [
+        "ffmpeg",
+        "-y",
+        "-loglevel", "error",
+        "-skip_frame", "nokey",
+        "-i", video_path,
+        "-map", "0:v:0",
+        "-frames:v", "1",
+        "-q:v", "2",
+        "-vf", "scale=320:-1",
+        thumbnail_path
+    ]
+    await (await asyncio.create_subprocess_exec(*thumbnail_cmd)).wait()
+    return thumbnail_path if os.path.exists(thumbnail_path) else None
+
+
+async def upload_part(bot, output_path, caption, thumbnail_path, duration, chat_id):
+    """Upload one finished file to the store channel and copy it to the user; returns the store message id"""
+    max_retries = 3
+    for attempt in range(max_retries):
         try:
-            if ":" in duration:
-                h, m, s = map(int, duration.split(":"))
-                total_seconds = h * 3600 + m * 60 + s
-            else:
-                total_seconds = int(duration)
-        except ValueError:
-            await bot.send_message(chat_id, "⚠️ Invalid duration format. Use HH:MM:SS.")
-            return
-        
-        end_ts = start_ts + total_seconds
-        end_time = now + timedelta(seconds=total_seconds)
-        start_time_str = now.strftime("%d-%m-%Y %H:%M:%S")
-
-        initial_caption = caption_recording_started(title, channel, total_seconds, start_time_str)
-        last_caption = initial_caption
-        
-        # Modified part - directly send text message without image
-        try:
-            recording_message = await bot.send_message(
+            new_message_id = await send_video_pyrogram(
+                output_path,
+                caption,
+                thumbnail=thumbnail_path,
+                duration=int(duration),
                 chat_id=chat_id,
-                text=initial_caption,
-                parse_mode="Markdown",
-                reply_to_message_id=message_id
             )
-        except Exception as e:
-            print(f"Error sending recording notification: {e}")
-            recording_message = await bot.send_message(
-                chat_id=chat_id,
-                text=initial_caption,
-                parse_mode="Markdown",
-                reply_to_message_id=message_id
+            if new_message_id:
+                await bot.copy_message(chat_id=chat_id, from_chat_id=STORE_CHANNEL_ID, message_id=new_message_id)
+                return new_message_id
+        except Exception as upload_error:
+            print(f"[Recorder] Upload attempt {attempt + 1} failed: {upload_error}")
+        if attempt < max_retries - 1:
+            await asyncio.sleep(5)
+    return None
+
+
+async def deliver_shared(bot, message_id, caption, chat_id):
+    """Copy a part another recording already uploaded to the store channel"""
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            await bot.copy_message(
+                chat_id=chat_id, from_chat_id=STORE_CHANNEL_ID, message_id=message_id,
+                caption=caption, parse_mode="Markdown"
             )
+            return True
+        except Exception as copy_error:
+            print(f"[Recorder] Copy attempt {attempt + 1} failed: {copy_error}")
+        if attempt < max_retries - 1:
+            await asyncio.sleep(5)
+    return False
+
+
+async def upload_worker(bot, queue, title, channel, started_at, chat_id, stats, on_disk=None):
+    """
+    Consume finished parts from `queue` and upload them in order.
+
+    A `None` item marks the end of the recording. Returns the number of parts
+    that could not be uploaded. Parts renamed (or split) for upload are kept in
+    the `on_disk` set until they are deleted, so the recording's disk usage
+    still counts them.
+    """
+    on_disk = set() if on_disk is None else on_disk
+    failed = 0
+    while True:
+        segment = await queue.get()
+        if segment is None:
+            return failed
+
+        part_start = started_at + timedelta(seconds=segment['start'])
+        part_end = started_at + timedelta(seconds=segment['end'])
+        final_filename = build_filename(title, channel, part_start, part_end, segment.get('part'))
+        if 'message_id' in segment:
+            # Uploaded once by the recording whose ingest we share
+            caption = await build_caption(final_filename, segment['duration'], segment['size'], stats)
+            if not await deliver_shared(bot, segment['message_id'], caption, chat_id):
+                failed += 1
+            continue
+
+        output_path = os.path.join(RECORDINGS_DIR, final_filename)
+        session = segment.get('session')
+        pieces = []
 
-        async def update_caption(caption_text):
-            nonlocal last_caption
-            if caption_text != last_caption:
-                try:
-                    await bot.edit_message_text(
-                        text=caption_text,
-                        chat_id=chat_id,
-                        message_id=recording_message.message_id,
-                        parse_mode="Markdown",
-                    )
-                    last_caption = caption_text
-                except Exception as e:
-                    print(f"Error updating caption: {e}")
-
-        async def update_progress_bar():
-            nonlocal last_caption, process, start_ts, error_occurred  # Modified here
-            end_ts = start_ts + total_seconds
-            last_update_time = start_ts  # Track last update time
-
-            while time.time() < end_ts:
-                current_time = time.time()
-                elapsed = current_time - start_ts
-                time_left = max(0, end_ts - current_time)
-                
-                # Update every 1 second instead of 5
-                if current_time - last_update_time >= 1:  # Faster updates
-                    caption_text = caption_recording_progress(
-                        title, channel, total_seconds, start_time_str,
-                        elapsed, time_left
-                    )
-                    await update_caption(caption_text)
-                    last_update_time = current_time
-                    
-                await asyncio.sleep(3)  # Reduced sleep time
-
-                if process and process.returncode is not None and process.returncode != 0:
-                    if not error_occurred:
-                        stderr = await process.stderr.read() if process.stderr else b'Unknown error'
-                        error_msg = stderr.decode().strip()[:100]
-                        caption_text = caption_recording_progress(
-                            title, channel, total_seconds, start_time_str,
-                            elapsed, time_left, error_msg
+        try:
+            on_disk.add(output_path)
+            os.rename(segment['path'], output_path)
+            pieces = [output_path]
+            # Recordings following this ingest get their cut now, or the upload below
+            followers = await session.share_cuts(segment, output_path) if session else []
+            # The limit parts are cut to: MAX_PART_SIZE itself is above what Telegram takes
+            part_limit = int(MAX_PART_SIZE * PART_SIZE_HEADROOM)
+            if os.path.getsize(output_path) > part_limit:
+                # The bitrate estimate was too low for this part; split it after the fact
+                print(f"[Recorder] {final_filename} is over the part size limit, splitting")
+                pieces = await split_video(output_path, part_limit)
+                on_disk.update(pieces)
+                await cleanup_files([output_path])
+
+            for piece in pieces:
+                piece_duration = segment['duration'] if piece == output_path else await get_video_duration(piece)
+                message_id = await upload_file(bot, piece, piece_duration, chat_id, stats)
+                if message_id:
+                    if followers:
+                        await session.share_uploaded(
+                            followers, segment, message_id, piece_duration, os.path.getsize(piece)
                         )
-                        await update_caption(caption_text)
-                        error_occurred = True
-                    return
+                else:
+                    failed += 1
+                    if followers:
+                        await session.share_file(followers, segment, piece, piece_duration)
+        except Exception as e:
+            print(f"[Recorder] Error handling part {segment['path']}: {e}")
+            failed += 1
+        finally:
+            await cleanup_files([segment['path'], output_path, *pieces])
+            on_disk.difference_update([output_path, *pieces])
+
+
+async def build_caption(file_name, duration, size, stats):
+    readable_duration = await format_duration(seconds_to_hms(duration))
+    readable_size = await format_bytes(size)
+    # Stream facts come from ffmpeg's start-up log, no ffprobe of the finished file
+    quality_line = ""
+    if stats.resolution:
+        quality_line = f"\n🎞 Quality: {stats.resolution} {stats.video_codec} ({quality_label(stats.resolution)})"
+
+    return f"""`📁 Filename: {file_name}
+⏱ Duration: {readable_duration}
+💾 File-Size: {readable_size}{quality_line}`
+☎️ @Requestadminuser_bot"""
 
-            # Immediately after loop ends (recording complete)
-            final_caption = caption_recording_completed(title, channel, total_seconds, start_time_str)
-            await update_caption(final_caption)
-            
-            # Wait for process to finish completely
-            if process and process.returncode is None:
-                await process.wait()
 
-        progress_task = asyncio.create_task(update_progress_bar())
+async def upload_file(bot, file_path, duration, chat_id, stats):
+    """Thumbnail, caption and upload a single finished file; returns the store message id"""
+    thumbnail_path = None
+    try:
+        thumbnail_path = await make_thumbnail(file_path)
+        caption = await build_caption(os.path.basename(file_path), duration, os.path.getsize(file_path), stats)
+        return await upload_part(bot, file_path, caption, thumbnail_path, duration, chat_id)
+    finally:
+        if thumbnail_path:
+            await cleanup_files([thumbnail_path])
+
+
+class Recording:
+    """
+    State of one `start_recording` call, from admission to the last upload.
+
+    `run` walks through the phases: set up the live ingest (or the timeshift
+    read), capture with reconnects or follow a shared ingest, optionally fit
+    the held parts to a size, then hand every part to the upload worker.
+    """
+
+    def __init__(self, url: str, total_seconds: int, channel: str, title: str, chat_id: int,
+                 message_id: int = None, start_at: float = None, rewind: int = None, fit: int = None):
+        self.bot = get_bot()
+        self.url = url
+        self.total_seconds = total_seconds
+        self.channel = channel
+        self.title = title
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.start_at = start_at
+        self.rewind = rewind
+        self.fit = fit
+
+        self.start_ts = time.time()
+        self.end_ts = self.start_ts + total_seconds
+        self.progress_id = f"rec:{chat_id}:{message_id}:{self.start_ts}"
+        self.admission_id = f"{chat_id}:{message_id}:{self.start_ts}"
+        self.ist = timezone("Asia/Kolkata")
+        self.now = datetime.now(self.ist)
+        self.start_time_str = self.now.strftime("%d-%m-%Y %H:%M:%S")
+        self.stats = FFmpegProgress()
+        self.temp_prefix = f"temp_recording_{self.now.timestamp()}"
+        self.segment_pattern = os.path.join(RECORDINGS_DIR, f"{self.temp_prefix}_%03d{OUTPUT_EXTENSION}")
+
+        self.buffer = None
+        self.since = None
+        self.ingest = None
+        self.bitrate = DEFAULT_BITRATE
+        self.plan = None
+        self.segment_time = total_seconds
+        self.numbered_parts = False
+        self.recording_id = None
+        self.upload_queue = asyncio.Queue()
+        self.uploading = set()  # Parts renamed for upload and not deleted yet
+        self.upload_task = None
+        self.warmup = None
+        self.capture_started = self.start_ts
+        self.deadline = self.end_ts
+
+        self.media_done = 0.0
+        self.next_part = 0
+        self.held = []
+        self.gaps = []
+        self.reconnects = 0
+        self.attempt_offset = 0.0
+        self.status = None
+        self.gave_up = None
+        self.session = None
+        self.sharing = None
+        self.follower = None
+        self.following = False
+
+    def update_caption(self, caption_text):
+        progress_ticker.set_text(self.progress_id, caption_text)
+
+    def fail(self, error_msg, done=0.0, total=None):
+        total = self.total_seconds if total is None else total
+        self.update_caption(caption_recording_progress(
+            self.title, self.channel, total, self.start_time_str, done, max(0, total - done), error_msg
+        ))
+
+    async def show_queue_position(self, position, reason):
+        self.update_caption(caption_recording_queued(
+            self.title, self.channel, self.total_seconds, self.start_time_str, position, reason
+        ))
+
+    def disk_used(self) -> int:
+        return written_bytes(os.path.join(RECORDINGS_DIR, f"{self.temp_prefix}*"), self.uploading)
+
+    async def run(self):
+        try:
+            # The central ticker owns the progress message; all recordings of this
+            # chat share one dashboard and edits happen only when the text changes.
+            progress_ticker.add(
+                self.progress_id, self.chat_id, reply_to=self.message_id,
+                text=caption_recording_started(self.title, self.channel, self.total_seconds, self.start_time_str)
+            )
+            os.makedirs(RECORDINGS_DIR, exist_ok=True)
 
-        temp_filename = f"temp_recording_{now.timestamp()}.mkv"
-        temp_path = os.path.join(RECORDINGS_DIR, temp_filename)
-        os.makedirs(RECORDINGS_DIR, exist_ok=True)
+            ready = await self.prepare_rewind() if self.rewind else await self.prepare_live()
+            if not ready:
+                return
+            self.start_uploads()
 
+            if self.buffer:
+                await self.buffer.record(self.since, self.total_seconds, self.segment_pattern, self.on_segment)
+                if not self.media_done:
+                    self.gave_up = "Nothing buffered for this time"
+            else:
+                await self.capture_live()
+
+            if self.held and self.fit and sum(os.path.getsize(seg['path']) for seg in self.held) > self.fit:
+                await self.fit_held()
+            if self.held:
+                await self.queue_held()
+            if self.follower:
+                # Parts of the shared ingest may still be on their way
+                await self.follower.done.wait()
+            await self.upload_queue.put(None)
+
+            if self.gave_up or self.media_done <= 0:
+                self.fail(
+                    f"❌ Recording failed: {(self.gave_up or self.stats.last_error or 'FFmpeg error')[:100]}",
+                    self.media_done
+                )
+            else:
+                self.update_caption(caption_recording_completed(
+                    self.title, self.channel, self.total_seconds, self.start_time_str, self.gaps
+                ))
+
+            failed_parts = await self.upload_task
+            if failed_parts:
+                self.fail(f"❌ Upload failed for {failed_parts} part(s)", self.media_done)
+
+        except Exception as e:
+            error_msg = f"❌ Error: {str(e)}"
+            print(error_msg)
+            self.fail(error_msg, time.time() - self.start_ts, max(0.0, self.end_ts - self.start_ts))
+            if self.upload_task and not self.upload_task.done():
+                self.upload_task.cancel()
+            await cleanup_files(glob.glob(os.path.join(RECORDINGS_DIR, f"{self.temp_prefix}*")))
+        finally:
+            if self.session:
+                ingest_hub.close(self.session)
+            if self.follower:
+                self.sharing.unfollow(self.follower)
+            if self.ingest and self.ingest['fetcher']:
+                await self.ingest['fetcher'].close()
+            progress_ticker.finish(self.progress_id)
+            if self.warmup:
+                self.warmup.cancel()
+            admission.release(self.admission_id)
+            if self.recording_id:
+                remove_active_recording(self.recording_id)
+
+    async def prepare_rewind(self) -> bool:
+        """Find the timeshift buffer and the moment to start from; False if there is none"""
+        self.buffer = timeshift.get(self.channel)
+        if self.buffer is None:
+            self.fail("❌ Timeshift is not enabled for this channel")
+            return False
+        # Everything before the live edge is already on disk; no new
+        # upstream connection and no extra ingest slot are needed, but the
+        # copies and the joined file still have to fit on the disk
+        print(f"[Recorder] Starting recording {self.rewind}s back from the timeshift buffer...")
+        self.bitrate = self.buffer.bitrate or DEFAULT_BITRATE
+        self.since = max(time.time() - self.rewind, self.buffer.oldest or time.time())
+        self.plan = plan_recording(self.bitrate, self.total_seconds, self.total_seconds, False, self.fit)
+        if not await self.admit(ingest=False):
+            return False
+        # The ring kept turning while queued
+        self.since = max(self.since, self.buffer.oldest or self.since)
+        self.now = datetime.fromtimestamp(self.since, self.ist)
+        self.start_time_str = self.now.strftime("%d-%m-%Y %H:%M:%S")
+        return True
+
+    async def prepare_live(self) -> bool:
+        """Resolve the stream, reserve an ingest slot and wait for the start; False if it cannot run"""
         print(f"[Recorder] Starting recording...")
-        stream_url = await resolve_stream(url)
-        # Add this where you start the recording
-        recording_id = add_active_recording({
-            'title': title,
-            'channel': channel,
-            'duration': total_seconds,
-            'user_id': chat_id
+        self.ingest = await prepare_ingest(self.url)
+        if self.start_at:
+            try:
+                await connect_uploader()
+            except Exception as e:
+                print(f"[Recorder] Could not connect the uploader ahead of time: {e}")
+
+        # In streaming mode ffmpeg rolls over to a new part every SEGMENT_SECONDS,
+        # otherwise the whole recording ends up in a single part. Either way a
+        # part never runs longer than what fits in MAX_PART_SIZE at the stream's
+        # bitrate, so long HD recordings are cut on keyframes while they are written.
+        # The prober's measurement beats the playlist's advertised bandwidth
+        self.bitrate = channel_prober.bitrate(self.url) or self.ingest['bitrate'] or DEFAULT_BITRATE
+
+        # Reserve the disk the recording will need at its peak; what it has
+        # on disk at any moment is taken off the reservation
+        plan_segment = min(SEGMENT_SECONDS if STREAMING_UPLOAD else self.total_seconds,
+                           max_part_seconds(self.bitrate, MAX_PART_SIZE, PART_SIZE_HEADROOM))
+        self.plan = plan_recording(
+            self.bitrate, self.total_seconds, plan_segment,
+            plan_segment < self.total_seconds and not self.fit, self.fit
+        )
+        print(f"[Recorder] Expecting ~{self.plan['size'] / 1024 ** 3:.2f} GB in {self.plan['parts']} part(s), "
+              f"reserving {self.plan['disk'] / 1024 ** 3:.2f} GB of disk")
+
+        # Wait for a free ingest slot; time spent queued past the start time
+        # comes off the end of the recording so it still finishes when the
+        # user expects it to.
+        begin_at = self.start_at or time.time()
+        if not await self.admit():
+            return False
+        late = time.time() - begin_at
+        if late < 0:
+            # Pre-warmed: everything is ready, start on the dot
+            await asyncio.sleep(-late)
+        elif late >= 1:
+            self.total_seconds -= int(late)
+            if self.total_seconds <= 0:
+                self.fail("❌ Recording window passed while queued", total=1)
+                return False
+        if self.start_at or late >= 1:
+            self.now = datetime.now(self.ist)
+            self.start_time_str = self.now.strftime("%d-%m-%Y %H:%M:%S")
+        return True
+
+    async def admit(self, ingest: bool = True) -> bool:
+        try:
+            await admission.admit(
+                self.admission_id, self.bitrate, self.show_queue_position, self.plan['disk'], self.disk_used,
+                ingest=ingest
+            )
+            return True
+        except AdmissionRejected as e:
+            self.fail(f"❌ {e}")
+            return False
+
+    def start_uploads(self):
+        """Start the upload worker and the progress rendering; capture begins right after"""
+        segment_time = SEGMENT_SECONDS if STREAMING_UPLOAD else self.total_seconds
+        self.segment_time = min(segment_time, max_part_seconds(self.bitrate, MAX_PART_SIZE, PART_SIZE_HEADROOM))
+        # Timeshift parts are short ring slots; they are joined at the end instead
+        # Fitting needs the whole recording, so nothing is uploaded early
+        self.numbered_parts = self.segment_time < self.total_seconds and self.buffer is None and not self.fit
+        self.recording_id = add_active_recording({
+            'title': self.title,
+            'channel': self.channel,
+            'duration': self.total_seconds,
+            'user_id': self.chat_id,
+            'stats': self.stats
         })
 
-
-        cmd = [
-            "ffmpeg",
-            "-y",
-            "-loglevel", "error",
-            "-headers", f"User-Agent: Mozilla/5.0\r\nReferer: https://www.tataplay.com/\r\nOrigin: https://www.tataplay.com",
-            "-i", stream_url,
-            "-t", duration,
-            "-map", "0:v?",
-            "-map", "0:a?",
-            "-map", "0:s?",
-            "-c", "copy",
-            temp_path
-        ]
-
-        process = await asyncio.create_subprocess_exec(*cmd)
-        return_code = await process.wait()
-        await progress_task  # Ensure progress bar completes
-
-        if return_code != 0:
-            if not error_occurred:
-                error_msg = "❌ Recording failed (FFmpeg error)"
-                caption_text = caption_recording_progress(
-                    title, channel, total_seconds, start_time_str,
-                    time.time() - start_ts, end_ts - time.time(),
-                    error_msg
-                )
-                await update_caption(caption_text)
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        # Finished parts are uploaded while ffmpeg keeps writing the next one
+        self.upload_task = asyncio.create_task(upload_worker(
+            self.bot, self.upload_queue, self.title, self.channel, self.now, self.chat_id, self.stats,
+            self.uploading
+        ))
+        self.capture_started = time.time()
+        self.deadline = self.capture_started + self.total_seconds
+        # Have the uploader session connected by the time the last part is ready
+        self.warmup = asyncio.create_task(warm_up_uploader(self.deadline - UPLOADER_WARMUP_SECONDS))
+        progress_ticker.set_render(self.progress_id, self.render_progress)
+
+    async def on_segment(self, segment):
+        if self.buffer:
+            self.media_done += segment['duration']
+        segment['start'] += self.attempt_offset
+        segment['end'] += self.attempt_offset
+        self.next_part = segment['index'] + 1
+        segment['session'] = self.session
+        if self.numbered_parts:
+            segment['part'] = segment['index'] + 1
+            await self.upload_queue.put(segment)
+        else:
+            self.held.append(segment)
+
+    # Progress follows the media time ffmpeg reports on its -progress
+    # pipe, so the bar and ETA stay honest when the ingest runs slow.
+    def render_progress(self):
+        if self.following:
+            elapsed = time.time() - self.capture_started
+            return caption_recording_progress(
+                self.title, self.channel, self.total_seconds, self.start_time_str,
+                elapsed, max(0, self.total_seconds - elapsed),
+                stats=self.sharing.stats, status="🔗 Sharing an ingest with another recording"
+            )
+        done = self.media_done + self.stats.out_time
+        return caption_recording_progress(
+            self.title, self.channel, self.total_seconds, self.start_time_str,
+            done, max(0, self.total_seconds - done), stats=self.stats, status=self.status
+        )
+
+    async def capture_live(self):
+        """
+        Supervisor: when the ingest dies or stalls, resolve the stream again and
+        record the remaining time as new parts that continue the numbering.
+        Single-file recordings hold their pieces and are stitched at the end.
+        """
+        # Another recording already ingests this stream: follow it instead of
+        # opening a second connection, and take over if it stops first
+        self.sharing = ingest_hub.find(self.ingest['stream_url'])
+        if self.sharing and not await self.follow_shared():
             return
 
-        sanitized_title = re.sub(r'[<>:"/\\|?*]', '_', title)
-        sanitized_channel = re.sub(r'[<>:"/\\|?*]', '_', channel)
-        
-        time_format = "%H-%M-%S"
-        
-        final_filename = f"{sanitized_title}.{sanitized_channel}.{now.strftime(time_format)}-{end_time.strftime(time_format)}.{now.strftime('%d-%m-%Y')}.IPTV.WEB-DL.@Krinry.mkv"
-        output_path = os.path.join(RECORDINGS_DIR, final_filename)
-        os.rename(temp_path, output_path)
-
-        thumbnail_path = os.path.join(RECORDINGS_DIR, f"{final_filename}.jpg")
-        thumbnail_cmd = [
-            "ffmpeg",
-            "-y",
-            "-loglevel", "error",
-            "-i", output_path,
-            "-ss", "00:00:01",
-            "-vframes", "1",
-            "-q:v", "2",
-            "-vf", "scale=320:-1",
-            thumbnail_path
-        ]
-        await (await asyncio.create_subprocess_exec(*thumbnail_cmd)).wait()
-
-        readable_duration = await format_duration(duration)
-        readable_size = await format_bytes(os.path.getsize(output_path))
-
-        caption = f"""`📁 Filename: {final_filename}
-⏱ Duration: {readable_duration}
-💾 File-Size: {readable_size}`
-☎️ @Requestadminuser_bot"""
-
-        max_retries = 3
-        for attempt in range(max_retries):
+        # Only a recording that captures itself is findable; a follower whose
+        # window is over must not replace the owner's session
+        self.session = ingest_hub.open(self.ingest['stream_url'], self.capture_started, self.stats)
+        while True:
+            remaining = int(self.deadline - time.time())
+            if remaining <= 0 or self.gave_up:
+                break
+            attempt_started = time.time()
+            self.attempt_offset = attempt_started - self.capture_started
+            attempt_list = os.path.join(RECORDINGS_DIR, f"{self.temp_prefix}_{self.reconnects}.csv")
+            self.stats.restart()
+
+            return_code, stalled = await run_capture(
+                self.ingest['stream_url'], remaining, self.segment_pattern, attempt_list,
+                self.segment_time, self.next_part, self.stats, self.on_segment, self.ingest['fetcher']
+            )
+            self.media_done += self.stats.out_time
+            await cleanup_files([attempt_list])
+            self.status = None
+
+            if return_code == 0 and not stalled and self.stats.out_time >= remaining - COMPLETE_TOLERANCE:
+                break
+            if time.time() >= self.deadline - COMPLETE_TOLERANCE:
+                break
+
+            reason = "no data" if stalled else (self.stats.last_error or f"ffmpeg exited with {return_code}")
+            if not await self.reconnect(reason, quick_failure=time.time() - attempt_started < STALL_TIMEOUT):
+                break
+            self.gaps.append(time.time() - attempt_started - self.stats.out_time)
+        ingest_hub.end_capture(self.session)
+
+    async def follow_shared(self) -> bool:
+        """Follow the shared ingest; True if it ended early and the rest is ours to capture"""
+        admission.release(self.admission_id)
+        self.follower = self.sharing.follow(
+            self.upload_queue, self.capture_started, self.deadline, os.path.join(RECORDINGS_DIR, self.temp_prefix)
+        )
+        print(f"[Recorder] {self.channel} is already being recorded, sharing its ingest")
+        if self.ingest['fetcher']:
+            await self.ingest['fetcher'].close()
+            self.ingest['fetcher'] = None
+        self.following = True
+        await self.sharing.wait_capture(self.follower)
+        self.following = False
+        self.stats.adopt_facts(self.sharing.stats)
+        self.media_done = min(time.time(), self.deadline) - self.capture_started
+        if self.deadline - time.time() <= COMPLETE_TOLERANCE:
+            return False
+        # The other recording ended first; record the rest ourselves
+        try:
+            await admission.admit(
+                self.admission_id, self.bitrate, self.show_queue_position, self.plan['disk'], self.disk_used
+            )
+        except AdmissionRejected as e:
+            self.gave_up = str(e)
+            return False
+        return True
+
+    async def reconnect(self, reason: str, quick_failure: bool) -> bool:
+        """
+        Resolve the stream again after a failed attempt.
+
+        A failure right away suggests a dead or expired link, so the playlist is
+        re-read first. A stream that cannot be resolved is retried with backoff
+        until MAX_RECONNECTS is used up (then `gave_up` is set). False means
+        capture stops here.
+        """
+        while True:
+            self.reconnects += 1
+            if self.reconnects > MAX_RECONNECTS:
+                self.gave_up = reason
+                return False
+            print(f"[Recorder] Ingest of {self.channel} ended early ({reason}), "
+                  f"reconnecting ({self.reconnects}/{MAX_RECONNECTS})")
+            self.status = f"🔁 Reconnecting ({self.reconnects}/{MAX_RECONNECTS})..."
+
+            if quick_failure:
+                fresh_url = await m3u_manager.refresh_channel_url(self.url)
+                if fresh_url:
+                    self.url = fresh_url
+                await asyncio.sleep(min(2 ** self.reconnects, 30))
+            if time.time() >= self.deadline - COMPLETE_TOLERANCE:
+                # Nothing left to record; the parts so far are the recording
+                return False
+
+            if self.ingest['fetcher']:
+                await self.ingest['fetcher'].close()
+                self.ingest['fetcher'] = None
             try:
-                new_message_id = await send_video_pyrogram(
-                    output_path, 
-                    caption, 
-                    thumbnail=thumbnail_path, 
-                    duration=int(total_seconds), 
-                    chat_id=chat_id,
-                )
-                if new_message_id:
-                    await bot.copy_message(chat_id=chat_id, from_chat_id=STORE_CHANNEL_ID, message_id=new_message_id)
-                    remove_active_recording(recording_id)
-                    break
-            except Exception as upload_error:
-                if attempt == max_retries - 1:
-                    error_msg = f"❌ Upload failed: {str(upload_error)}"
-                    caption_text = caption_recording_progress(
-                        title, channel, total_seconds, start_time_str,
-                        time.time() - start_ts, end_ts - time.time(),
-                        error_msg
-                    )
-                    await update_caption(caption_text)
-                await asyncio.sleep(5)
-
+                self.ingest = await prepare_ingest(self.url)
+                return True
+            except Exception as e:
+                reason = f"could not resolve the stream again: {e}"
+                print(f"[Recorder] {self.channel}: {reason}")
+                quick_failure = True
+
+    async def fit_held(self):
+        """Re-encode the held recording to `fit` bytes; on failure the parts are uploaded as captured"""
+        self.status = "🗜 Transcoding to fit the target size..."
+        held = self.held
+        source = held[0]
+        fitted_path = os.path.join(RECORDINGS_DIR, f"{self.temp_prefix}_fitted{OUTPUT_EXTENSION}")
         try:
-            os.remove(output_path)
-            os.remove(thumbnail_path)
+            if len(held) > 1:
+                source = await concat_segments(
+                    held, os.path.join(RECORDINGS_DIR, f"{self.temp_prefix}_whole{OUTPUT_EXTENSION}")
+                )
+            await transcode_to_fit(source['path'], fitted_path, source['duration'], self.fit)
+            await cleanup_files(list({seg['path'] for seg in held} | {source['path']}))
+            self.held = [{**source, 'path': fitted_path, 'session': held[0].get('session')}]
         except Exception as e:
-            print(f"Error cleaning up files: {e}")
-        # Add this when recording finishes (both success and error cases)
-        
-
-
-    except Exception as e:
-        error_msg = f"❌ Error: {str(e)}"
-        print(error_msg)
-        if recording_message and 'start_ts' in locals() and 'total_seconds' in locals():
-            caption_text = caption_recording_progress(
-                title, channel, total_seconds, start_time_str,
-                time.time() - start_ts, end_ts - time.time(),
-                error_msg
-            )
-            
-            await update_caption(caption_text)
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.remove(temp_path)
+            # The captured parts are still there; upload them as usual
+            print(f"[Recorder] Transcode failed, uploading the recording as captured: {e}")
+            await cleanup_files([fitted_path] + ([source['path']] if source is not held[0] else []))
+        self.status = None
+
+    async def queue_held(self):
+        """Join the held parts into as few files as fit in MAX_PART_SIZE and queue them for upload"""
+        finished = []
+        groups = group_by_size(self.held, int(MAX_PART_SIZE * PART_SIZE_HEADROOM))
+        for number, group in enumerate(groups, 1):
+            if len(group) == 1:
+                finished.extend(group)
+                continue
+            joined_path = os.path.join(RECORDINGS_DIR, f"{self.temp_prefix}_joined{number}{OUTPUT_EXTENSION}")
+            try:
+                joined = await concat_segments(group, joined_path)
+                joined['session'] = group[0].get('session')
+                finished.append(joined)
+                await cleanup_files([seg['path'] for seg in group])
+            except Exception as e:
+                print(f"[Recorder] Stitching failed, uploading pieces separately: {e}")
+                finished.extend(group)
+        for number, segment in enumerate(finished, 1):
+            segment['part'] = number if len(finished) > 1 else None
+            await self.upload_queue.put(segment)
+
+
+async def start_recording(url: str, duration: str, channel: str, title: str, chat_id: int,
+                          message_id: int = None, start_at: float = None, rewind: int = None,
+                          fit: int = None):
+    """
+    Record `url` for `duration` and upload the result to `chat_id`.
+
+    With `start_at` (a unix timestamp) the call is a pre-warm: the stream is
+    resolved, its variant picked and the uploader connected right away, and
+    capture begins exactly at `start_at`. With `rewind` the recording starts
+    that many seconds in the past, read from the channel's timeshift buffer.
+    With `fit` (bytes) a recording that comes out larger is re-encoded to that
+    size before it is uploaded.
+    """
+    try:
+        if ":" in duration:
+            h, m, s = map(int, duration.split(":"))
+            total_seconds = h * 3600 + m * 60 + s
+        else:
+            total_seconds = int(duration)
+    except ValueError:
+        await get_bot().send_message(chat_id, "⚠️ Invalid duration format. Use HH:MM:SS.")
+        return
+
+    recording = Recording(url, total_seconds, channel, title, chat_id, message_id, start_at, rewind, fit)
+    await recording.run()
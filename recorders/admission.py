@@ -0,0 +1,192 @@
+import os
+import time
+import shutil
+import asyncio
+from typing import Callable, Awaitable, Dict, List, Optional
+from config import (
+    RECORDINGS_DIR, MAX_CONCURRENT_RECORDINGS, MAX_INGEST_BITRATE,
+    MIN_FREE_DISK, MAX_LOAD_PER_CPU, MAX_QUEUED_RECORDINGS
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a recording cannot be queued at all"""
+
+
+class DiskReservation:
+    """Disk space promised to one job; `usage` reports how much of it the job has written so far"""
+
+    def __init__(self, size: int, usage: Optional[Callable[[], int]] = None):
+        self.size = size
+        self.usage = usage
+
+    @property
+    def outstanding(self) -> int:
+        used = self.usage() if self.usage else 0
+        return max(0, self.size - used)
+
+
+class AdmissionController:
+    """
+    Global gate in front of every ffmpeg ingest.
+
+    A job is admitted only while the box has room for it: fewer than
+    MAX_CONCURRENT_RECORDINGS ingests, total estimated bitrate within
+    MAX_INGEST_BITRATE, at least MIN_FREE_DISK free in RECORDINGS_DIR and a
+    load average below MAX_LOAD_PER_CPU. Otherwise the job waits in a FIFO
+    queue (and is told its position), or is rejected when the queue is full.
+
+    Jobs also reserve the disk space their plan says they will need. Free
+    space counts as available only after the part of every reservation that
+    has not been written yet is taken off, so jobs that start together cannot
+    overcommit the volume. Jobs that open no ingest of their own (recordings
+    read from the timeshift buffer) pass through the same queue with
+    `ingest=False`: they are held to the disk and CPU checks only and take no
+    ingest slot.
+    """
+
+    recheck_interval = 5  # Disk and CPU can recover without anyone releasing a slot
+
+    def __init__(self):
+        self.active: Dict[str, int] = {}  # job_id -> estimated bitrate (bits/s)
+        self.reservations: Dict[str, DiskReservation] = {}  # job_id -> disk promised to it
+        self.waiting: List[str] = []
+        self._changed = asyncio.Event()
+
+    @property
+    def active_bitrate(self) -> int:
+        return sum(self.active.values())
+
+    def free_disk(self) -> int:
+        os.makedirs(RECORDINGS_DIR, exist_ok=True)
+        return shutil.disk_usage(RECORDINGS_DIR).free
+
+    @property
+    def reserved_disk(self) -> int:
+        """Reserved space that running jobs have not written yet"""
+        return sum(reservation.outstanding for reservation in self.reservations.values())
+
+    def available_disk(self) -> int:
+        return self.free_disk() - self.reserved_disk
+
+    def load_per_cpu(self) -> float:
+        try:
+            return os.getloadavg()[0] / (os.cpu_count() or 1)
+        except (OSError, AttributeError):
+            return 0.0
+
+    def blocked_reason(self, bitrate: int, reserve: int = 0, ingest: bool = True) -> Optional[str]:
+        """Why a job with `bitrate` needing `reserve` bytes of disk cannot start right now, or None if it can"""
+        if ingest and len(self.active) >= MAX_CONCURRENT_RECORDINGS:
+            return f"{len(self.active)} recordings already running"
+        # A single stream above the budget still gets to run on an idle box
+        if ingest and MAX_INGEST_BITRATE and self.active and self.active_bitrate + bitrate > MAX_INGEST_BITRATE:
+            return "bandwidth budget in use"
+        if self.available_disk() - reserve < MIN_FREE_DISK:
+            return "low disk space" if not reserve else f"waiting for {reserve / 1024 ** 3:.1f} GB of disk"
+        if MAX_LOAD_PER_CPU and self.load_per_cpu() > MAX_LOAD_PER_CPU:
+            return "server busy"
+        return None
+
+    async def admit(self, job_id: str, bitrate: int,
+                    on_queued: Optional[Callable[[int, str], Awaitable[None]]] = None,
+                    reserve: int = 0, usage: Optional[Callable[[], int]] = None,
+                    ingest: bool = True) -> float:
+        """
+        Wait until `job_id` may start its ingest.
+
+        Args:
+            job_id: Unique id of the recording.
+            bitrate: Estimated ingest bitrate in bits/s.
+            on_queued: Called with (queue position, reason) whenever either changes.
+            reserve: Peak disk space (bytes) the job will need.
+            usage: Returns the bytes the job has written so far, which no longer
+                need to be held back.
+            ingest: False for a job that opens no upstream connection; it
+                only waits for disk and CPU.
+
+        Returns:
+            Seconds spent waiting in the queue.
+
+        Raises:
+            AdmissionRejected: If the queue is already full, or the volume could
+                never hold the job.
+        """
+        queued_at = time.time()
+        # A fresh install has no recordings directory until the first capture
+        os.makedirs(RECORDINGS_DIR, exist_ok=True)
+        capacity = shutil.disk_usage(RECORDINGS_DIR).total if reserve else 0
+        if reserve and reserve + MIN_FREE_DISK > capacity:
+            raise AdmissionRejected(
+                f"Recording needs {reserve / 1024 ** 3:.1f} GB of disk, "
+                f"the volume only holds {capacity / 1024 ** 3:.1f} GB"
+            )
+        if not self.waiting and self.blocked_reason(bitrate, reserve, ingest) is None:
+            self._start(job_id, bitrate, reserve, usage, ingest)
+            return 0.0
+
+        if len(self.waiting) >= MAX_QUEUED_RECORDINGS:
+            raise AdmissionRejected(f"Recording queue is full ({len(self.waiting)} waiting)")
+
+        self.waiting.append(job_id)
+        last_notice = None
+        try:
+            while True:
+                # Cleared before checking, so a release during the checks is not missed
+                self._changed.clear()
+                position = self.waiting.index(job_id) + 1
+                reason = self.blocked_reason(bitrate, reserve, ingest)
+                # Strict FIFO: only the head of the queue may take a free slot
+                if position == 1 and reason is None:
+                    self.waiting.remove(job_id)
+                    self._start(job_id, bitrate, reserve, usage, ingest)
+                    self._notify()
+                    return time.time() - queued_at
+
+                if on_queued and (position, reason) != last_notice:
+                    last_notice = (position, reason)
+                    try:
+                        await on_queued(position, reason or "waiting for earlier jobs")
+                    except Exception as e:
+                        print(f"[Admission] Queue notice failed: {e}")
+
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=self.recheck_interval)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if job_id in self.waiting:
+                self.waiting.remove(job_id)
+                self._notify()
+            raise
+
+    def _start(self, job_id: str, bitrate: int, reserve: int, usage: Optional[Callable[[], int]],
+               ingest: bool = True):
+        if ingest:
+            self.active[job_id] = bitrate
+        if reserve:
+            self.reservations[job_id] = DiskReservation(reserve, usage)
+
+    def release(self, job_id: str):
+        """Free the slot and disk held by `job_id` (safe to call for jobs never admitted)"""
+        reserved = self.reservations.pop(job_id, None)
+        if self.active.pop(job_id, None) is not None or reserved is not None:
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+
+    def snapshot(self) -> dict:
+        return {
+            'active': len(self.active),
+            'max_active': MAX_CONCURRENT_RECORDINGS,
+            'bitrate': self.active_bitrate,
+            'max_bitrate': MAX_INGEST_BITRATE,
+            'queued': len(self.waiting),
+            'free_disk': self.free_disk(),
+            'reserved_disk': self.reserved_disk,
+            'load_per_cpu': self.load_per_cpu(),
+        }
+
+
+admission = AdmissionController()
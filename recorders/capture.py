@@ -0,0 +1,140 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from config import INGEST_ENGINE, STALL_TIMEOUT
+from recorders.hls_fetcher import HLSFetcher
+from recorders.recorder_utils import resolve_stream, estimate_stream_bitrate
+from recorders.segments import segment_output_args, watch_segments, stream_map_args
+from recorders.ffmpeg_progress import FFmpegProgress, PROGRESS_ARGS, LOG_ARGS, start_readers
+
+# A run that ends within this many seconds of its target counts as complete
+COMPLETE_TOLERANCE = 5
+FFMPEG_HEADERS = "User-Agent: Mozilla/5.0\r\nReferer: https://www.tataplay.com/\r\nOrigin: https://www.tataplay.com"
+
+
+async def stop_process(process: asyncio.subprocess.Process, grace: float = 10):
+    """Ask ffmpeg to finish (it closes the open part on SIGTERM), kill it if it hangs"""
+    if process.returncode is not None:
+        return
+    process.terminate()
+    try:
+        await asyncio.wait_for(process.wait(), timeout=grace)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+
+async def prepare_ingest(url: str) -> Dict:
+    """
+    Do the slow start-up work of an ingest before capture begins.
+
+    Redirects are resolved and the best HLS variant is picked, so ffmpeg opens
+    one media playlist instead of probing every variant. With the hls engine
+    the fetcher is returned with its session open and playlist loaded.
+
+    Returns:
+        Dict with stream_url, bitrate (bits/s or None) and fetcher (or None).
+    """
+    stream_url = await resolve_stream(url)
+    fetcher = HLSFetcher(stream_url)
+    bitrate = None
+    ready = False
+    try:
+        await fetcher.prepare()
+        ready = True
+    except Exception as e:
+        print(f"[Capture] Could not pre-load {stream_url} as HLS: {e}")
+
+    if fetcher.media_url:
+        # ffmpeg copes with variants the hls engine rejects (e.g. encrypted ones)
+        stream_url = fetcher.media_url
+        if fetcher.variant:
+            bitrate = fetcher.variant['bandwidth'] or None
+    if not (ready and INGEST_ENGINE == "hls"):
+        await fetcher.close()
+        fetcher = None
+    if bitrate is None:
+        bitrate = await estimate_stream_bitrate(stream_url)
+    return {'stream_url': stream_url, 'bitrate': bitrate, 'fetcher': fetcher}
+
+
+async def watch_for_stall(process: asyncio.subprocess.Process, stats: FFmpegProgress,
+                          timeout: float = STALL_TIMEOUT) -> bool:
+    """Stop ffmpeg when its media time has not moved for `timeout` seconds; True if it did"""
+    while process.returncode is None:
+        await asyncio.sleep(5)
+        if process.returncode is None and stats.stalled_for > timeout:
+            print(f"[Capture] No output for {int(stats.stalled_for)}s, stopping ffmpeg")
+            stats.stalled = True
+            await stop_process(process)
+            return True
+    return False
+
+
+async def run_capture(stream_url: str, seconds: int, segment_pattern: str, segment_list: str,
+                      segment_time: float, start_number: int, stats: FFmpegProgress,
+                      on_segment: Callable[[Dict], Awaitable[None]],
+                      fetcher: Optional[HLSFetcher] = None) -> Tuple[int, bool]:
+    """
+    Run one ffmpeg ingest of `stream_url` for at most `seconds`.
+
+    Every part ffmpeg closes is passed to `on_segment` right away. Part numbers
+    start at `start_number`, so a restarted capture continues the sequence.
+    A `fetcher` from `prepare_ingest` is used as is; otherwise the hls engine
+    prepares a new one here.
+
+    Returns:
+        (ffmpeg return code, whether the stall watchdog had to stop it)
+    """
+    if fetcher is None and INGEST_ENGINE == "hls":
+        fetcher = HLSFetcher(stream_url)
+        try:
+            await fetcher.prepare()
+        except Exception as e:
+            print(f"[Capture] HLS engine not usable for {stream_url} ({e}), using ffmpeg")
+            fetcher = None
+
+    if fetcher:
+        # Segments arrive on stdin already in order; ffmpeg only remuxes
+        input_args = ["-i", "pipe:0"]
+    else:
+        input_args = ["-headers", FFMPEG_HEADERS, "-i", stream_url]
+
+    cmd = [
+        "ffmpeg",
+        "-y",
+        *LOG_ARGS,
+        *PROGRESS_ARGS,
+        *input_args,
+        "-t", str(seconds),
+        *stream_map_args(),
+        "-c", "copy",
+        *segment_output_args(segment_pattern, segment_list, segment_time, start_number),
+    ]
+
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if fetcher else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stats.write_parts(segment_pattern, start_number)
+    tasks = start_readers(process, stats)
+    if fetcher:
+        tasks.append(asyncio.create_task(fetcher.feed(process.stdin)))
+    watchdog = asyncio.create_task(watch_for_stall(process, stats))
+
+    try:
+        async for segment in watch_segments(segment_list, process, start_index=start_number):
+            stats.part_closed(segment['path'])
+            await on_segment(segment)
+        return_code = await process.wait()
+    finally:
+        if process.returncode is None:
+            await stop_process(process, grace=2)
+        if fetcher and not tasks[-1].done():
+            tasks[-1].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if not watchdog.done():
+            watchdog.cancel()
+
+    return return_code, stats.stalled
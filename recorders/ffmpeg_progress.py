@@ -0,0 +1,227 @@
+import os
+import re
+import time
+import asyncio
+from collections import deque
+from typing import Optional
+
+# Machine readable progress on stdout instead of the human stats line on stderr
+PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats"]
+# Info level (with level tags) so the input stream layout is printed once at start-up;
+# the tags let us keep real errors apart from informational chatter.
+LOG_ARGS = ["-hide_banner", "-loglevel", "level+info"]
+
+LEVEL_RE = re.compile(r'\[(info|warning|error|fatal|panic)\] ')
+STREAM_RE = re.compile(r'Stream #\d+:\d+[^:]*: (Video|Audio|Subtitle): (\w+)')
+RESOLUTION_RE = re.compile(r', (\d{2,5})x(\d{2,5})[ ,]')
+
+
+def _parse_float(value: str, suffix: str = "") -> Optional[float]:
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class FFmpegProgress:
+    """Live stats of one ffmpeg process, fed from its `-progress` output"""
+
+    def __init__(self):
+        self.out_time = 0.0      # Seconds of media written so far
+        self._reported_size = 0      # total_size from -progress, N/A for the segment muxer
+        self._reported_bitrate = 0.0
+        self._part_pattern = None    # Set by `write_parts`; the output is then measured on disk
+        self._part_index = 0
+        self._part_wrap = 0
+        self._closed_bytes = 0
+        self.speed = 0.0         # Media seconds per wall-clock second
+        self.state = "starting"  # starting / continue / end
+        self.updated_at = time.time()
+        self.started_at = time.time()
+        # Last time the written media time moved on. The segment muxer every capture
+        # goes through reports total_size=N/A, so output size cannot tell liveness
+        self.advanced_at = time.time()
+        self.stalled = False        # Set when a watchdog gave up on this process
+        self.stderr_tail = deque(maxlen=20)
+        # Stream facts of the input, filled in from ffmpeg's start-up log
+        self.video_codec = None
+        self.audio_codec = None
+        self.width = 0
+        self.height = 0
+        self._in_input_section = False
+
+    def restart(self):
+        """Reset the counters for a new ffmpeg run of the same recording; stream facts are kept"""
+        self.out_time = 0.0
+        self._reported_size = 0
+        self._reported_bitrate = 0.0
+        self._part_pattern = None
+        self._closed_bytes = 0
+        self.speed = 0.0
+        self.state = "starting"
+        self.updated_at = self.started_at = self.advanced_at = time.time()
+        self.stalled = False
+        self._in_input_section = False
+
+    def update(self, key: str, value: str):
+        if key == "out_time_us" or key == "out_time_ms":
+            # Both keys are in microseconds (out_time_ms is misnamed upstream)
+            micros = _parse_float(value)
+            if micros is not None and micros >= 0:
+                if micros / 1_000_000 > self.out_time:
+                    self.advanced_at = time.time()
+                self.out_time = micros / 1_000_000
+        elif key == "total_size":
+            size = _parse_float(value)
+            if size is not None:
+                self._reported_size = int(size)
+        elif key == "bitrate":
+            bitrate = _parse_float(value, "kbits/s")
+            if bitrate is not None:
+                self._reported_bitrate = bitrate
+        elif key == "speed":
+            speed = _parse_float(value, "x")
+            if speed is not None:
+                self.speed = speed
+        elif key == "progress":
+            self.state = value.strip()
+            self.updated_at = time.time()
+
+    def write_parts(self, pattern: str, index: int, wrap: int = 0):
+        """
+        Measure the output on disk; the segment muxer reports total_size=N/A.
+
+        `pattern % index` is the part ffmpeg writes first. Each `part_closed`
+        moves on to the next number (within a ring of `wrap` when set).
+        """
+        self._part_pattern = pattern
+        self._part_index = index
+        self._part_wrap = wrap
+        self._closed_bytes = 0
+
+    def part_closed(self, path: str):
+        """Count a part ffmpeg has finished; call before it is moved or deleted"""
+        try:
+            self._closed_bytes += os.path.getsize(path)
+        except OSError:
+            pass
+        self._part_index += 1
+        if self._part_wrap:
+            self._part_index %= self._part_wrap
+
+    @property
+    def total_size(self) -> int:
+        """Bytes written so far"""
+        if self._part_pattern is None:
+            return self._reported_size
+        try:
+            writing = os.path.getsize(self._part_pattern % self._part_index)
+        except OSError:
+            writing = 0
+        return self._closed_bytes + writing
+
+    @property
+    def bitrate(self) -> float:
+        """kbit/s of the output; worked out from size and media time when ffmpeg reports none"""
+        if self._reported_bitrate or self.out_time <= 0:
+            return self._reported_bitrate
+        return self.total_size * 8 / self.out_time / 1000
+
+    def log_line(self, text: str):
+        match = LEVEL_RE.search(text)
+        level = match.group(1) if match else "error"
+        message = text[match.end():] if match else text
+
+        if message.startswith("Input #"):
+            self._in_input_section = True
+        elif message.startswith("Output #") or message.startswith("Stream mapping"):
+            self._in_input_section = False
+        elif self._in_input_section:
+            self._parse_stream(message)
+
+        if level != "info":
+            prefix = text[:match.start()] if match else ""
+            self.stderr_tail.append(f"{prefix}{message}".strip())
+
+    def _parse_stream(self, message: str):
+        stream = STREAM_RE.search(message)
+        if not stream:
+            return
+        kind, codec = stream.groups()
+        if kind == "Video":
+            resolution = RESOLUTION_RE.search(message + " ")
+            width, height = (int(v) for v in resolution.groups()) if resolution else (0, 0)
+            # Master playlists list every variant; describe the best one
+            if self.video_codec is None or width * height > self.width * self.height:
+                self.video_codec, self.width, self.height = codec, width, height
+        elif kind == "Audio" and self.audio_codec is None:
+            self.audio_codec = codec
+
+    def adopt_facts(self, other: "FFmpegProgress"):
+        """Take the stream facts of another process reading the same input"""
+        if other.video_codec:
+            self.video_codec, self.width, self.height = other.video_codec, other.width, other.height
+        self.audio_codec = self.audio_codec or other.audio_codec
+
+    @property
+    def resolution(self) -> str:
+        return f"{self.width}x{self.height}" if self.width else ""
+
+    def eta(self, total_seconds: float) -> float:
+        """Wall-clock seconds until `total_seconds` of media have been written"""
+        remaining = max(0.0, total_seconds - self.out_time)
+        return remaining / self.speed if self.speed > 0 else remaining
+
+    @property
+    def stalled_for(self) -> float:
+        """Seconds since the written media time last moved on"""
+        return time.time() - self.advanced_at
+
+    @property
+    def last_error(self) -> str:
+        return self.stderr_tail[-1] if self.stderr_tail else ""
+
+    def as_dict(self) -> dict:
+        return {
+            'out_time': self.out_time,
+            'total_size': self.total_size,
+            'bitrate': self.bitrate,
+            'speed': self.speed,
+            'state': self.state,
+            'video_codec': self.video_codec,
+            'audio_codec': self.audio_codec,
+            'resolution': self.resolution,
+        }
+
+
+async def read_progress(stream: asyncio.StreamReader, progress: FFmpegProgress):
+    """Consume `key=value` lines from ffmpeg's `-progress pipe:1` until EOF"""
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        key, sep, value = line.decode(errors="replace").partition("=")
+        if sep:
+            progress.update(key.strip(), value)
+
+
+async def read_stderr(stream: asyncio.StreamReader, progress: FFmpegProgress):
+    """Drain ffmpeg's stderr so it never blocks, picking up stream facts and errors"""
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        text = line.decode(errors="replace").rstrip()
+        if text.strip():
+            progress.log_line(text)
+
+
+def start_readers(process: asyncio.subprocess.Process, progress: FFmpegProgress):
+    """Attach the progress and stderr readers to a process started with stdout/stderr=PIPE"""
+    return [
+        asyncio.create_task(read_progress(process.stdout, progress)),
+        asyncio.create_task(read_stderr(process.stderr, progress)),
+    ]
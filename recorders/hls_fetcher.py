@@ -0,0 +1,234 @@
+import re
+import time
+import asyncio
+import aiohttp
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+from config import HLS_FETCH_CONCURRENCY, HLS_SEGMENT_RETRIES
+from recorders.recorder_utils import STREAM_HEADERS
+
+LIVE_START_SEGMENTS = 3  # Like ffmpeg's live_start_index, begin a few segments behind the live edge
+
+
+class HLSUnsupported(Exception):
+    """The playlist uses a feature this engine does not handle; use ffmpeg instead"""
+
+
+def parse_master_playlist(text: str, base_url: str) -> List[Dict]:
+    """Variants of a master playlist as dicts with bandwidth, resolution and url"""
+    variants = []
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if not line.startswith("#EXT-X-STREAM-INF:"):
+            continue
+        bandwidth = re.search(r'\bBANDWIDTH=(\d+)', line)
+        resolution = re.search(r'\bRESOLUTION=(\d+x\d+)', line)
+        uri = next((l.strip() for l in lines[i + 1:] if l.strip() and not l.startswith("#")), None)
+        if uri:
+            variants.append({
+                'bandwidth': int(bandwidth.group(1)) if bandwidth else 0,
+                'resolution': resolution.group(1) if resolution else "",
+                'url': urljoin(base_url, uri),
+            })
+    return variants
+
+
+def parse_media_playlist(text: str, base_url: str) -> Dict:
+    """Segments of a media playlist, numbered by media sequence"""
+    sequence = 0
+    match = re.search(r'#EXT-X-MEDIA-SEQUENCE:(\d+)', text)
+    if match:
+        sequence = int(match.group(1))
+    target = re.search(r'#EXT-X-TARGETDURATION:(\d+)', text)
+
+    for method in re.findall(r'#EXT-X-KEY:.*?METHOD=([A-Z0-9-]+)', text):
+        if method != "NONE":
+            raise HLSUnsupported(f"encrypted segments ({method})")
+    if "#EXT-X-BYTERANGE" in text:
+        raise HLSUnsupported("byte-range segments")
+
+    init = re.search(r'#EXT-X-MAP:.*?URI="([^"]+)"', text)
+    segments = []
+    duration = 0.0
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line[8:].split(",")[0] or 0)
+        elif line and not line.startswith("#"):
+            segments.append({'sequence': sequence, 'duration': duration, 'url': urljoin(base_url, line)})
+            sequence += 1
+
+    return {
+        'segments': segments,
+        'target_duration': int(target.group(1)) if target else 6,
+        'endlist': "#EXT-X-ENDLIST" in text,
+        'init_url': urljoin(base_url, init.group(1)) if init else None,
+    }
+
+
+class HLSFetcher:
+    """
+    Pull an HLS stream with aiohttp and feed it to ffmpeg's stdin in order.
+
+    The media playlist is polled every half target duration. New segments are
+    downloaded concurrently over one pooled session (HLS_FETCH_CONCURRENCY at a
+    time) and each one is retried on its own, so one slow or failed segment
+    costs a few seconds of video instead of ending the recording.
+    """
+
+    def __init__(self, url: str, concurrency: int = HLS_FETCH_CONCURRENCY, retries: int = HLS_SEGMENT_RETRIES):
+        self.url = url
+        self.media_url: Optional[str] = None
+        self.variant: Optional[Dict] = None
+        self.concurrency = concurrency
+        self.retries = retries
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.segments_fetched = 0
+        self.segments_failed = 0
+        self._playlist: Optional[Dict] = None
+        self._loaded_at = 0.0
+
+    async def prepare(self):
+        """
+        Open the pooled session, pick the best variant and load its playlist.
+
+        Raises:
+            HLSUnsupported: If the URL is not a plain HLS stream we can fetch.
+        """
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency * 2, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(
+                headers=STREAM_HEADERS, connector=connector,
+                timeout=aiohttp.ClientTimeout(total=30, sock_read=15)
+            )
+        try:
+            text, base_url = await self._get_text(self.url)
+            if "#EXTM3U" not in text:
+                raise HLSUnsupported("not an HLS playlist")
+
+            if "#EXT-X-STREAM-INF" in text:
+                if re.search(r'#EXT-X-MEDIA:.*TYPE=AUDIO.*URI=', text):
+                    # Audio lives in its own rendition; one byte stream cannot carry both
+                    raise HLSUnsupported("separate audio renditions")
+                variants = parse_master_playlist(text, base_url)
+                if not variants:
+                    raise HLSUnsupported("master playlist without variants")
+                self.variant = max(variants, key=lambda v: v['bandwidth'])
+                self.media_url = self.variant['url']
+                text, base_url = await self._get_text(self.media_url)
+            else:
+                self.media_url = base_url
+
+            self._playlist = parse_media_playlist(text, base_url)
+            self._loaded_at = time.time()
+        except Exception:
+            await self.close()
+            raise
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _get_text(self, url: str):
+        async with self.session.get(url, allow_redirects=True) as response:
+            response.raise_for_status()
+            return await response.text(), str(response.url)
+
+    async def _get_bytes(self, url: str) -> Optional[bytes]:
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.session.get(url) as response:
+                    response.raise_for_status()
+                    data = await response.read()
+                self.segments_fetched += 1
+                return data
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"[HLS] Giving up on segment {url}: {e}")
+                    self.segments_failed += 1
+                    return None
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def feed(self, writer: asyncio.StreamWriter):
+        """
+        Write the stream into `writer` until the playlist ends or ffmpeg goes away.
+
+        Downloads run ahead concurrently; writes happen strictly in sequence order.
+        """
+        if self._playlist is None:
+            await self.prepare()
+        elif time.time() - self._loaded_at > self._playlist['target_duration']:
+            # Prepared ahead of time (pre-warm); the live window has moved since
+            text, base_url = await self._get_text(self.media_url)
+            self._playlist = parse_media_playlist(text, base_url)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending: Dict[int, asyncio.Task] = {}
+        next_sequence = None
+
+        async def download(url):
+            async with semaphore:
+                return await self._get_bytes(url)
+
+        try:
+            playlist = self._playlist
+            if playlist['init_url']:
+                init = await self._get_bytes(playlist['init_url'])
+                if init is None:
+                    raise HLSUnsupported("could not load the init segment")
+                writer.write(init)
+
+            previous_first = None
+            while True:
+                segments = playlist['segments']
+                if next_sequence is None and segments:
+                    start = max(0, len(segments) - LIVE_START_SEGMENTS) if not playlist['endlist'] else 0
+                    next_sequence = segments[start]['sequence']
+                elif segments and previous_first is not None and segments[-1]['sequence'] < previous_first:
+                    # The whole window is older than the last one: the origin restarted
+                    # its media sequence (CDN restart). Everything pending was written
+                    # below, so follow the new numbering from its first segment.
+                    print(f"[HLS] Media sequence went back from {next_sequence} "
+                          f"to {segments[0]['sequence']}, following the restart")
+                    next_sequence = segments[0]['sequence']
+                if segments:
+                    previous_first = segments[0]['sequence']
+                for segment in segments:
+                    if next_sequence is not None and segment['sequence'] >= next_sequence \
+                            and segment['sequence'] not in pending:
+                        pending[segment['sequence']] = asyncio.create_task(download(segment['url']))
+
+                # Write everything that is ready, in order
+                while next_sequence in pending:
+                    data = await pending.pop(next_sequence)
+                    next_sequence += 1
+                    if data:
+                        writer.write(data)
+                        await writer.drain()
+                if pending and next_sequence not in pending:
+                    # The playlist skipped ahead (we fell behind the window)
+                    next_sequence = min(pending)
+                    continue
+
+                if playlist['endlist']:
+                    break
+
+                await asyncio.sleep(max(1.0, playlist['target_duration'] / 2))
+                try:
+                    text, base_url = await self._get_text(self.media_url)
+                    playlist = parse_media_playlist(text, base_url)
+                except HLSUnsupported:
+                    raise
+                except Exception as e:
+                    print(f"[HLS] Playlist refresh failed: {e}")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg reached its -t duration and closed stdin
+        finally:
+            for task in pending.values():
+                task.cancel()
+            try:
+                writer.close()
+            except Exception:
+                pass
+            await self.close()
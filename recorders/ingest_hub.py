@@ -0,0 +1,156 @@
+import os
+import time
+import shutil
+import asyncio
+from typing import Dict, List, Optional
+from recorders.capture import COMPLETE_TOLERANCE
+from recorders.ffmpeg_progress import FFmpegProgress
+from recorders.segments import cut_segment, OUTPUT_EXTENSION
+
+
+class Follower:
+    """A recording that takes its content from another job's ingest of the same stream"""
+
+    def __init__(self, queue: asyncio.Queue, started_at: float, until: float, temp_prefix: str):
+        self.queue = queue
+        self.started_at = started_at
+        self.until = until
+        self.temp_prefix = temp_prefix
+        self.covered = started_at  # Wall-clock time up to which content was handed over
+        self.count = 0
+        self.done = asyncio.Event()  # Set once nothing more will come from the session
+
+    def overlaps(self, start: float, end: float) -> bool:
+        return end > self.started_at and start < self.until
+
+    def contains(self, start: float, end: float) -> bool:
+        return start >= self.started_at - COMPLETE_TOLERANCE and end <= self.until + COMPLETE_TOLERANCE
+
+    async def put(self, start: float, end: float, duration: float, **item):
+        """Hand a part over as an upload queue item with times relative to our start"""
+        self.count += 1
+        self.covered = max(self.covered, end)
+        await self.queue.put({
+            'index': self.count - 1,
+            'start': max(0.0, start - self.started_at),
+            'end': end - self.started_at,
+            'duration': duration,
+            'part': None,  # Part numbers belong to the ingest; names carry the times
+            **item,
+        })
+        if self.covered >= self.until - COMPLETE_TOLERANCE:
+            self.done.set()
+
+
+class IngestSession:
+    """
+    One running ingest that other recordings of the same stream can join.
+
+    The owning recording shares every finished part before uploading it.
+    Followers whose window covers the whole part get the store channel
+    message once it is uploaded, so the bytes go up only once. Parts that stick
+    out of a follower's window are cut locally for that follower.
+    """
+
+    def __init__(self, key: str, started_at: float, stats: FFmpegProgress):
+        self.key = key
+        self.started_at = started_at  # Wall-clock time that part start/end offsets count from
+        self.stats = stats
+        self.followers: List[Follower] = []
+        self.capture_ended = asyncio.Event()
+
+    def follow(self, queue: asyncio.Queue, started_at: float, until: float, temp_prefix: str) -> Follower:
+        follower = Follower(queue, started_at, until, temp_prefix)
+        self.followers.append(follower)
+        return follower
+
+    def unfollow(self, follower: Follower):
+        if follower in self.followers:
+            self.followers.remove(follower)
+        follower.done.set()
+
+    def _window(self, segment: Dict):
+        return self.started_at + segment['start'], self.started_at + segment['end']
+
+    async def share_cuts(self, segment: Dict, path: str) -> List[Follower]:
+        """
+        Cut `path` for followers that only partly overlap the part.
+
+        Returns the followers that want the whole part; they get it through
+        `share_uploaded` (or `share_file` if the upload failed).
+        """
+        start, end = self._window(segment)
+        whole = []
+        for follower in list(self.followers):
+            if not follower.overlaps(start, end):
+                continue
+            if follower.contains(start, end):
+                whole.append(follower)
+                continue
+            cut_start, cut_end = max(start, follower.started_at), min(end, follower.until)
+            cut_path = f"{follower.temp_prefix}_shared{follower.count:03d}{OUTPUT_EXTENSION}"
+            try:
+                await cut_segment(path, cut_path, cut_start - start, cut_end - cut_start)
+            except Exception as e:
+                print(f"[Ingest Hub] Could not cut a shared part: {e}")
+                continue
+            await follower.put(cut_start, cut_end, cut_end - cut_start, path=cut_path)
+        return whole
+
+    async def share_uploaded(self, followers: List[Follower], segment: Dict, message_id: int,
+                             duration: float, size: int):
+        start, end = self._window(segment)
+        for follower in followers:
+            await follower.put(start, end, duration, message_id=message_id, size=size)
+
+    async def share_file(self, followers: List[Follower], segment: Dict, path: str, duration: float):
+        """Give followers their own copy of a part whose upload failed, so they can retry it"""
+        start, end = self._window(segment)
+        for follower in followers:
+            copy_path = f"{follower.temp_prefix}_shared{follower.count:03d}{OUTPUT_EXTENSION}"
+            try:
+                os.link(path, copy_path)
+            except OSError:
+                await asyncio.to_thread(shutil.copyfile, path, copy_path)
+            await follower.put(start, end, duration, path=copy_path)
+
+    async def wait_capture(self, follower: Follower):
+        """Wait until the ingest stops or has covered the follower's window"""
+        capture_ended = asyncio.create_task(self.capture_ended.wait())
+        deadline = asyncio.create_task(asyncio.sleep(max(0.0, follower.until - time.time())))
+        await asyncio.wait([capture_ended, deadline], return_when=asyncio.FIRST_COMPLETED)
+        capture_ended.cancel()
+        deadline.cancel()
+
+
+class IngestHub:
+    """Running ingests by resolved stream URL, so overlapping recordings share one"""
+
+    def __init__(self):
+        self.sessions: Dict[str, IngestSession] = {}
+
+    def find(self, key: str) -> Optional[IngestSession]:
+        session = self.sessions.get(key)
+        if session and not session.capture_ended.is_set():
+            return session
+        return None
+
+    def open(self, key: str, started_at: float, stats: FFmpegProgress) -> IngestSession:
+        session = IngestSession(key, started_at, stats)
+        self.sessions[key] = session
+        return session
+
+    def end_capture(self, session: IngestSession):
+        """The ingest stopped; new recordings of the stream must start their own"""
+        session.capture_ended.set()
+        if self.sessions.get(session.key) is session:
+            del self.sessions[session.key]
+
+    def close(self, session: IngestSession):
+        """Every part has been shared; release the followers"""
+        self.end_capture(session)
+        for follower in list(session.followers):
+            session.unfollow(follower)
+
+
+ingest_hub = IngestHub()
@@ -0,0 +1,93 @@
+import os
+import json
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import PROBE_CONCURRENCY
+
+ProbeKey = Tuple[str, int, int]
+
+
+class MediaProbe:
+    """
+    One async ffprobe per file, shared by everything that wants to know about it.
+
+    `ffprobe -show_streams -show_format` runs once per file version and the
+    parsed JSON is cached under (path, size, mtime), so a file that is renamed
+    in place or rewritten is probed again. Callers asking about the same file
+    at the same time wait for the one probe already running, and at most
+    PROBE_CONCURRENCY probes run at once.
+    """
+
+    def __init__(self, max_concurrent: int = PROBE_CONCURRENCY, cache_size: int = 256):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[ProbeKey, Dict]" = OrderedDict()
+        self._pending: Dict[ProbeKey, asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    @staticmethod
+    def _key(path: str) -> ProbeKey:
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    async def probe(self, path: str) -> Dict:
+        """Parsed ffprobe output of `path`; raises RuntimeError if ffprobe fails"""
+        key = self._key(path)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        task = self._pending.get(key)
+        if task is None:
+            # The probe is its own task, so a caller that is cancelled (say, its
+            # recording was stopped) neither kills it nor leaves the others hanging
+            task = asyncio.create_task(self._probe(key, path))
+            self._pending[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    async def _probe(self, key: ProbeKey, path: str) -> Dict:
+        result = await self._run(path)
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _finished(self, key: ProbeKey, task: asyncio.Task):
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        if not task.cancelled() and task.exception() is not None:
+            # A failed probe is not cached; the next caller tries again
+            self._cache.pop(key, None)
+
+    async def _run(self, path: str) -> Dict:
+        async with self._slots:
+            proc = await asyncio.create_subprocess_exec(
+                "ffprobe", "-v", "error", "-show_streams", "-show_format", "-of", "json", path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffprobe error: {stderr.decode().strip()}")
+        return json.loads(stdout)
+
+    async def duration(self, path: str) -> Optional[float]:
+        try:
+            info = await self.probe(path)
+            return float(info['format']['duration'])
+        except (RuntimeError, OSError, KeyError, ValueError):
+            return None
+
+    async def resolution(self, path: str) -> Optional[str]:
+        """`WxH` of the first video stream"""
+        try:
+            info = await self.probe(path)
+        except (RuntimeError, OSError, ValueError):
+            return None
+        for stream in info.get('streams', []):
+            if stream.get('codec_type') == "video" and stream.get('width'):
+                return f"{stream['width']}x{stream['height']}"
+        return None
+
+
+media_probe = MediaProbe()
@@ -0,0 +1,47 @@
+import os
+import glob
+import math
+from typing import Dict, Iterable, Optional
+from config import MAX_PART_SIZE, PART_SIZE_HEADROOM
+
+CONTAINER_OVERHEAD = 1.03  # Muxed file size over the raw stream bitrate
+
+
+def plan_recording(bitrate: int, seconds: int, segment_time: int, streaming: bool,
+                   fit: Optional[int] = None) -> Dict:
+    """
+    Predict what a recording will produce before its ingest starts.
+
+    Returns:
+        Dict with the expected output `size` (bytes), the number of `parts` it
+        is uploaded in, and the `disk` space it needs at its peak. Streamed
+        parts are deleted once uploaded, so only a few are on disk at a time.
+        A held recording is on disk whole, plus a second copy of the part being
+        stitched after a reconnect; fitting needs room for the re-encode.
+    """
+    size = int(bitrate / 8 * seconds * CONTAINER_OVERHEAD)
+    part_limit = int(MAX_PART_SIZE * PART_SIZE_HEADROOM)
+    part_size = min(size, int(bitrate / 8 * segment_time * CONTAINER_OVERHEAD))
+
+    if fit and size > fit:
+        # Source, encoded chunks and the fitted output exist together
+        return {'size': fit, 'parts': 1, 'disk': size * 2 + fit}
+
+    parts = max(math.ceil(size / part_limit), math.ceil(seconds / max(segment_time, 1)), 1)
+    if streaming:
+        # One part being written, one uploading and one queued behind it
+        disk = min(size, part_size * 3)
+    else:
+        disk = size + min(size, part_limit)
+    return {'size': size, 'parts': parts, 'disk': disk}
+
+
+def written_bytes(pattern: str, paths: Iterable[str] = ()) -> int:
+    """Bytes currently on disk in the files matching `pattern`, plus `paths` (e.g. parts renamed for upload)"""
+    total = 0
+    for path in set(glob.glob(pattern)) | set(paths):
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass  # Removed (uploaded) in the meantime
+    return total
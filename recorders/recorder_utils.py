@@ -1,18 +1,22 @@
+import re
 import aiohttp
-import subprocess
-from subprocess import check_output
+from typing import Optional
+from urllib.parse import urljoin
+from recorders.media_probe import media_probe
+
+STREAM_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "*/*",
+    "Referer": "https://www.tataplay.com/",
+    "Origin": "https://www.tataplay.com"
+}
 
 
 async def resolve_stream(url):
     if url.endswith(".m3u8"):
         return url
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Accept": "*/*",
-            "Referer": "https://www.tataplay.com/",
-            "Origin": "https://www.tataplay.com"
-        }
+        headers = STREAM_HEADERS
         async with aiohttp.ClientSession() as session:
             async with session.get(url, headers=headers, timeout=10, allow_redirects=True) as response:
                 return str(response.url) if response.url != url else url
@@ -21,40 +25,67 @@ async def resolve_stream(url):
         return url
 
 
+async def estimate_stream_bitrate(url, session: Optional[aiohttp.ClientSession] = None) -> Optional[int]:
+    """
+    Estimate the bitrate (bits/s) ffmpeg will write when copying `url`.
+
+    For a master playlist the advertised BANDWIDTH of every variant is summed,
+    because `-map 0:v? -map 0:a?` copies all of them. For a media playlist the
+    last segment is measured instead. Returns None when nothing could be learned.
+    Pass `session` to reuse a caller's connection pool.
+    """
+    try:
+        if session is None:
+            timeout = aiohttp.ClientTimeout(total=15)
+            async with aiohttp.ClientSession(headers=STREAM_HEADERS, timeout=timeout) as session:
+                return await _estimate_bitrate(session, url)
+        return await _estimate_bitrate(session, url)
+    except Exception as e:
+        print(f"[Bitrate] Could not estimate bitrate for {url}: {e}")
+        return None
+
+
+async def _estimate_bitrate(session: aiohttp.ClientSession, url) -> Optional[int]:
+    async with session.get(url, allow_redirects=True) as response:
+        playlist = await response.text()
+        base_url = str(response.url)
+
+    if "#EXTM3U" not in playlist:
+        return None
+
+    bandwidths = [int(b) for b in re.findall(r'#EXT-X-STREAM-INF:.*?\bBANDWIDTH=(\d+)', playlist)]
+    if bandwidths:
+        return sum(bandwidths)
+
+    durations = re.findall(r'#EXTINF:([\d.]+)', playlist)
+    segments = [line.strip() for line in playlist.splitlines() if line.strip() and not line.startswith('#')]
+    if not durations or not segments:
+        return None
+
+    async with session.head(urljoin(base_url, segments[-1]), allow_redirects=True) as response:
+        size = response.content_length
+    if not size:
+        async with session.get(urljoin(base_url, segments[-1])) as response:
+            size = len(await response.read())
+    return int(size * 8 / float(durations[-1]))
+
+
+def quality_label(resolution):
+    """Map a WxH resolution string to the short label used in captions"""
+    if '1920x1080' in resolution:
+        return "FHD"
+    elif '1280x720' in resolution:
+        return "HD"
+    elif '720x480' in resolution:
+        return "SD"
+    return "HQ"
+
+
 async def get_stream_quality(file_path):
     """Detect video quality using ffprobe"""
-    try:
-        cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=width,height",
-            "-of", "csv=s=x:p=0",
-            file_path
-        ]
-        resolution = subprocess.check_output(cmd).decode().strip()
-        if '1920x1080' in resolution:
-            return "FHD"
-        elif '1280x720' in resolution:
-            return "HD"
-        elif '720x480' in resolution:
-            return "SD"
-        return "HQ"
-    except Exception:
-        return "Quality"
+    resolution = await media_probe.resolution(file_path)
+    return quality_label(resolution) if resolution else "Quality"
 
 async def get_accurate_duration(file_path):
     """Get accurate duration using ffprobe"""
-    try:
-        cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            file_path
-        ]
-        duration = float(subprocess.check_output(cmd).decode().strip())
-        return duration
-    except Exception:
-        return None
-
+    return await media_probe.duration(file_path)
@@ -0,0 +1,178 @@
+import os
+import csv
+import asyncio
+from typing import AsyncIterator, Dict, List
+from config import RECORDING_FORMAT
+
+OUTPUT_EXTENSION = ".mp4" if RECORDING_FORMAT == "mp4" else ".mkv"
+# Fragmented MP4: the moov header is written up front and the media follows in
+# self-contained fragments, so playback can start right away without a
+# faststart rewrite of the finished file
+MP4_MOVFLAGS = "+frag_keyframe+empty_moov+default_base_moof"
+
+
+def stream_map_args() -> List[str]:
+    """Streams copied from a live input; MP4 cannot carry broadcast subtitles, so they are dropped there"""
+    maps = ["-map", "0:v?", "-map", "0:a?"]
+    if RECORDING_FORMAT != "mp4":
+        maps += ["-map", "0:s?"]
+    return maps
+
+
+def container_args(segmented: bool = False) -> List[str]:
+    """Muxer options for the configured container (per part when `segmented`)"""
+    if RECORDING_FORMAT != "mp4":
+        return []
+    if segmented:
+        return ["-segment_format", "mp4", "-segment_format_options", f"movflags={MP4_MOVFLAGS}"]
+    return ["-movflags", MP4_MOVFLAGS]
+
+
+def segment_output_args(pattern: str, list_path: str, segment_time: float, start_number: int = 0,
+                        wrap: int = 0) -> List[str]:
+    """
+    ffmpeg output options for the segment muxer with a csv list of finished parts.
+
+    With `wrap` the part numbers (and files) are reused in a ring of that size
+    and the list only keeps the last `wrap` entries, rewritten on every part.
+    """
+    ring = ["-segment_wrap", str(wrap), "-segment_list_size", str(wrap)] if wrap else []
+    return [
+        "-f", "segment",
+        "-segment_time", str(segment_time),
+        "-segment_start_number", str(start_number),
+        *ring,
+        *container_args(segmented=True),
+        "-reset_timestamps", "1",
+        "-segment_list", list_path,
+        "-segment_list_type", "csv",
+        pattern,
+    ]
+
+
+def max_part_seconds(bitrate: int, max_size: int, headroom: float = 0.9) -> int:
+    """Longest part (in seconds) that stays below `max_size` bytes at `bitrate` bits/s"""
+    return max(1, int(max_size * headroom * 8 / max(bitrate, 1)))
+
+
+def parse_segment_entry(line: str, directory: str, index: int) -> Dict:
+    """Turn one `filename,start,end` row of the segment list into a part dict"""
+    filename, start, end = next(csv.reader([line]))
+    start, end = float(start), float(end)
+    return {
+        'index': index,
+        'path': os.path.join(directory, filename),
+        'start': start,
+        'end': end,
+        'duration': max(0.0, end - start),
+    }
+
+
+async def watch_segments(list_path: str, process: asyncio.subprocess.Process,
+                         poll_interval: float = 1.0, start_index: int = 0) -> AsyncIterator[Dict]:
+    """
+    Yield parts as soon as ffmpeg closes them.
+
+    The segment muxer appends a row to the csv list (and flushes it) every time
+    a part is finished, so tailing that file tells us which parts are safe to
+    upload while the recording is still running.
+
+    Args:
+        list_path: Path passed to `-segment_list`.
+        process: The running ffmpeg process.
+        poll_interval: Seconds between checks of the list file.
+        start_index: Index of the first part (matches `-segment_start_number`).
+    """
+    directory = os.path.dirname(list_path)
+    position = 0
+    pending = ""
+    index = start_index
+
+    while True:
+        finished = process.returncode is not None
+
+        if os.path.exists(list_path):
+            with open(list_path, "r") as f:
+                f.seek(position)
+                pending += f.read()
+                position = f.tell()
+
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    segment = parse_segment_entry(line.strip(), directory, index)
+                except (ValueError, StopIteration) as e:
+                    print(f"[Segments] Ignoring bad list entry {line!r}: {e}")
+                    continue
+                index += 1
+                yield segment
+
+        if finished:
+            break
+        await asyncio.sleep(poll_interval)
+
+
+def group_by_size(segments: List[Dict], max_size: int) -> List[List[Dict]]:
+    """Split consecutive parts into runs whose files add up to at most `max_size` bytes"""
+    groups, size = [], 0
+    for segment in segments:
+        segment_size = os.path.getsize(segment['path'])
+        if not groups or size + segment_size > max_size:
+            groups.append([])
+            size = 0
+        groups[-1].append(segment)
+        size += segment_size
+    return groups
+
+
+async def concat_segments(segments: List[Dict], output_path: str) -> Dict:
+    """
+    Join parts losslessly with the concat demuxer.
+
+    Used to stitch the pieces of a recording whose ingest had to be restarted,
+    and the short parts copied out of a timeshift buffer.
+    Returns a part dict for the joined file.
+    """
+    list_path = f"{output_path}.txt"
+    with open(list_path, "w") as f:
+        for segment in segments:
+            escaped = segment['path'].replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-map", "0", "-c", "copy", *container_args(), output_path
+    ]
+    try:
+        proc = await asyncio.create_subprocess_exec(*cmd, stderr=asyncio.subprocess.PIPE)
+        _, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg concat failed: {stderr.decode().strip()}")
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+    return {
+        'index': segments[0]['index'],
+        'path': output_path,
+        'start': segments[0]['start'],
+        'end': segments[-1]['end'],
+        'duration': sum(segment['duration'] for segment in segments),
+    }
+
+
+async def cut_segment(path: str, output_path: str, offset: float, duration: float):
+    """Copy `duration` seconds starting `offset` seconds into `path` (cut on keyframes)"""
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-ss", f"{max(0.0, offset):.3f}", "-i", path,
+        "-t", f"{duration:.3f}",
+        "-map", "0", "-c", "copy", *container_args(), output_path
+    ]
+    proc = await asyncio.create_subprocess_exec(*cmd, stderr=asyncio.subprocess.PIPE)
+    _, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg cut failed: {stderr.decode().strip()}")
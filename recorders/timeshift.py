@@ -0,0 +1,273 @@
+import os
+import re
+import math
+import time
+import shutil
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+from config import (
+    RECORDINGS_DIR, TIMESHIFT_CHANNELS, TIMESHIFT_WINDOW, TIMESHIFT_SEGMENT_SECONDS,
+    DEFAULT_BITRATE, STALL_TIMEOUT
+)
+from m3u_manager import m3u_manager
+from recorders.admission import admission
+from recorders.capture import prepare_ingest, stop_process, watch_for_stall, FFMPEG_HEADERS
+from recorders.ffmpeg_progress import FFmpegProgress, PROGRESS_ARGS, LOG_ARGS, start_readers
+from recorders.planner import written_bytes
+from recorders.segments import segment_output_args, parse_segment_entry, stream_map_args, OUTPUT_EXTENSION
+
+SLOT_RE = re.compile(r'slot_(\d+)\.\w+$')
+
+
+class TimeshiftBuffer:
+    """
+    One channel ingested around the clock into a fixed ring of parts on disk.
+
+    ffmpeg's segment muxer writes TIMESHIFT_SEGMENT_SECONDS long parts into a
+    fixed number of slot files and wraps around (`-segment_wrap`), so the
+    oldest part is overwritten in place. The csv list is capped to the same
+    number of entries and only the parts still on disk are kept in memory,
+    so disk and memory use stay constant however long the buffer runs.
+    """
+
+    def __init__(self, name: str, url: str, window: int = TIMESHIFT_WINDOW,
+                 segment_seconds: int = TIMESHIFT_SEGMENT_SECONDS):
+        self.name = name
+        self.url = url
+        self.window = window
+        self.segment_seconds = segment_seconds
+        # Two spare slots, so the oldest part of the window is not overwritten while it is copied
+        self.slots = math.ceil(window / segment_seconds) + 2
+        self.directory = os.path.join(RECORDINGS_DIR, "timeshift", re.sub(r'[^\w.-]', '_', name))
+        self.parts: "OrderedDict[str, Dict]" = OrderedDict()  # slot path -> part, oldest first
+        self.bitrate: Optional[int] = None
+        self.stats = FFmpegProgress()
+        self._subscribers: List[asyncio.Queue] = []
+        self._next_slot = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def job_id(self) -> str:
+        return f"timeshift:{self.name}"
+
+    @property
+    def oldest(self) -> Optional[float]:
+        """Wall-clock time of the oldest buffered moment"""
+        return next(iter(self.parts.values()))['wall_start'] if self.parts else None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        """Keep the ingest alive, reconnecting with backoff when ffmpeg exits"""
+        failures = 0
+        admitted = False
+        try:
+            while True:
+                started = time.time()
+                try:
+                    ingest = await prepare_ingest(self.url)
+                    if ingest['fetcher']:
+                        # The ring is written by ffmpeg itself
+                        await ingest['fetcher'].close()
+                    self.bitrate = ingest['bitrate'] or DEFAULT_BITRATE
+                    if not admitted:
+                        # The buffer holds an ingest slot, and disk for a full ring, for as long as it runs
+                        ring_size = int(self.slots * self.segment_seconds * self.bitrate / 8)
+                        await admission.admit(
+                            self.job_id, self.bitrate, reserve=ring_size,
+                            usage=lambda: written_bytes(os.path.join(self.directory, "slot_*"))
+                        )
+                        admitted = True
+                    await self._capture(ingest['stream_url'])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"[Timeshift] {self.name}: {e}")
+
+                failures = failures + 1 if time.time() - started < 60 else 0
+                if failures >= 3:
+                    fresh_url = await m3u_manager.refresh_channel_url(self.url)
+                    if fresh_url:
+                        self.url = fresh_url
+                await asyncio.sleep(min(2 ** failures, 60))
+        finally:
+            admission.release(self.job_id)
+
+    async def _capture(self, stream_url: str):
+        os.makedirs(self.directory, exist_ok=True)
+        list_path = os.path.join(self.directory, "parts.csv")
+        if os.path.exists(list_path):
+            os.remove(list_path)
+        self.stats.restart()
+        slot_pattern = os.path.join(self.directory, f"slot_%03d{OUTPUT_EXTENSION}")
+        self.stats.write_parts(slot_pattern, self._next_slot, wrap=self.slots)
+
+        cmd = [
+            "ffmpeg",
+            "-y",
+            *LOG_ARGS,
+            *PROGRESS_ARGS,
+            "-headers", FFMPEG_HEADERS,
+            "-i", stream_url,
+            *stream_map_args(),
+            "-c", "copy",
+            *segment_output_args(slot_pattern, list_path, self.segment_seconds, self._next_slot, wrap=self.slots),
+        ]
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        readers = start_readers(process, self.stats)
+        watchdog = asyncio.create_task(watch_for_stall(process, self.stats))
+        print(f"[Timeshift] Buffering {self.name} ({self.window}s in {self.slots} slots)")
+
+        seen = 0.0
+        try:
+            while True:
+                finished = process.returncode is not None
+                seen = self._read_list(list_path, seen)
+                if finished:
+                    break
+                await asyncio.sleep(1)
+        finally:
+            if process.returncode is None:
+                await stop_process(process, grace=2)
+            await asyncio.gather(*readers, return_exceptions=True)
+            if not watchdog.done():
+                watchdog.cancel()
+        print(f"[Timeshift] ffmpeg for {self.name} exited: {self.stats.last_error or process.returncode}")
+
+    def _read_list(self, list_path: str, seen: float) -> float:
+        """
+        Pick up parts finished since the list end time `seen`.
+
+        The list is rewritten whole on every part (`-segment_list_size`), so it
+        is re-read each time and rows up to `seen` are skipped.
+        """
+        try:
+            with open(list_path, "r") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return seen
+
+        # A row without its newline may be cut off mid-rewrite; it is read again next time
+        for line in text.split("\n")[:-1]:
+            try:
+                part = parse_segment_entry(line.strip(), self.directory, 0)
+            except (ValueError, StopIteration):
+                continue
+            if part['end'] <= seen:
+                continue
+            seen = part['end']
+
+            now = time.time()
+            part['wall_start'] = now - part['duration']
+            part['wall_end'] = now
+            # The slot was overwritten in place; its old part is gone
+            self.parts.pop(part['path'], None)
+            self.parts[part['path']] = part
+            self.stats.part_closed(part['path'])
+            slot = SLOT_RE.search(part['path'])
+            if slot:
+                self._next_slot = (int(slot.group(1)) + 1) % self.slots
+            for queue in self._subscribers:
+                queue.put_nowait(part)
+        return seen
+
+    def _intact(self, part: Dict) -> bool:
+        """Whether `part` is still on disk, i.e. its slot has not been reused yet"""
+        slot = SLOT_RE.search(part['path'])
+        writing = slot is not None and int(slot.group(1)) == self._next_slot
+        return self.parts.get(part['path']) is part and not writing
+
+    async def record(self, since: float, seconds: float, segment_pattern: str,
+                     on_segment: Callable[[Dict], Awaitable[None]]) -> float:
+        """
+        Copy the parts from `since` on out of the ring, then follow the live edge.
+
+        Each copy is passed to `on_segment` with start/end relative to `since`.
+        Stops once `seconds` are covered, or when the buffer stops producing.
+
+        Returns:
+            Seconds of media delivered.
+        """
+        until = since + seconds
+        queue: asyncio.Queue = asyncio.Queue()
+        # Snapshot and subscribe together, so every part is seen exactly once
+        backlog = [part for part in self.parts.values() if part['wall_end'] > since]
+        self._subscribers.append(queue)
+        delivered = 0.0
+        index = 0
+        try:
+            while True:
+                if backlog:
+                    part = backlog.pop(0)
+                else:
+                    timeout = until + self.segment_seconds * 2 + STALL_TIMEOUT - time.time()
+                    try:
+                        part = await asyncio.wait_for(queue.get(), timeout=max(1, timeout))
+                    except asyncio.TimeoutError:
+                        print(f"[Timeshift] {self.name} stopped producing parts")
+                        break
+                if part['wall_start'] >= until:
+                    break
+
+                if not self._intact(part):
+                    continue
+                copy_path = segment_pattern % index
+                await asyncio.to_thread(shutil.copyfile, part['path'], copy_path)
+                if not self._intact(part):
+                    # Overwritten while we were copying; the copy cannot be trusted
+                    os.remove(copy_path)
+                    continue
+
+                await on_segment({
+                    'index': index,
+                    'path': copy_path,
+                    'start': max(0.0, part['wall_start'] - since),
+                    'end': part['wall_end'] - since,
+                    'duration': part['duration'],
+                })
+                index += 1
+                delivered += part['duration']
+                if part['wall_end'] >= until:
+                    break
+        finally:
+            self._subscribers.remove(queue)
+        return delivered
+
+
+class TimeshiftManager:
+    """The timeshift buffers of the channels listed in TIMESHIFT_CHANNELS"""
+
+    def __init__(self):
+        self.buffers: Dict[str, TimeshiftBuffer] = {}  # lower-case channel name -> buffer
+
+    def start(self):
+        for identifier in TIMESHIFT_CHANNELS:
+            info = m3u_manager.get_channel_info(identifier)
+            if not info:
+                print(f"[Timeshift] Channel not found: {identifier}")
+                continue
+            key = info['name'].lower()
+            if key not in self.buffers:
+                self.buffers[key] = TimeshiftBuffer(info['name'], info['url'])
+                self.buffers[key].start()
+
+    async def stop(self):
+        await asyncio.gather(*(buffer.stop() for buffer in self.buffers.values()))
+
+    def get(self, channel: str) -> Optional[TimeshiftBuffer]:
+        return self.buffers.get(channel.lower())
+
+
+timeshift = TimeshiftManager()
@@ -0,0 +1,105 @@
+import os
+import glob
+import shutil
+import asyncio
+from typing import List
+from recorders.segments import container_args
+from config import TRANSCODE_WORKERS, TRANSCODE_PRESET, TRANSCODE_AUDIO_BITRATE, TRANSCODE_CHUNK_SECONDS
+
+CONTAINER_OVERHEAD = 0.97  # Share of the target size left for the streams themselves
+MIN_VIDEO_BITRATE = 200_000
+
+_encode_slots = asyncio.Semaphore(TRANSCODE_WORKERS)
+
+
+async def run_ffmpeg(cmd: List[str], what: str):
+    proc = await asyncio.create_subprocess_exec(*cmd, stderr=asyncio.subprocess.PIPE)
+    _, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg {what} failed: {stderr.decode().strip()[-300:]}")
+
+
+def fit_video_bitrate(target_size: int, duration: float, audio_bitrate: int = TRANSCODE_AUDIO_BITRATE) -> int:
+    """Video bitrate (bits/s) that makes `duration` seconds plus audio come out at `target_size` bytes"""
+    total = target_size * 8 * CONTAINER_OVERHEAD / max(duration, 1)
+    return max(MIN_VIDEO_BITRATE, int(total - audio_bitrate))
+
+
+async def _encode_chunk(chunk_path: str, output_path: str, bitrate: int):
+    async with _encode_slots:
+        await run_ffmpeg([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-i", chunk_path,
+            "-map", "0:v:0",
+            "-c:v", "libx264", "-preset", TRANSCODE_PRESET,
+            "-b:v", str(bitrate), "-maxrate", str(int(bitrate * 1.5)), "-bufsize", str(bitrate * 2),
+            # One thread per encoder; the parallelism comes from running a chunk per core
+            "-threads", "1",
+            output_path
+        ], "chunk encode")
+
+
+async def _encode_audio(path: str, output_path: str):
+    async with _encode_slots:
+        await run_ffmpeg([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-i", path,
+            "-map", "0:a:0", "-vn",
+            "-c:a", "aac", "-b:a", str(TRANSCODE_AUDIO_BITRATE),
+            output_path
+        ], "audio encode")
+
+
+async def transcode_to_fit(path: str, output_path: str, duration: float, target_size: int):
+    """
+    Re-encode `path` so that it comes out at about `target_size` bytes.
+
+    The video is split (without re-encoding) into keyframe-aligned chunks, and
+    the chunks are encoded at the bitrate the target size allows, up to
+    TRANSCODE_WORKERS at a time, so wall time drops with the number of cores.
+    The audio is encoded once alongside them. The encoded chunks are joined with
+    the concat demuxer and muxed with the audio in a single pass. If any encode
+    fails (the audio included) the others are cancelled and the error is raised,
+    rather than producing a file without sound.
+    """
+    work_dir = f"{output_path}.work"
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        bitrate = fit_video_bitrate(target_size, duration)
+        # About two chunks per worker keeps every core busy until the end
+        chunk_seconds = max(TRANSCODE_CHUNK_SECONDS, duration / (TRANSCODE_WORKERS * 2))
+        await run_ffmpeg([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-i", path,
+            "-map", "0:v:0", "-c", "copy",
+            "-f", "segment", "-segment_time", str(chunk_seconds), "-reset_timestamps", "1",
+            os.path.join(work_dir, "chunk_%04d.mkv")
+        ], "split")
+
+        chunks = sorted(glob.glob(os.path.join(work_dir, "chunk_*.mkv")))
+        encoded = [os.path.join(work_dir, "encoded_" + os.path.basename(chunk)[6:]) for chunk in chunks]
+        print(f"[Transcode] Encoding {len(chunks)} chunk(s) at {bitrate // 1000} kb/s on {TRANSCODE_WORKERS} worker(s)")
+        audio_path = os.path.join(work_dir, "audio.mka")
+        tasks = [asyncio.create_task(_encode_audio(path, audio_path))] + [
+            asyncio.create_task(_encode_chunk(chunk, output, bitrate)) for chunk, output in zip(chunks, encoded)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        list_path = os.path.join(work_dir, "encoded.txt")
+        with open(list_path, "w") as f:
+            for chunk in encoded:
+                escaped = chunk.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        await run_ffmpeg([
+            "ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+            "-i", audio_path, "-map", "0:v", "-map", "1:a",
+            "-c", "copy", *container_args(), output_path
+        ], "join")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -1,10 +1,15 @@
+import os
+import json
+import time
+import heapq
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
 from pytz import timezone
 from recorder import start_recording
-from typing import Dict, Optional
+from config import PREWARM_SECONDS, SCHEDULE_JOURNAL
+from typing import Dict, List, Optional, Tuple
 
-scheduled_jobs: Dict[int, asyncio.Task] = {}  # key = message_id, value = asyncio.Task
+scheduled_jobs: Dict[int, asyncio.Task] = {}  # key = message_id, value = asyncio.Task (running recordings)
 
 def get_ist_datetime(date_time_str: str) -> datetime:
     """Parse string datetime and convert to IST timezone"""
@@ -12,20 +17,427 @@ def get_ist_datetime(date_time_str: str) -> datetime:
     dt = datetime.strptime(date_time_str, "%d-%m-%Y %H:%M:%S")
     return ist.localize(dt)
 
+def duration_seconds(duration: str) -> int:
+    """Seconds in a `SS` or `HH:MM:SS` duration (the forms the recorder accepts)"""
+    fields = str(duration).split(":")
+    if len(fields) not in (1, 3) or not all(field.isdigit() for field in fields):
+        raise ValueError(f"invalid duration {duration!r}, use HH:MM:SS")
+    seconds = 0
+    for field in fields:
+        seconds = seconds * 60 + int(field)
+    if seconds <= 0:
+        raise ValueError(f"duration {duration!r} is empty")
+    return seconds
+
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+def parse_cron_field(field: str, low: int, high: int) -> List[int]:
+    """Values of one cron field (`*`, `5`, `1-5`, `*/15`, `1,3,5`) within [low, high]"""
+    values = set()
+    for item in field.split(","):
+        spec, _, step = item.partition("/")
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start, end = (int(v) for v in spec.split("-"))
+        else:
+            start = end = int(spec)
+        if start < low or end > high or start > end:
+            raise ValueError(f"cron field {item!r} out of range {low}-{high}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return sorted(values)
+
+def parse_rule(kind: str, at: str) -> dict:
+    """
+    Validate a recurrence: `daily`, `weekdays` or a day name with an HH:MM:SS
+    time, or `cron` with a five-field `minute hour day month weekday` spec.
+    """
+    kind = kind.lower()
+    if kind == "cron":
+        fields = at.split()
+        if len(fields) != 5:
+            raise ValueError("cron needs 5 fields: minute hour day month weekday")
+        for field, (low, high) in zip(fields, [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]):
+            parse_cron_field(field, low, high)
+        return {'kind': kind, 'cron': at}
+    if kind not in ("daily", "weekdays") and kind[:3] not in WEEKDAYS:
+        raise ValueError(f"unknown recurrence {kind!r}")
+    datetime.strptime(at, "%H:%M:%S")
+    return {'kind': kind[:3] if kind[:3] in WEEKDAYS else kind, 'time': at}
+
+def next_occurrence(rule: dict, after: float) -> float:
+    """First start time of `rule` strictly after `after` (IST wall clock)"""
+    ist = timezone("Asia/Kolkata")
+    base = datetime.fromtimestamp(after, ist)
+
+    if rule['kind'] == "cron":
+        minute, hour, day, month, weekday = rule['cron'].split()
+        minutes = parse_cron_field(minute, 0, 59)
+        hours = parse_cron_field(hour, 0, 23)
+        days = parse_cron_field(day, 1, 31)
+        months = parse_cron_field(month, 1, 12)
+        # Cron weekdays count from Sunday (0 or 7)
+        weekdays = {(d - 1) % 7 for d in parse_cron_field(weekday, 0, 7)}
+        day_any, weekday_any = day == "*", weekday == "*"
+        for offset in range(366 * 4):
+            date = (base + timedelta(days=offset)).date()
+            if date.month not in months:
+                continue
+            day_ok, weekday_ok = date.day in days, date.weekday() in weekdays
+            # Like cron: when both are restricted, either one matching is enough
+            if not (day_ok or weekday_ok if not (day_any or weekday_any) else day_ok and weekday_ok):
+                continue
+            for h in hours:
+                for m in minutes:
+                    candidate = ist.localize(datetime(date.year, date.month, date.day, h, m))
+                    if candidate.timestamp() > after:
+                        return candidate.timestamp()
+        raise ValueError(f"cron {rule['cron']!r} never fires")
+
+    h, m, sec = (int(v) for v in rule['time'].split(":"))
+    for offset in range(8):
+        date = (base + timedelta(days=offset)).date()
+        if rule['kind'] == "weekdays" and date.weekday() >= 5:
+            continue
+        if rule['kind'] in WEEKDAYS and date.weekday() != WEEKDAYS.index(rule['kind']):
+            continue
+        candidate = ist.localize(datetime(date.year, date.month, date.day, h, m, sec))
+        if candidate.timestamp() > after:
+            return candidate.timestamp()
+    raise ValueError(f"rule {rule} never fires")
+
+def describe_rule(rule: dict) -> str:
+    if rule['kind'] == "cron":
+        return f"cron {rule['cron']}"
+    kind = rule['kind'].capitalize() if rule['kind'] in WEEKDAYS else rule['kind']
+    return f"{kind} {rule['time']}"
+
+def _require(record: dict, *keys: str):
+    missing = [key for key in keys if key not in record]
+    if missing:
+        raise KeyError(f"missing {', '.join(missing)}")
+
+
+class TimerScheduler:
+    """
+    One timer loop for every scheduled recording.
+
+    Pending jobs sit in a min-heap of (start time, job id) next to a dict of
+    compact job records. The loop sleeps until the earliest job is due for its
+    pre-warm, or until an earlier job is added. Cancelling removes the record
+    and leaves its heap entry to be skipped when it reaches the top. Every
+    change is appended to a JSON-lines journal; on start-up the journal is
+    replayed and the heap rebuilt in one pass.
+
+    Recurring rules live in the same journal. A rule only ever has its next
+    occurrence in the heap; the following one is added when that job fires
+    or is cancelled. `by_rule` maps a rule to that occurrence, so looking it up
+    or removing the rule does not scan the jobs. Listing (`upcoming`) reads
+    the heap in order from its root and stops after `limit` jobs.
+
+    Journal writes are queued and written in a worker thread, one batch at a
+    time and in order, so handlers never wait on the disk.
+    """
+
+    def __init__(self, path: str = SCHEDULE_JOURNAL):
+        self.path = path
+        self.jobs: Dict[int, dict] = {}  # job id -> record
+        self.rules: Dict[int, dict] = {}  # rule id -> record
+        self.by_message: Dict[int, int] = {}  # message id -> job id
+        self.by_rule: Dict[int, int] = {}  # rule id -> pending job id
+        self._heap: List[Tuple[float, int]] = []
+        self._next_id = 1
+        self._journal_lines = 0
+        self._unwritten: List[str] = []  # Journal lines not on disk yet
+        self._compact_due = False
+        self._writer: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self):
+        """Restore pending jobs from the journal, dropping those whose window has passed"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn last line after a crash
+                self._journal_lines += 1
+                try:
+                    self._replay(entry)
+                except (KeyError, TypeError, ValueError) as e:
+                    # One bad entry must not keep every other timer from loading
+                    print(f"[Scheduler] Skipping journal line {number}: {e!r}")
+
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job['at'] + duration_seconds(job['duration']) <= now:
+                print(f"[Scheduler] Dropping job {job_id} ({job['title']}), its window passed while offline")
+                del self.jobs[job_id]
+
+        self.by_message = {job['message_id']: job_id for job_id, job in self.jobs.items() if job['message_id']}
+        self.by_rule = {job['rule']: job_id for job_id, job in self.jobs.items() if 'rule' in job}
+        self._heap = [(job['at'], job_id) for job_id, job in self.jobs.items()]
+        heapq.heapify(self._heap)
+        # Start-up, before any handler runs: written right away
+        self._write(self._snapshot(), [])
+
+        # Rules whose pending occurrence was missed while offline continue from now
+        for rule in self.rules.values():
+            if rule['id'] not in self.by_rule:
+                self._materialize(rule, now)
+        print(f"[Scheduler] Restored {len(self.jobs)} scheduled job(s) and {len(self.rules)} rule(s)")
+
+    def _replay(self, entry: dict):
+        """Apply one journal entry; raises on an entry that could not be run later"""
+        if entry['op'] == "add":
+            job = entry['job']
+            float(job['at'])
+            duration_seconds(job['duration'])
+            _require(job, 'id', 'url', 'channel', 'title', 'chat_id', 'message_id')
+            self.jobs[job['id']] = job
+            self._next_id = max(self._next_id, job['id'] + 1)
+        elif entry['op'] == "rule":
+            rule = entry['rule']
+            parse_rule(rule['kind'], rule['cron'] if rule['kind'] == "cron" else rule['time'])
+            duration_seconds(rule['duration'])
+            _require(rule, 'id', 'url', 'channel', 'title', 'chat_id')
+            self.rules[rule['id']] = rule
+            self._next_id = max(self._next_id, rule['id'] + 1)
+        elif entry['op'] == "unrule":
+            self.rules.pop(entry['id'], None)
+        else:
+            self.jobs.pop(entry['id'], None)
+
+    def _append(self, entry: dict):
+        self._unwritten.append(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._journal_lines += 1
+        # Keep replay time proportional to the pending jobs, not to the history
+        if self._journal_lines > 2 * (len(self.jobs) + len(self.rules)) + 100:
+            self._compact_due = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to keep free (scripts, tests): write right away
+            self._write(*self._take_batch())
+            return
+        if self._writer is None or self._writer.done():
+            self._writer = loop.create_task(self._write_batches())
+
+    def _snapshot(self) -> List[str]:
+        """The journal as a compacted list of lines: every rule and pending job once"""
+        lines = [json.dumps({'op': "rule", 'rule': rule}, separators=(",", ":")) + "\n"
+                 for rule in self.rules.values()]
+        lines += [json.dumps({'op': "add", 'job': job}, separators=(",", ":")) + "\n"
+                  for job in self.jobs.values()]
+        self._journal_lines = len(lines)
+        return lines
+
+    def _take_batch(self) -> Tuple[Optional[List[str]], List[str]]:
+        """(compacted journal or None, lines to append); taken on the loop, so it matches memory"""
+        snapshot = None
+        if self._compact_due:
+            # The snapshot already holds the effect of every unwritten line
+            snapshot, self._unwritten, self._compact_due = self._snapshot(), [], False
+        lines, self._unwritten = self._unwritten, []
+        return snapshot, lines
+
+    def _write(self, snapshot: Optional[List[str]], lines: List[str]):
+        try:
+            if snapshot is not None:
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "w") as f:
+                    f.writelines(snapshot)
+                os.replace(temp_path, self.path)
+            if lines:
+                with open(self.path, "a") as f:
+                    f.writelines(lines)
+        except OSError as e:
+            print(f"[Scheduler] Could not write the journal: {e}")
+
+    async def _write_batches(self):
+        while self._unwritten or self._compact_due:
+            await asyncio.to_thread(self._write, *self._take_batch())
+
+    async def flush(self):
+        """Wait until every change so far is in the journal"""
+        while self._writer is not None and not self._writer.done():
+            await asyncio.shield(self._writer)
+
+    def add(self, at: float, url: str, duration: str, channel: str, title: str,
+            chat_id: int, message_id: Optional[int] = None, rule_id: Optional[int] = None) -> dict:
+        duration_seconds(duration)  # Raises ValueError before anything is journaled
+        job = {
+            'id': self._next_id,
+            'at': at,
+            'url': url,
+            'duration': duration,
+            'channel': channel,
+            'title': title,
+            'chat_id': chat_id,
+            'message_id': message_id,
+        }
+        if rule_id is not None:
+            job['rule'] = rule_id
+            self.by_rule[rule_id] = job['id']
+        self._next_id += 1
+        self.jobs[job['id']] = job
+        if message_id:
+            self.by_message[message_id] = job['id']
+        self._append({'op': "add", 'job': job})
+        heapq.heappush(self._heap, (at, job['id']))
+        if self._heap[0][1] == job['id']:
+            self._wakeup.set()
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        job = self.jobs.pop(job_id, None)
+        if job is None:
+            return False
+        if job['message_id']:
+            self.by_message.pop(job['message_id'], None)
+        if 'rule' in job:
+            self.by_rule.pop(job['rule'], None)
+        self._append({'op': "cancel", 'id': job_id})
+        # Skipping one occurrence keeps the rule going
+        if job.get('rule') in self.rules:
+            self._materialize(self.rules[job['rule']], job['at'])
+        return True
+
+    def add_rule(self, recurrence: dict, url: str, duration: str, channel: str, title: str,
+                 chat_id: int) -> dict:
+        """Store a recurring rule and queue its next occurrence"""
+        duration_seconds(duration)
+        rule = {
+            'id': self._next_id,
+            **recurrence,
+            'url': url,
+            'duration': duration,
+            'channel': channel,
+            'title': title,
+            'chat_id': chat_id,
+        }
+        self._next_id += 1
+        self.rules[rule['id']] = rule
+        self._append({'op': "rule", 'rule': rule})
+        self._materialize(rule, time.time())
+        return rule
+
+    def remove_rule(self, rule_id: int) -> bool:
+        rule = self.rules.pop(rule_id, None)
+        if rule is None:
+            return False
+        self._append({'op': "unrule", 'id': rule_id})
+        job_id = self.by_rule.get(rule_id)
+        if job_id is not None:
+            self.cancel(job_id)
+        return True
+
+    def next_of(self, rule_id: int) -> Optional[dict]:
+        job_id = self.by_rule.get(rule_id)
+        return self.jobs.get(job_id) if job_id is not None else None
+
+    def _materialize(self, rule: dict, after: float):
+        """Queue the first occurrence of `rule` after `after`"""
+        try:
+            at = next_occurrence(rule, after)
+        except ValueError as e:
+            print(f"[Scheduler] Rule {rule['id']} has no next occurrence: {e}")
+            return
+        self.add(at, rule['url'], rule['duration'], rule['channel'], rule['title'],
+                 rule['chat_id'], rule_id=rule['id'])
+
+    def upcoming(self, chat_id: Optional[int] = None, limit: int = 20) -> List[dict]:
+        """
+        The next `limit` pending jobs, optionally only those of one chat.
+
+        The heap is read in order through a second, small heap of positions whose
+        parents were already listed, so only entries up to the last job returned
+        are visited. Entries of cancelled jobs are skipped.
+        """
+        heap = self._heap
+        frontier = [(heap[0], 0)] if heap else []
+        found = []
+        while frontier and len(found) < limit:
+            (_, job_id), position = heapq.heappop(frontier)
+            job = self.jobs.get(job_id)
+            if job is not None and (chat_id is None or job['chat_id'] == chat_id):
+                found.append(job)
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return found
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            # Entries of cancelled jobs are dropped once they reach the top
+            while self._heap and self._heap[0][1] not in self.jobs:
+                heapq.heappop(self._heap)
+            self._wakeup.clear()
+
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            at, job_id = self._heap[0]
+            wait = at - PREWARM_SECONDS - time.time()
+            if wait > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            job = self.jobs.pop(job_id)
+            if job['message_id']:
+                self.by_message.pop(job['message_id'], None)
+            if 'rule' in job:
+                self.by_rule.pop(job['rule'], None)
+            self._append({'op': "fire", 'id': job_id})
+            self._launch(job)
+            if job.get('rule') in self.rules:
+                self._materialize(self.rules[job['rule']], job['at'])
+
+    def _launch(self, job: dict):
+        # start_recording waits for the exact start itself, and shortens the
+        # recording if it is already late (e.g. restored after a restart)
+        task = asyncio.create_task(start_recording(
+            job['url'], job['duration'], job['channel'], job['title'], job['chat_id'],
+            start_at=job['at']
+        ))
+        if job['message_id']:
+            scheduled_jobs[job['message_id']] = task
+            task.add_done_callback(lambda _: scheduled_jobs.pop(job['message_id'], None))
+
+
+timer_scheduler = TimerScheduler()
+
+
 async def start_recording_instantly(
-    url: str, 
-    duration: str, 
-    channel: str, 
-    title: str, 
-    chat_id: int, 
-    message_id: int
+    url: str,
+    duration: str,
+    channel: str,
+    title: str,
+    chat_id: int,
+    message_id: int,
+    rewind: Optional[int] = None,
+    fit: Optional[int] = None
 ):
-    """Start recording immediately"""
-    task = asyncio.create_task(start_recording(url, duration, channel, title, chat_id, message_id))
-    
+    """Start recording immediately, or `rewind` seconds in the past from the timeshift buffer"""
+    task = asyncio.create_task(start_recording(
+        url, duration, channel, title, chat_id, message_id, rewind=rewind, fit=fit
+    ))
+
     if message_id:
         scheduled_jobs[message_id] = task
-    
+
     return task
 
 async def schedule_recording(
@@ -39,28 +451,23 @@ async def schedule_recording(
 ):
     """Schedule a recording for future time"""
     target_time = get_ist_datetime(start_time_str)
-    current_time = datetime.now(timezone("Asia/Kolkata"))
-    delay = (target_time - current_time).total_seconds()
+    at = target_time.timestamp()
 
-    if delay < 0:
+    if at < time.time():
         print("Start time is in the past. Starting immediately.")
-        delay = 0
+        at = time.time()
 
-    async def delayed_recording():
-        if delay > 0:
-            await asyncio.sleep(delay)
-        await start_recording(url, duration, channel, title, chat_id)
-
-    task = asyncio.create_task(delayed_recording())
-    
-    if message_id:
-        scheduled_jobs[message_id] = task
+    job = timer_scheduler.add(at, url, duration, channel, title, chat_id, message_id)
+    timer_scheduler.start()
 
     print(f"Recording scheduled at {target_time} IST for {duration}")
-    return task
+    return job
 
 def cancel_scheduled_recording(message_id: int):
     """Cancel a scheduled recording by its message ID"""
+    job_id = timer_scheduler.by_message.get(message_id)
+    if job_id is not None:
+        return timer_scheduler.cancel(job_id)
     if message_id in scheduled_jobs:
         task = scheduled_jobs[message_id]
         task.cancel()
@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py refuses to load without these; real values come from .env in production
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("ADMIN_ID", "1")
+
+# Modules create their working directories (recordings, caches, upload state)
+# relative to the current directory at import time; keep them out of the tree
+os.chdir(tempfile.mkdtemp(prefix="iptv-bot-tests-"))
@@ -0,0 +1,172 @@
+import asyncio
+from collections import namedtuple
+
+import pytest
+
+from recorders import admission as admission_module
+from recorders.admission import AdmissionController, AdmissionRejected, DiskReservation
+from recorders.planner import plan_recording, written_bytes
+
+Usage = namedtuple("Usage", "total used free")
+GB = 1024 ** 3
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(admission_module.shutil, "disk_usage", lambda path: Usage(100 * GB, 50 * GB, 50 * GB))
+    controller = AdmissionController()
+    controller.load_per_cpu = lambda: 0.0
+    return controller
+
+
+def test_reservation_shrinks_with_usage():
+    written = [0]
+    reservation = DiskReservation(10, usage=lambda: written[0])
+    assert reservation.outstanding == 10
+    written[0] = 4
+    assert reservation.outstanding == 6
+    written[0] = 20
+    assert reservation.outstanding == 0
+
+
+def test_reservations_come_off_available_disk(controller):
+    asyncio.run(controller.admit("a", 1_000_000, reserve=10 * GB))
+    assert controller.reserved_disk == 10 * GB
+    assert controller.available_disk() == 40 * GB
+    controller.release("a")
+    assert controller.reserved_disk == 0
+    assert "a" not in controller.active
+
+
+def test_job_larger_than_the_volume_is_rejected(controller):
+    with pytest.raises(AdmissionRejected):
+        asyncio.run(controller.admit("huge", 1_000_000, reserve=200 * GB))
+
+
+def test_admit_works_before_the_recordings_directory_exists(tmp_path, monkeypatch):
+    directory = tmp_path / "recordings"
+    monkeypatch.setattr(admission_module, "RECORDINGS_DIR", str(directory))
+    controller = AdmissionController()
+    controller.load_per_cpu = lambda: 0.0
+    asyncio.run(controller.admit("timeshift:News", 1_000_000, reserve=1024))
+    assert directory.is_dir()
+    assert "timeshift:News" in controller.active
+
+
+def test_disk_shortage_blocks(controller):
+    asyncio.run(controller.admit("a", 1_000_000, reserve=49 * GB))
+    assert controller.blocked_reason(1_000_000, reserve=1 * GB)
+
+
+def test_non_ingest_job_takes_no_slot(controller, monkeypatch):
+    monkeypatch.setattr(admission_module, "MAX_CONCURRENT_RECORDINGS", 1)
+    asyncio.run(controller.admit("live", 1_000_000))
+    assert controller.blocked_reason(1_000_000) is not None
+    asyncio.run(controller.admit("rewind", 0, reserve=1 * GB, ingest=False))
+    assert "rewind" not in controller.active
+    assert controller.reserved_disk == 1 * GB
+    controller.release("rewind")
+    assert controller.reserved_disk == 0
+
+
+def test_plan_streaming_keeps_a_few_parts_on_disk():
+    plan = plan_recording(8_000_000, 3600, 600, streaming=True)
+    part = 1_000_000 * 600 * 1.03
+    assert plan['parts'] == 6
+    assert plan['disk'] <= part * 3 + 1
+    assert plan['disk'] < plan['size']
+
+
+def test_plan_fit_needs_room_for_the_reencode():
+    plan = plan_recording(8_000_000, 3600, 3600, streaming=False, fit=1 * GB)
+    assert plan['size'] == 1 * GB
+    assert plan['disk'] > 2 * 8_000_000 / 8 * 3600
+
+
+def test_written_bytes_counts_renamed_parts_once(tmp_path):
+    (tmp_path / "temp_1_000.mkv").write_bytes(b"x" * 10)
+    renamed = tmp_path / "Title.part01.mkv"
+    renamed.write_bytes(b"x" * 5)
+    pattern = str(tmp_path / "temp_1*")
+    assert written_bytes(pattern) == 10
+    assert written_bytes(pattern, [str(renamed), str(tmp_path / "temp_1_000.mkv")]) == 15
+    assert written_bytes(pattern, [str(tmp_path / "gone.mkv")]) == 10
+
+
+def test_slots_and_bandwidth_budget(controller, monkeypatch):
+    monkeypatch.setattr(admission_module, "MAX_CONCURRENT_RECORDINGS", 2)
+    monkeypatch.setattr(admission_module, "MAX_INGEST_BITRATE", 10_000_000)
+    # A single stream above the budget still runs on an idle box
+    asyncio.run(controller.admit("big", 12_000_000))
+    assert controller.blocked_reason(1_000_000) == "bandwidth budget in use"
+    controller.release("big")
+    asyncio.run(controller.admit("a", 4_000_000))
+    asyncio.run(controller.admit("b", 4_000_000))
+    assert controller.blocked_reason(1_000_000) == "2 recordings already running"
+    assert controller.snapshot()['bitrate'] == 8_000_000
+
+
+def test_high_load_blocks(controller, monkeypatch):
+    monkeypatch.setattr(admission_module, "MAX_LOAD_PER_CPU", 1.5)
+    controller.load_per_cpu = lambda: 2.0
+    assert controller.blocked_reason(1_000_000) == "server busy"
+    monkeypatch.setattr(admission_module, "MAX_LOAD_PER_CPU", 0)
+    assert controller.blocked_reason(1_000_000) is None
+
+
+def test_queue_is_fifo_and_released_slots_wake_it(controller, monkeypatch):
+    monkeypatch.setattr(admission_module, "MAX_CONCURRENT_RECORDINGS", 1)
+    notices = {'second': [], 'third': []}
+    started = []
+
+    async def wait_for(job_id):
+        async def on_queued(position, reason):
+            notices[job_id].append((position, reason))
+        await controller.admit(job_id, 1_000_000, on_queued=on_queued)
+        started.append(job_id)
+
+    async def scenario():
+        await controller.admit("first", 1_000_000)
+        second = asyncio.create_task(wait_for("second"))
+        await asyncio.sleep(0)
+        third = asyncio.create_task(wait_for("third"))
+        await asyncio.sleep(0)
+        assert controller.waiting == ["second", "third"]
+
+        controller.release("first")
+        await asyncio.wait_for(second, 1)
+        assert started == ["second"] and controller.waiting == ["third"]
+        await asyncio.sleep(0.01)  # Let the third job see it is now first in line
+        controller.release("second")
+        await asyncio.wait_for(third, 1)
+
+    asyncio.run(scenario())
+    assert started == ["second", "third"]
+    assert notices['second'] == [(1, "1 recordings already running")]
+    # While the freed slot goes to the head of the queue, the next job is only behind it
+    assert notices['third'] == [
+        (2, "1 recordings already running"), (2, "waiting for earlier jobs"), (1, "1 recordings already running")
+    ]
+
+
+def test_full_queue_rejects_and_cancelled_waiters_leave_it(controller, monkeypatch):
+    monkeypatch.setattr(admission_module, "MAX_CONCURRENT_RECORDINGS", 1)
+    monkeypatch.setattr(admission_module, "MAX_QUEUED_RECORDINGS", 1)
+
+    async def scenario():
+        await controller.admit("running", 1_000_000)
+        waiter = asyncio.create_task(controller.admit("waiting", 1_000_000))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await controller.admit("rejected", 1_000_000)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.waiting == []
+
+    asyncio.run(scenario())
+
+
+def test_release_of_an_unknown_job_is_harmless(controller):
+    controller.release("never-admitted")
+    assert controller.snapshot()['active'] == 0
@@ -0,0 +1,133 @@
+import asyncio
+
+import channel_prober as channel_prober_module
+from channel_prober import ChannelProber
+from m3u_manager import m3u_manager
+
+
+def probed(up, ttfb=None, failures=0, checked_at=0.0, bitrate=None):
+    return {'up': up, 'ttfb': ttfb, 'variants': [], 'bitrate': bitrate, 'error': None,
+            'checked_at': checked_at, 'failures': failures}
+
+
+def test_rank_puts_fast_live_channels_first(tmp_path):
+    prober = ChannelProber(str(tmp_path / "health.json"))
+    prober.results = {
+        "http://slow": probed(True, ttfb=2.5),
+        "http://fast": probed(True, ttfb=0.3),
+        "http://down-once": probed(False, failures=1),
+        "http://down-often": probed(False, failures=4),
+        "http://no-ttfb": probed(True),
+    }
+    channels = [{'url': url} for url in (
+        "http://down-often", "http://unchecked", "http://slow", "http://down-once", "http://fast", "http://no-ttfb"
+    )]
+    assert [info['url'] for info in prober.rank(channels)] == [
+        "http://no-ttfb", "http://fast", "http://slow", "http://unchecked", "http://down-once", "http://down-often"
+    ]
+    assert prober.health_key("http://unchecked") == (1, 0.0)
+    assert prober.health_key("http://down-often") == (2, 4)
+
+
+def test_accessors(tmp_path):
+    prober = ChannelProber(str(tmp_path / "health.json"))
+    prober.results = {"http://up": probed(True, ttfb=0.4, bitrate=3_000_000),
+                      "http://down": probed(False, bitrate=3_000_000)}
+    assert prober.bitrate("http://up") == 3_000_000
+    assert prober.bitrate("http://down") is None
+    assert prober.is_down("http://down") and not prober.is_down("http://up")
+    assert not prober.is_down("http://unchecked")
+    assert prober.badge("http://up") == "🟢 0.4s"
+    assert prober.badge("http://down") == "🔴"
+    assert prober.badge("http://unchecked") == "❔"
+
+
+def test_due_urls_and_save_follow_the_playlists(monkeypatch, tmp_path):
+    monkeypatch.setattr(channel_prober_module, "PROBE_INTERVAL", 3600)
+    monkeypatch.setattr(channel_prober_module, "PROBE_RETRY_INTERVAL", 600)
+    monkeypatch.setattr(m3u_manager, "channels", {
+        "1:a": {'url': "http://live"}, "1:b": {'url': "http://failing"},
+        "1:c": {'url': "http://new"}, "1": {'url': "http://alias-only"},
+    })
+    prober = ChannelProber(str(tmp_path / "health.json"))
+    prober.results = {
+        "http://live": probed(True, checked_at=1000.0),
+        "http://failing": probed(False, checked_at=1000.0),
+        "http://removed": probed(True, checked_at=0.0),
+    }
+    assert sorted(prober.due_urls(1000.0 + 599)) == ["http://new"]
+    assert sorted(prober.due_urls(1000.0 + 600)) == ["http://failing", "http://new"]
+    assert sorted(prober.due_urls(1000.0 + 3600)) == ["http://failing", "http://live", "http://new"]
+
+    prober.save()
+    reloaded = ChannelProber(prober.path)
+    reloaded.load()
+    assert sorted(reloaded.results) == ["http://failing", "http://live"]
+
+
+class FakeContent:
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    async def readany(self):
+        return self.chunks.pop(0) if self.chunks else b""
+
+
+class FakeResponse:
+    def __init__(self, url, chunks, status=200):
+        self.url = url
+        self.status = status
+        self.content = FakeContent(chunks)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f"HTTP {self.status}")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get(self, url, **kwargs):
+        return self.responses[url]
+
+
+def test_probe_records_variants_bitrate_and_failures(monkeypatch, tmp_path):
+    master = (b"#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=800000\nlow.m3u8\n",
+              b"#EXT-X-STREAM-INF:BANDWIDTH=4000000,RESOLUTION=1920x1080\nhigh.m3u8\n")
+    measured = []
+
+    async def estimate_stream_bitrate(url, session):
+        measured.append(url)
+        return 3_500_000
+
+    monkeypatch.setattr(channel_prober_module, "estimate_stream_bitrate", estimate_stream_bitrate)
+    prober = ChannelProber(str(tmp_path / "health.json"))
+    prober.results = {"http://gone/": probed(False, failures=2)}
+    session = FakeSession({
+        "http://tv/master.m3u8": FakeResponse("http://tv/master.m3u8", master),
+        "http://gone/": FakeResponse("http://gone/", [], status=404),
+        "http://empty/": FakeResponse("http://empty/", []),
+    })
+
+    async def scenario():
+        for url in session.responses:
+            await prober._probe(session, url)
+
+    asyncio.run(scenario())
+    live = prober.result("http://tv/master.m3u8")
+    assert live['up'] and live['failures'] == 0 and live['ttfb'] is not None
+    assert live['variants'] == [{'bandwidth': 4000000, 'resolution': "1920x1080"},
+                                {'bandwidth': 800000, 'resolution': None}]
+    assert live['bitrate'] == 3_500_000
+    assert measured == ["http://tv/high.m3u8"]
+
+    gone = prober.result("http://gone/")
+    assert not gone['up'] and gone['failures'] == 3 and gone['error'] == "HTTP 404"
+    assert prober.result("http://empty/")['error'] == "empty response"
@@ -0,0 +1,156 @@
+import asyncio
+
+import uploader.client_pool as client_pool_module
+from uploader.client_pool import ClientPool, PooledClient
+
+
+class Factory:
+    """create/ping/stop callbacks over numbered fake clients"""
+
+    def __init__(self, ping_fails=False, create_fails=False):
+        self.created = 0
+        self.pings = []
+        self.stopped = []
+        self.ping_fails = ping_fails
+        self.create_fails = create_fails
+
+    async def create(self):
+        await asyncio.sleep(0)
+        if self.create_fails:
+            raise ConnectionError("no route")
+        self.created += 1
+        return f"client{self.created}"
+
+    async def ping(self, client):
+        self.pings.append(client)
+        if self.ping_fails:
+            raise ConnectionError("timed out")
+
+    async def stop(self, client):
+        self.stopped.append(client)
+        raise RuntimeError("already disconnected")
+
+    def pooled(self, name="main"):
+        return PooledClient(name, self.create, self.ping, self.stop)
+
+
+def test_get_connects_once_even_when_asked_concurrently():
+    factory = Factory()
+
+    async def scenario():
+        pooled = factory.pooled()
+        clients = await asyncio.gather(*(pooled.get() for _ in range(5)))
+        assert clients == ["client1"] * 5
+        assert pooled.healthy_at > 0
+
+    asyncio.run(scenario())
+    assert factory.created == 1
+
+
+def test_reset_stops_the_client_and_the_next_get_reconnects():
+    factory = Factory()
+
+    async def scenario():
+        pooled = factory.pooled()
+        await pooled.get()
+        await pooled.reset()  # A stop that raises is swallowed
+        assert pooled.client is None
+        assert await pooled.get() == "client2"
+        await pooled.reset()
+        await pooled.reset()  # Nothing to stop
+
+    asyncio.run(scenario())
+    assert factory.stopped == ["client1", "client2"]
+
+
+def test_check_pings_a_healthy_client():
+    factory = Factory()
+
+    async def scenario():
+        pooled = factory.pooled()
+        await pooled.check()  # Not connected yet: nothing to ping
+        await pooled.get()
+        pooled.healthy_at = 0.0
+        await pooled.check()
+        assert pooled.client == "client1" and pooled.healthy_at > 0
+
+    asyncio.run(scenario())
+    assert factory.pings == ["client1"]
+
+
+def test_failed_check_reconnects():
+    factory = Factory(ping_fails=True)
+
+    async def scenario():
+        pooled = factory.pooled()
+        await pooled.get()
+        await pooled.check()
+        assert pooled.client == "client2"
+
+    asyncio.run(scenario())
+    assert factory.stopped == ["client1"]
+
+
+def test_failed_reconnect_leaves_the_client_unset():
+    factory = Factory(ping_fails=True)
+
+    async def scenario():
+        pooled = factory.pooled()
+        await pooled.get()
+        factory.create_fails = True
+        await pooled.check()  # Logged, not raised
+        assert pooled.client is None
+
+    asyncio.run(scenario())
+
+
+def test_check_skips_a_client_that_is_connecting():
+    factory = Factory()
+
+    async def scenario():
+        pooled = factory.pooled()
+        await pooled.get()
+        async with pooled._lock:
+            await pooled.check()
+
+    asyncio.run(scenario())
+    assert factory.pings == []
+
+
+def test_slow_ping_counts_as_a_failure():
+    factory = Factory()
+
+    async def hang(client):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        pooled = PooledClient("main", factory.create, hang, factory.stop)
+        pooled.ping_timeout = 0.01
+        await pooled.get()
+        await pooled.check()
+        assert pooled.client == "client2"
+
+    asyncio.run(scenario())
+
+
+def test_pool_health_loop_checks_every_client(monkeypatch):
+    monkeypatch.setattr(client_pool_module, "UPLOADER_HEALTH_INTERVAL", 0.01)
+    first, second = Factory(), Factory(ping_fails=True)
+
+    async def scenario():
+        pool = ClientPool()
+        pool.add(first.pooled("first"))
+        pool.add(second.pooled("second"))
+        assert await pool.get("first") == "client1"
+        await pool.get("second")
+        pool.start()
+        await asyncio.sleep(0.05)
+        await pool.stop()
+        assert pool._task.cancelled()
+        assert all(client.client is None for client in pool.clients.values())
+
+    asyncio.run(scenario())
+    assert first.pings and first.created == 1
+    # The second one failed every check and was replaced each time
+    assert second.created == len(second.pings) + 1 >= 2
+    assert first.stopped == ["client1"]
@@ -0,0 +1,101 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import epg_manager as epg_manager_module
+from epg_manager import ChannelGuide, EPGManager, parse_xmltv_time
+from handlers.epg_handler import format_programme
+
+
+def test_parse_xmltv_time_with_offset():
+    assert parse_xmltv_time("20260101203000 +0530") == int(
+        datetime(2026, 1, 1, 15, 0, tzinfo=timezone.utc).timestamp()
+    )
+
+
+def test_parse_xmltv_time_without_offset_is_local_time():
+    assert parse_xmltv_time("20260101203000") == int(datetime(2026, 1, 1, 20, 30).timestamp())
+
+
+def test_parse_xmltv_time_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_xmltv_time("tomorrow")
+
+
+@pytest.fixture
+def guide():
+    guide = ChannelGuide()
+    # Added out of order, as guides list them per source
+    guide.add(200, 300, "Evening News")
+    guide.add(0, 100, "Morning Show")
+    guide.add(100, 200, "Cricket Live")
+    guide.add(400, 500, "Late Movie")
+    guide.sort()
+    return guide
+
+
+def test_guide_keeps_compact_sorted_arrays(guide):
+    assert guide.starts.typecode == "q"
+    assert list(guide.starts) == [0, 100, 200, 400]
+    assert guide.titles == ["Morning Show", "Cricket Live", "Evening News", "Late Movie"]
+
+
+def test_guide_lookup_by_time(guide):
+    assert guide.at(150)['title'] == "Cricket Live"
+    assert guide.at(200)['title'] == "Evening News"
+    assert guide.at(350) is None  # A gap in the schedule
+    assert guide.at(-5) is None
+    assert [p['title'] for p in guide.upcoming(350, count=2)] == ["Late Movie"]
+    assert [p['title'] for p in guide.upcoming(150, count=2)] == ["Cricket Live", "Evening News"]
+
+
+def test_guide_find_skips_finished_programmes(guide):
+    assert guide.find("news", 0)['start'] == 200
+    assert guide.find("morning", 150) is None
+    assert guide.find("CRICKET", 150)['start'] == 100
+
+
+XMLTV = b"""<?xml version="1.0" encoding="UTF-8"?>
+<tv>
+  <channel id="News.in"><display-name>News</display-name></channel>
+  <programme channel="News.in" start="{now}" stop="{later}"><title>Headlines *live*</title></programme>
+  <programme channel="News.in" start="20000101000000 +0000" stop="20000101010000 +0000"><title>Old</title></programme>
+  <programme channel="News.in" start="broken" stop="broken"><title>Broken</title></programme>
+  <programme channel="Other.in" start="{now}" stop="{later}"><title>Not in a playlist</title></programme>
+</tv>
+"""
+
+
+class Response:
+    def __init__(self, body):
+        self.raw = io.BufferedReader(io.BytesIO(body))
+
+    def raise_for_status(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_load_url_keeps_wanted_channels_inside_the_window(monkeypatch):
+    now = datetime.now(timezone.utc)
+    stamp = lambda t: t.strftime("%Y%m%d%H%M%S +0000")
+    body = XMLTV.replace(b"{now}", stamp(now).encode()).replace(b"{later}", stamp(now + timedelta(hours=1)).encode())
+    monkeypatch.setattr(epg_manager_module.requests, "get", lambda url, **kwargs: Response(body))
+    manager = EPGManager([])
+    guides = {}
+
+    count = manager._load_url("http://epg/guide.xml", {"news.in"}, guides)
+
+    assert count == 1
+    assert list(guides) == ["news.in"]
+    assert guides["news.in"].titles == ["Headlines *live*"]
+
+
+def test_programme_titles_are_escaped_for_markdown():
+    text = format_programme({'start': 0, 'stop': 60, 'title': "Headlines *live* with `code` and a_b"})
+    assert text.endswith(r"Headlines \*live\* with \`code\` and a\_b")
@@ -0,0 +1,108 @@
+from recorders import ffmpeg_progress
+from recorders.ffmpeg_progress import FFmpegProgress
+
+
+def test_update_parses_progress_keys():
+    stats = FFmpegProgress()
+    for key, value in [("out_time_us", "12500000"), ("total_size", "N/A"),
+                       ("bitrate", "2500.5kbits/s"), ("speed", "1.02x"), ("progress", "continue")]:
+        stats.update(key, value)
+    assert stats.out_time == 12.5
+    assert stats.total_size == 0
+    assert stats.bitrate == 2500.5
+    assert stats.speed == 1.02
+    assert stats.state == "continue"
+
+
+def test_segment_muxer_output_is_measured_on_disk(tmp_path):
+    # What a capture through the segment muxer actually reports
+    stats = FFmpegProgress()
+    pattern = str(tmp_path / "temp_%03d.mkv")
+    stats.write_parts(pattern, 3)
+    for key, value in [("out_time_us", "20000000"), ("total_size", "N/A"),
+                       ("bitrate", "N/A"), ("speed", "1x"), ("progress", "continue")]:
+        stats.update(key, value)
+    assert stats.total_size == 0
+    assert stats.bitrate == 0
+
+    (tmp_path / "temp_003.mkv").write_bytes(b"\0" * 1_500_000)
+    (tmp_path / "temp_004.mkv").write_bytes(b"\0" * 1_000_000)
+    stats.part_closed(str(tmp_path / "temp_003.mkv"))
+    # A closed part stays counted after the uploader moves it away
+    (tmp_path / "temp_003.mkv").unlink()
+    assert stats.total_size == 2_500_000
+    assert stats.bitrate == 1000.0  # 2.5 MB over 20 s
+
+    stats.restart()
+    assert stats.total_size == 0
+
+
+def test_ring_parts_wrap_around(tmp_path):
+    stats = FFmpegProgress()
+    stats.write_parts(str(tmp_path / "slot_%03d.ts"), 1, wrap=2)
+    for slot in (1, 0):
+        path = tmp_path / f"slot_{slot:03d}.ts"
+        path.write_bytes(b"\0" * 100)
+        stats.part_closed(str(path))
+    (tmp_path / "slot_001.ts").write_bytes(b"\0" * 10)  # Being overwritten
+    assert stats.total_size == 210
+
+
+def test_update_ignores_unparsable_values():
+    stats = FFmpegProgress()
+    stats.update("out_time_us", "N/A")
+    stats.update("speed", "N/A")
+    assert stats.out_time == 0.0
+    assert stats.speed == 0.0
+
+
+def test_log_line_reads_best_video_stream_and_keeps_errors():
+    stats = FFmpegProgress()
+    stats.log_line("[info] Input #0, hls, from 'http://example/master.m3u8':")
+    stats.log_line("[info]     Stream #0:0: Video: h264 (Main), yuv420p, 640x360, 25 fps")
+    stats.log_line("[info]     Stream #0:1: Video: h264 (High), yuv420p, 1920x1080, 25 fps")
+    stats.log_line("[info]     Stream #0:2: Audio: aac (LC), 48000 Hz, stereo")
+    stats.log_line("[info] Output #0, segment, to 'out_%03d.mkv':")
+    stats.log_line("[info]     Stream #0:0: Video: h264, 320x240")
+    stats.log_line("[hls @ 0x1] [error] Failed to open segment 42")
+    assert stats.resolution == "1920x1080"
+    assert stats.video_codec == "h264"
+    assert stats.audio_codec == "aac"
+    assert stats.last_error.endswith("Failed to open segment 42")
+
+
+def test_eta_follows_speed():
+    stats = FFmpegProgress()
+    stats.out_time = 60.0
+    stats.speed = 2.0
+    assert stats.eta(120.0) == 30.0
+    stats.speed = 0.0
+    assert stats.eta(120.0) == 60.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_liveness_follows_media_time_under_the_segment_muxer(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ffmpeg_progress, "time", clock)
+    stats = FFmpegProgress()
+    block = [("total_size", "N/A"), ("bitrate", "N/A"), ("speed", "1x"), ("progress", "continue")]
+
+    for second in range(1, 4):
+        clock.now += 10
+        for key, value in [("out_time_us", str(second * 10_000_000))] + block:
+            stats.update(key, value)
+        assert stats.stalled_for == 0
+
+    # ffmpeg keeps reporting but the media time is stuck
+    for _ in range(3):
+        clock.now += 10
+        for key, value in [("out_time_us", "30000000")] + block:
+            stats.update(key, value)
+    assert stats.stalled_for == 30
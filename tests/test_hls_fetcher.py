@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from recorders.hls_fetcher import HLSFetcher, HLSUnsupported, parse_master_playlist, parse_media_playlist
+
+MASTER = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360
+low/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080
+https://cdn.example/high/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2500000
+mid/index.m3u8
+"""
+
+
+def media(first, count, endlist=False, extra=""):
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:4", f"#EXT-X-MEDIA-SEQUENCE:{first}", extra]
+    for sequence in range(first, first + count):
+        lines += ["#EXTINF:4.000,", f"seg{sequence}.ts"]
+    if endlist:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def test_parse_master_playlist():
+    variants = parse_master_playlist(MASTER, "https://origin.example/live/master.m3u8")
+    assert [v['bandwidth'] for v in variants] == [800000, 5000000, 2500000]
+    assert variants[0] == {
+        'bandwidth': 800000, 'resolution': "640x360", 'url': "https://origin.example/live/low/index.m3u8"
+    }
+    assert variants[1]['url'] == "https://cdn.example/high/index.m3u8"
+    assert variants[2]['resolution'] == ""
+
+
+def test_parse_media_playlist_numbers_segments():
+    playlist = parse_media_playlist(
+        media(41, 3, endlist=True, extra='#EXT-X-MAP:URI="init.mp4"'), "https://cdn.example/ch/index.m3u8"
+    )
+    assert [(s['sequence'], s['url']) for s in playlist['segments']] == [
+        (41, "https://cdn.example/ch/seg41.ts"), (42, "https://cdn.example/ch/seg42.ts"),
+        (43, "https://cdn.example/ch/seg43.ts"),
+    ]
+    assert playlist['segments'][0]['duration'] == 4.0
+    assert playlist['target_duration'] == 4
+    assert playlist['endlist']
+    assert playlist['init_url'] == "https://cdn.example/ch/init.mp4"
+
+
+def test_unencrypted_key_is_accepted():
+    playlist = parse_media_playlist(media(0, 1, extra="#EXT-X-KEY:METHOD=NONE"), "https://cdn.example/")
+    assert len(playlist['segments']) == 1
+
+
+@pytest.mark.parametrize("extra", [
+    '#EXT-X-KEY:METHOD=AES-128,URI="key.bin"',
+    '#EXT-X-KEY:METHOD=SAMPLE-AES,URI="key.bin"',
+    "#EXT-X-BYTERANGE:1000@0",
+])
+def test_unsupported_media_playlists_are_rejected(extra):
+    with pytest.raises(HLSUnsupported):
+        parse_media_playlist(media(0, 2, extra=extra), "https://cdn.example/")
+
+
+def fake_fetcher(monkeypatch, playlists):
+    """A fetcher whose playlist requests return `playlists[url]` (a list is served in turn)"""
+    fetcher = HLSFetcher("https://origin.example/live/master.m3u8")
+    requested = []
+
+    async def get_text(url):
+        requested.append(url)
+        text = playlists[url]
+        if isinstance(text, list):
+            text = text.pop(0) if len(text) > 1 else text[0]
+        return text, url
+
+    async def get_bytes(url):
+        return url.rsplit("/", 1)[-1].encode() + b";"
+
+    monkeypatch.setattr(fetcher, "_get_text", get_text)
+    monkeypatch.setattr(fetcher, "_get_bytes", get_bytes)
+    return fetcher, requested
+
+
+def test_prepare_picks_the_highest_bandwidth_variant(monkeypatch):
+    fetcher, requested = fake_fetcher(monkeypatch, {
+        "https://origin.example/live/master.m3u8": MASTER,
+        "https://cdn.example/high/index.m3u8": media(0, 3),
+    })
+    async def scenario():
+        await fetcher.prepare()
+        await fetcher.close()
+
+    asyncio.run(scenario())
+    assert fetcher.media_url == "https://cdn.example/high/index.m3u8"
+    assert fetcher.variant['resolution'] == "1920x1080"
+    assert requested[-1] == fetcher.media_url
+
+
+def test_prepare_rejects_separate_audio_renditions(monkeypatch):
+    master = MASTER.replace(
+        "#EXTM3U\n", '#EXTM3U\n#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aud",NAME="en",URI="audio/en.m3u8"\n'
+    )
+    fetcher, _ = fake_fetcher(monkeypatch, {"https://origin.example/live/master.m3u8": master})
+    with pytest.raises(HLSUnsupported):
+        asyncio.run(fetcher.prepare())
+    assert fetcher.session is None
+
+
+class Writer:
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_feed_follows_a_media_sequence_reset(monkeypatch):
+    url = "https://origin.example/live/index.m3u8"
+    fetcher, _ = fake_fetcher(monkeypatch, {url: [
+        media(100, 5),               # Joined live: start 3 segments from the edge
+        media(0, 3),                 # The origin restarted its numbering
+        media(1, 3, endlist=True),
+    ]})
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda delay: real_sleep(0))
+    writer = Writer()
+
+    async def scenario():
+        fetcher.url = url
+        await fetcher.prepare()
+        try:
+            await asyncio.wait_for(fetcher.feed(writer), 5)
+        finally:
+            await fetcher.close()
+
+    asyncio.run(scenario())
+    assert writer.data == b"seg102.ts;seg103.ts;seg104.ts;seg0.ts;seg1.ts;seg2.ts;seg3.ts;"
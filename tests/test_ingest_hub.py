@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+import recorder
+import recorders.ingest_hub as ingest_hub_module
+from recorders.ffmpeg_progress import FFmpegProgress
+from recorders.ingest_hub import IngestHub, IngestSession, ingest_hub
+
+
+def drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def test_a_stale_session_does_not_unregister_the_current_one():
+    hub = IngestHub()
+    old = hub.open("http://stream", 1000.0, FFmpegProgress())
+    hub.end_capture(old)
+    assert hub.find("http://stream") is None
+
+    current = hub.open("http://stream", 2000.0, FFmpegProgress())
+    hub.close(old)
+    assert hub.find("http://stream") is current
+
+
+def test_parts_are_cut_or_shared_whole_by_window(tmp_path, monkeypatch):
+    cuts = []
+
+    async def cut_segment(path, output_path, offset, duration):
+        cuts.append((path, output_path, offset, duration))
+
+    monkeypatch.setattr(ingest_hub_module, "cut_segment", cut_segment)
+    session = IngestSession("http://stream", 1000.0, FFmpegProgress())
+    queue = asyncio.Queue()
+    follower = session.follow(queue, 1010.0, 1100.0, str(tmp_path / "follower"))
+
+    async def scenario():
+        # Sticks out before the follower's start: cut
+        assert await session.share_cuts({'start': 0.0, 'end': 20.0}, "part0.mkv") == []
+        # Inside the window: shared as the uploaded message
+        whole = await session.share_cuts({'start': 20.0, 'end': 60.0}, "part1.mkv")
+        assert whole == [follower]
+        await session.share_uploaded(whole, {'start': 20.0, 'end': 60.0}, 555, 40.0, 1234)
+        # Outside the window: skipped
+        assert await session.share_cuts({'start': 200.0, 'end': 220.0}, "part9.mkv") == []
+        assert not follower.done.is_set()
+        # Reaches past the end: cut, and the follower is complete
+        await session.share_cuts({'start': 90.0, 'end': 120.0}, "part3.mkv")
+
+    asyncio.run(scenario())
+    assert [(path, offset, duration) for path, _, offset, duration in cuts] == [
+        ("part0.mkv", 10.0, 10.0), ("part3.mkv", 0.0, 10.0)
+    ]
+    items = drain(queue)
+    assert [(item['start'], item['end']) for item in items] == [(0.0, 10.0), (10.0, 50.0), (80.0, 90.0)]
+    assert items[1]['message_id'] == 555
+    assert items[0]['path'] == cuts[0][1]
+    assert follower.done.is_set()
+
+
+def test_wait_capture_returns_when_the_owner_stops():
+    async def scenario():
+        session = IngestSession("http://stream", time.time(), FFmpegProgress())
+        follower = session.follow(asyncio.Queue(), time.time(), time.time() + 3600, "f")
+        asyncio.get_running_loop().call_later(0.01, session.capture_ended.set)
+        await asyncio.wait_for(session.wait_capture(follower), 1)
+
+    asyncio.run(scenario())
+
+
+def make_recording(monkeypatch, url, seconds):
+    captured = []
+
+    async def run_capture(stream_url, remaining, *args):
+        captured.append(ingest_hub.find(stream_url))
+        rec.stats.out_time = remaining
+        return 0, False
+
+    async def admit(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(recorder, "run_capture", run_capture)
+    monkeypatch.setattr(recorder.admission, "admit", admit)
+    rec = recorder.Recording(url, seconds, "Channel", "Title", 1)
+    rec.ingest = {'stream_url': url, 'bitrate': None, 'fetcher': None}
+    rec.plan = {'disk': 0}
+    rec.capture_started = time.time()
+    rec.deadline = rec.capture_started + seconds
+    return rec, captured
+
+
+def test_follower_leaves_the_owners_session_registered(monkeypatch):
+    url = "http://stream/follower"
+    rec, captured = make_recording(monkeypatch, url, 0.05)
+
+    async def scenario():
+        owner = ingest_hub.open(url, time.time(), FFmpegProgress())
+        await rec.capture_live()
+        assert captured == []
+        assert rec.session is None
+        assert ingest_hub.find(url) is owner
+        ingest_hub.close(owner)
+
+    asyncio.run(scenario())
+
+
+def test_follower_takes_over_when_the_owner_stops_first(monkeypatch):
+    url = "http://stream/takeover"
+    rec, captured = make_recording(monkeypatch, url, 3600)
+
+    async def scenario():
+        owner = ingest_hub.open(url, time.time(), FFmpegProgress())
+        asyncio.get_running_loop().call_later(0.01, ingest_hub.end_capture, owner)
+        await rec.capture_live()
+
+    asyncio.run(scenario())
+    # The rest was captured under our own, findable session
+    assert captured == [rec.session]
+    assert rec.session.capture_ended.is_set()
+    assert ingest_hub.find(url) is None
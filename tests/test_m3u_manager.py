@@ -0,0 +1,41 @@
+import asyncio
+
+from m3u_manager import M3UManager
+
+PLAYLIST = "https://example.com/list.m3u"
+
+
+def playlist(*channels):
+    lines = ["#EXTM3U"]
+    for tvg_id, name, url in channels:
+        lines += [f'#EXTINF:-1 tvg-id="{tvg_id}",{name}', url]
+    return "\n".join(lines)
+
+
+def test_refresh_replaces_the_playlist_entries(monkeypatch):
+    manager = M3UManager([])
+    manager._apply_playlist(PLAYLIST, 1, playlist(
+        ("news.in", "News", "http://cdn/news?token=old"),
+        ("gone.in", "Gone", "http://cdn/gone"),
+    ))
+    fresh = playlist(("news.in", "News", "http://cdn/news?token=new"))
+    monkeypatch.setattr(M3UManager, "_fetch_playlist", staticmethod(lambda url: fresh))
+
+    url = asyncio.run(manager.refresh_channel_url("http://cdn/news?token=old"))
+
+    assert url == "http://cdn/news?token=new"
+    assert manager.get_channel_url("news") == url
+    assert manager.url_to_source == {url: "p1"}
+    assert manager.get_channel_info("gone") is None
+
+
+def test_refresh_keeps_other_playlists(monkeypatch):
+    manager = M3UManager([])
+    manager._apply_playlist(PLAYLIST, 1, playlist(("news.in", "News", "http://a/news")))
+    manager._apply_playlist("https://example.com/other.m3u", 2, playlist(("news.in", "News", "http://b/news")))
+    monkeypatch.setattr(M3UManager, "_fetch_playlist", staticmethod(lambda url: playlist()))
+
+    assert asyncio.run(manager.refresh_channel_url("http://a/news")) is None
+    # The name and tvg-id keys belong to the second playlist's channel and stay
+    assert manager.get_channel_url("news.in") == "http://b/news"
+    assert manager.url_to_source == {"http://b/news": "p2"}
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+
+import recorders.media_probe as media_probe_module
+from recorders.media_probe import MediaProbe
+
+INFO = {
+    'format': {'duration': "12.5"},
+    'streams': [{'codec_type': "audio"}, {'codec_type': "video", 'width': 1280, 'height': 720}],
+}
+
+
+class FakeFFprobe:
+    """Stands in for create_subprocess_exec; counts runs and the most running at once"""
+
+    def __init__(self, delay=0.01, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.runs = []
+        self.running = 0
+        self.most_running = 0
+
+    async def __call__(self, *cmd, **kwargs):
+        self.runs.append(cmd[-1])
+        probe = self
+
+        class Process:
+            returncode = 1 if probe.fail else 0
+
+            async def communicate(self):
+                probe.running += 1
+                probe.most_running = max(probe.most_running, probe.running)
+                try:
+                    await asyncio.sleep(probe.delay)
+                finally:
+                    probe.running -= 1
+                if probe.fail:
+                    return b"", b"Invalid data found"
+                return json.dumps(INFO).encode(), b""
+
+        return Process()
+
+
+def setup(monkeypatch, tmp_path, **kwargs):
+    ffprobe = FakeFFprobe(**kwargs)
+    monkeypatch.setattr(media_probe_module.asyncio, "create_subprocess_exec", ffprobe)
+    path = tmp_path / "part.mkv"
+    path.write_bytes(b"\0" * 10)
+    return ffprobe, str(path)
+
+
+def test_probe_is_cached_per_file_version(monkeypatch, tmp_path):
+    ffprobe, path = setup(monkeypatch, tmp_path)
+
+    async def scenario():
+        probe = MediaProbe()
+        assert await probe.duration(path) == 12.5
+        assert await probe.resolution(path) == "1280x720"
+        assert len(ffprobe.runs) == 1
+        # Rewritten in place: new size and mtime, so it is probed again
+        with open(path, "ab") as f:
+            f.write(b"\0")
+        os.utime(path, ns=(1, 1))
+        await probe.probe(path)
+        assert len(ffprobe.runs) == 2
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_callers_share_one_probe(monkeypatch, tmp_path):
+    ffprobe, path = setup(monkeypatch, tmp_path)
+
+    async def scenario():
+        probe = MediaProbe()
+        results = await asyncio.gather(*(probe.probe(path) for _ in range(5)))
+        assert all(result == INFO for result in results)
+        assert len(ffprobe.runs) == 1
+        assert not probe._pending
+
+    asyncio.run(scenario())
+
+
+def test_probes_are_limited_by_the_semaphore(monkeypatch, tmp_path):
+    ffprobe, _ = setup(monkeypatch, tmp_path)
+    paths = []
+    for index in range(6):
+        path = tmp_path / f"file{index}.mkv"
+        path.write_bytes(b"\0")
+        paths.append(str(path))
+
+    async def scenario():
+        probe = MediaProbe(max_concurrent=2)
+        await asyncio.gather(*(probe.probe(path) for path in paths))
+
+    asyncio.run(scenario())
+    assert len(ffprobe.runs) == 6
+    assert ffprobe.most_running == 2
+
+
+def test_cache_evicts_the_least_recently_used(monkeypatch, tmp_path):
+    ffprobe, _ = setup(monkeypatch, tmp_path)
+    a, b, c = (str(tmp_path / name) for name in ("a.mkv", "b.mkv", "c.mkv"))
+    for path in (a, b, c):
+        open(path, "wb").close()
+
+    async def scenario():
+        probe = MediaProbe(cache_size=2)
+        await probe.probe(a)
+        await probe.probe(b)
+        await probe.probe(a)  # a is now the most recent
+        await probe.probe(c)  # evicts b
+        await probe.probe(a)
+        await probe.probe(b)
+
+    asyncio.run(scenario())
+    assert ffprobe.runs == [a, b, c, b]
+
+
+def test_failed_probe_is_not_cached(monkeypatch, tmp_path):
+    ffprobe, path = setup(monkeypatch, tmp_path, fail=True)
+
+    async def scenario():
+        probe = MediaProbe()
+        assert await probe.duration(path) is None
+        assert await probe.resolution(path) is None
+        assert len(ffprobe.runs) == 2
+        assert not probe._cache and not probe._pending
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_leaves_the_probe_running(monkeypatch, tmp_path):
+    ffprobe, path = setup(monkeypatch, tmp_path, delay=0.05)
+
+    async def scenario():
+        probe = MediaProbe()
+        first = asyncio.create_task(probe.probe(path))
+        second = asyncio.create_task(probe.probe(path))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == INFO
+        assert first.cancelled()
+        assert len(ffprobe.runs) == 1
+
+    asyncio.run(scenario())
+
+
+def test_missing_file_has_no_duration(tmp_path):
+    assert asyncio.run(MediaProbe().duration(str(tmp_path / "missing.mkv"))) is None
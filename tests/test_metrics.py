@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from telegram.request import HTTPXRequest
+
+import utils.metrics as metrics
+from utils.bot_client import TimedRequest, get_bot
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(metrics, "time", clock)
+    monkeypatch.setattr(metrics, "_latencies", {})
+    monkeypatch.setattr(metrics, "_gauges", {})
+    return clock
+
+
+def test_latency_summary_averages_and_counts_errors(clock):
+    metrics.record_latency("bot.sendMessage", 0.2)
+    metrics.record_latency("bot.sendMessage", 0.6, ok=False)
+    metrics.record_latency("bot.getUpdates", 30.0)
+    summary = metrics.latency_summary()
+    assert summary["bot.sendMessage"] == pytest.approx({'count': 2, 'errors': 1, 'avg': 0.4, 'max': 0.6})
+    assert summary["bot.getUpdates"]['count'] == 1
+
+
+def test_timer_records_the_block_and_failures(clock):
+    with metrics.Timer("work"):
+        clock.now += 1.5
+    with pytest.raises(ValueError):
+        with metrics.Timer("work"):
+            clock.now += 0.5
+            raise ValueError("boom")
+    assert metrics.latency_summary()["work"] == {'count': 2, 'errors': 1, 'avg': 1.0, 'max': 1.5}
+
+
+def test_gauges(clock):
+    assert metrics.gauge("uploads_active") == 0.0
+    assert metrics.gauge("uploads_active", default=-1) == -1
+    metrics.set_gauge("uploads_active", 3)
+    assert metrics.gauge("uploads_active") == 3
+
+
+def test_timed_request_records_each_bot_method(monkeypatch, clock):
+    calls = []
+
+    async def do_request(self, url, method, *args, **kwargs):
+        calls.append((url, method))
+        clock.now += 0.25
+        if url.endswith("editMessageText"):
+            raise ConnectionError("reset by peer")
+        return 200, b'{"ok": true}'
+
+    monkeypatch.setattr(HTTPXRequest, "do_request", do_request)
+    request = TimedRequest(connection_pool_size=4, keepalive_expiry=60)
+
+    async def scenario():
+        assert await request.do_request("https://api.telegram.org/bot1:x/sendMessage", "POST") == (200, b'{"ok": true}')
+        with pytest.raises(ConnectionError):
+            await request.do_request("https://api.telegram.org/bot1:x/editMessageText", "POST")
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    summary = metrics.latency_summary()
+    assert summary["bot.sendMessage"] == {'count': 1, 'errors': 0, 'avg': 0.25, 'max': 0.25}
+    assert summary["bot.editMessageText"]['errors'] == 1
+
+
+def test_timed_request_keeps_connections_alive():
+    limits = TimedRequest(connection_pool_size=4, keepalive_expiry=90)._client_kwargs['limits']
+    assert limits.max_connections == 4
+    assert limits.max_keepalive_connections == 4
+    assert limits.keepalive_expiry == 90
+
+
+def test_bot_is_shared():
+    bot = get_bot()
+    assert get_bot() is bot
+    assert isinstance(bot.request, TimedRequest)
@@ -0,0 +1,68 @@
+import asyncio
+
+from telethon.errors import FloodWaitError
+
+import uploader.parallel_upload as parallel_upload
+from config import PARALLEL_UPLOAD_PART_RETRIES
+from uploader.parallel_upload import InFlightWindow, ParallelUploader
+
+
+class FakeSender:
+    """Records the parts it was sent; fails the scripted ones first"""
+
+    def __init__(self, received, failures):
+        self.received = received
+        self.failures = failures
+
+    async def send(self, request):
+        await asyncio.sleep(0)
+        if self.failures.get(request.file_part):
+            self.failures[request.file_part].pop()
+            raise FloodWaitError(None, capture=0)
+        self.received[request.file_part] = request.bytes
+
+    async def disconnect(self):
+        pass
+
+
+def test_window_grows_per_ack_and_halves_on_failure():
+    async def scenario():
+        window = InFlightWindow(start=4, maximum=5)
+        for _ in range(4):
+            await window.acquire()
+        assert window.in_flight == 4
+        blocked = asyncio.create_task(window.acquire())
+        await asyncio.sleep(0)
+        assert not blocked.done()
+
+        await window.release(True)
+        assert window.size == 4.25
+        await blocked
+        await window.release(False)
+        assert window.size == 2.125
+        for _ in range(3):
+            await window.release(False)
+        assert window.size == 1.0
+        assert window.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_flood_waits_do_not_use_up_part_retries(tmp_path, monkeypatch):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(bytes(range(256)) * 60_000)  # Several 512 KB parts
+    received = {}
+    # One part is flood-limited more often than it may fail
+    failures = {1: [None] * (PARALLEL_UPLOAD_PART_RETRIES + 2)}
+
+    async def open_sender(client):
+        return FakeSender(received, failures)
+
+    monkeypatch.setattr(parallel_upload, "open_sender", open_sender)
+    progress = []
+    uploader = ParallelUploader(client=None, connections=2, max_in_flight=3)
+    result = asyncio.run(uploader.upload(str(path), lambda done, total: progress.append(done)))
+
+    assert result.parts == len(received)
+    assert b"".join(received[part] for part in range(result.parts)) == path.read_bytes()
+    assert progress[-1] == path.stat().st_size
@@ -0,0 +1,59 @@
+import asyncio
+from types import SimpleNamespace
+
+import features.progress_ticker as progress_ticker_module
+from features.progress_ticker import ProgressTicker
+
+
+class FakeBot:
+    def __init__(self):
+        self.texts = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.texts.append(text)
+        return SimpleNamespace(message_id=7)
+
+    async def edit_message_text(self, text, **kwargs):
+        self.texts.append(text)
+
+
+def test_each_tick_renders_a_live_job_once(monkeypatch):
+    bot = FakeBot()
+    monkeypatch.setattr(progress_ticker_module, "get_bot", lambda: bot)
+    monkeypatch.setattr(progress_ticker_module, "PROGRESS_MIN_INTERVAL", 0)
+    monkeypatch.setattr(progress_ticker_module, "PROGRESS_EDITS_PER_SECOND", 1000)
+    renders = []
+
+    def render():
+        renders.append(None)
+        return f"Recording… {len(renders)}"
+
+    async def scenario():
+        ticker = ProgressTicker()
+        ticker.tick = 0.01
+        ticker.add("rec", 1, render=render)
+        for _ in range(5):
+            await asyncio.sleep(ticker.tick)
+        ticks = len(bot.texts)
+        ticker.finish("rec", "Done")
+        await asyncio.wait_for(ticker._task, 1)
+        return ticks
+
+    ticks = asyncio.run(scenario())
+    assert ticks >= 3
+    assert len(renders) == ticks
+    assert bot.texts[-1] == "Done"
+
+
+def test_finish_survives_a_failing_render(monkeypatch):
+    async def scenario():
+        ticker = ProgressTicker()
+        monkeypatch.setattr(ticker, "_ensure_running", lambda: None)
+        ticker.add("rec", 1, render=lambda: 1 / 0)
+        ticker.finish("rec")
+        return ticker.jobs["rec"]
+
+    job = asyncio.run(scenario())
+    assert job['done_at'] is not None
+    assert job['render'] is None
+    assert job['text'].startswith("⚠️ Progress unavailable")
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import pytest
+from pytz import timezone
+
+from scheduler import TimerScheduler, duration_seconds, next_occurrence, parse_rule
+
+
+def journal_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("value, seconds", [("90", 90), ("01:30:00", 5400), ("00:00:05", 5)])
+def test_duration_seconds(value, seconds):
+    assert duration_seconds(value) == seconds
+
+
+@pytest.mark.parametrize("value", ["", "1:30", "abc", "00:00:00", "-5", "01:xx:00"])
+def test_duration_seconds_rejects(value):
+    with pytest.raises(ValueError):
+        duration_seconds(value)
+
+
+def test_journal_round_trip_skips_malformed_entries(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    scheduler = TimerScheduler(path)
+    later = time.time() + 3600
+    kept = scheduler.add(later, "http://a", "01:00:00", "ch", "kept", 1, message_id=11)
+    cancelled = scheduler.add(later, "http://b", "01:00:00", "ch", "cancelled", 1)
+    scheduler.cancel(cancelled['id'])
+    with open(path, "a") as f:
+        bad = dict(kept, id=99, duration="soon", title="bad")
+        f.write(json.dumps({'op': "add", 'job': bad}) + "\n")
+        f.write(json.dumps({'op': "add", 'job': {'id': 100}}) + "\n")
+        f.write('{"op": "add", "job": {"id"')  # Torn by a crash
+
+    restored = TimerScheduler(path)
+    restored.load()
+    assert list(restored.jobs) == [kept['id']]
+    assert restored.by_message == {11: kept['id']}
+    assert restored._heap == [(later, kept['id'])]
+    # Compaction rewrote the journal without the bad entries
+    assert [entry['job']['id'] for entry in journal_lines(path)] == [kept['id']]
+    # Ids continue after the last valid job or rule, cancelled ones included
+    assert restored.add(later, "http://c", "60", "ch", "next", 1)['id'] == cancelled['id'] + 1
+
+
+def test_expired_jobs_are_dropped_on_load(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    scheduler = TimerScheduler(path)
+    scheduler.add(time.time() - 7200, "http://a", "01:00:00", "ch", "missed", 1)
+    restored = TimerScheduler(path)
+    restored.load()
+    assert restored.jobs == {}
+
+
+def test_add_rejects_bad_duration_before_journaling(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    scheduler = TimerScheduler(str(path))
+    with pytest.raises(ValueError):
+        scheduler.add(time.time() + 60, "http://a", "later", "ch", "t", 1)
+    assert not path.exists()
+    assert scheduler.jobs == {}
+
+
+def test_rule_keeps_one_pending_occurrence(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    scheduler = TimerScheduler(path)
+    rule = scheduler.add_rule(parse_rule("daily", "10:00:00"), "http://a", "00:30:00", "ch", "news", 1)
+    job = scheduler.next_of(rule['id'])
+    assert job['rule'] == rule['id']
+
+    # Skipping an occurrence queues the following one
+    scheduler.cancel(job['id'])
+    following = scheduler.next_of(rule['id'])
+    assert following['at'] - job['at'] == 24 * 3600
+
+    restored = TimerScheduler(path)
+    restored.load()
+    assert restored.next_of(rule['id'])['id'] == following['id']
+    assert restored.remove_rule(rule['id'])
+    assert restored.next_of(rule['id']) is None
+    assert restored.jobs == {}
+
+
+def test_next_occurrence_weekdays_skips_the_weekend():
+    ist = timezone("Asia/Kolkata")
+    friday_noon = ist.localize(datetime(2026, 10, 16, 12, 0)).timestamp()
+    at = next_occurrence(parse_rule("weekdays", "10:00:00"), friday_noon)
+    assert datetime.fromtimestamp(at, ist) == ist.localize(datetime(2026, 10, 19, 10, 0))
+
+
+def test_next_occurrence_cron():
+    ist = timezone("Asia/Kolkata")
+    after = ist.localize(datetime(2026, 10, 18, 20, 31)).timestamp()
+    at = next_occurrence(parse_rule("cron", "*/15 20 * * *"), after)
+    assert datetime.fromtimestamp(at, ist) == ist.localize(datetime(2026, 10, 18, 20, 45))
+
+
+def test_upcoming_reads_the_heap_in_order(tmp_path):
+    scheduler = TimerScheduler(str(tmp_path / "journal.jsonl"))
+    now = time.time()
+    starts = [now + 3600 * hours for hours in (5, 1, 9, 3, 7, 2, 8, 4, 6)]
+    jobs = [scheduler.add(at, "http://a", "60", "ch", f"job {n}", n % 2, message_id=n + 1)
+            for n, at in enumerate(starts)]
+    scheduler.cancel(jobs[1]['id'])  # The earliest one
+
+    assert [job['at'] for job in scheduler.upcoming(limit=3)] == sorted(starts)[1:4]
+    only_odd = scheduler.upcoming(chat_id=1, limit=20)
+    assert [job['at'] for job in only_odd] == sorted(job['at'] for job in jobs[3::2])
+    assert len(scheduler.upcoming(limit=20)) == len(starts) - 1
+
+
+def test_journal_is_written_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+
+    async def scenario():
+        scheduler = TimerScheduler(path)
+        later = time.time() + 3600
+        kept = scheduler.add(later, "http://a", "60", "ch", "kept", 1)
+        for n in range(150):
+            # Enough churn to compact the journal on the way
+            scheduler.cancel(scheduler.add(later, "http://b", "60", "ch", f"tmp {n}", 1)['id'])
+        assert scheduler._writer is not None
+        await scheduler.flush()
+        return kept
+
+    kept = asyncio.run(scenario())
+    assert len(journal_lines(path)) < 150
+    restored = TimerScheduler(path)
+    restored.load()
+    assert list(restored.jobs) == [kept['id']]
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import re
+from datetime import datetime
+
+import recorder
+import utils.utils as utils_module
+from recorders.segments import group_by_size, parse_segment_entry, max_part_seconds
+
+
+def test_parse_segment_entry(tmp_path):
+    part = parse_segment_entry("temp_000.mkv,0.000000,600.040000", str(tmp_path), 3)
+    assert part['index'] == 3
+    assert part['path'] == os.path.join(str(tmp_path), "temp_000.mkv")
+    assert part['start'] == 0.0
+    assert abs(part['duration'] - 600.04) < 1e-6
+
+
+def test_parse_segment_entry_quoted_name(tmp_path):
+    part = parse_segment_entry('"a,b.mkv",10.5,12.0', str(tmp_path), 0)
+    assert part['path'].endswith("a,b.mkv")
+    assert part['duration'] == 1.5
+
+
+def test_max_part_seconds_stays_below_the_limit():
+    bitrate = 8_000_000  # 1 MB/s
+    seconds = max_part_seconds(bitrate, 2 * 1024 ** 3, headroom=0.9)
+    assert seconds * bitrate / 8 <= 2 * 1024 ** 3 * 0.9
+    assert max_part_seconds(0, 1000) >= 1
+
+
+def test_group_by_size_keeps_runs_under_the_limit(tmp_path):
+    segments = []
+    for index, size in enumerate([40, 50, 30, 90, 10]):
+        path = tmp_path / f"buffer_{index}.ts"
+        path.write_bytes(b"\0" * size)
+        segments.append({'index': index, 'path': str(path)})
+
+    groups = group_by_size(segments, 100)
+    assert [[segment['index'] for segment in group] for group in groups] == [[0, 1], [2], [3, 4]]
+
+
+def test_split_video_handles_percent_in_the_name(tmp_path, monkeypatch):
+    class Process:
+        returncode = 0
+
+        async def communicate(self):
+            return b"", b""
+
+    async def create_subprocess_exec(*cmd, **kwargs):
+        # Write three parts the way the segment muxer expands its pattern
+        for index in (1, 2, 3):
+            name = re.sub(r"%02d", f"{index:02d}", cmd[-1]).replace("%%", "%")
+            open(name, "wb").close()
+        return Process()
+
+    async def get_video_duration(path):
+        return 90.0
+
+    monkeypatch.setattr(utils_module.asyncio, "create_subprocess_exec", create_subprocess_exec)
+    monkeypatch.setattr(utils_module, "get_video_duration", get_video_duration)
+    path = tmp_path / "100% Hits.mkv"
+    path.write_bytes(b"\0" * 250)
+
+    parts = asyncio.run(utils_module.split_video(str(path), 100))
+    assert [os.path.basename(part) for part in parts] == [
+        f"100% Hits_part{index:02d}.mkv" for index in (1, 2, 3)
+    ]
+
+
+def test_upload_worker_splits_at_the_headroom_limit(tmp_path, monkeypatch):
+    split_at = []
+
+    async def split_video(path, max_size):
+        split_at.append(max_size)
+        return [path]
+
+    async def upload_file(bot, path, duration, chat_id, stats):
+        return 1
+
+    monkeypatch.setattr(recorder, "RECORDINGS_DIR", str(tmp_path))
+    monkeypatch.setattr(recorder, "MAX_PART_SIZE", 1000)
+    monkeypatch.setattr(recorder, "PART_SIZE_HEADROOM", 0.9)
+    monkeypatch.setattr(recorder, "split_video", split_video)
+    monkeypatch.setattr(recorder, "upload_file", upload_file)
+    part = tmp_path / "temp_000.mkv"
+    part.write_bytes(b"\0" * 950)  # Below MAX_PART_SIZE, over the limit parts are cut to
+
+    async def scenario():
+        queue = asyncio.Queue()
+        await queue.put({'index': 0, 'path': str(part), 'start': 0.0, 'end': 60.0, 'duration': 60.0})
+        await queue.put(None)
+        return await recorder.upload_worker(None, queue, "Title", "Channel", datetime(2026, 1, 1), 1, None)
+
+    assert asyncio.run(scenario()) == 0
+    assert split_at == [900]
@@ -0,0 +1,132 @@
+import asyncio
+import os
+
+import pytest
+
+import recorders.timeshift as timeshift_module
+from handlers.record_handler import parse_rewind
+from recorders.timeshift import TimeshiftBuffer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class Ring:
+    """Writes the slot files and the capped csv list the way ffmpeg's segment muxer does"""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.rows = []
+        self.end = 0.0
+        self.seen = 0.0
+        self.slot = 0
+        os.makedirs(buffer.directory, exist_ok=True)
+        self.list_path = os.path.join(buffer.directory, "parts.csv")
+
+    def write_part(self, seconds, clock=None):
+        name = f"slot_{self.slot:03d}.mkv"
+        with open(os.path.join(self.buffer.directory, name), "w") as f:
+            f.write(f"{self.end}")
+        self.rows = (self.rows + [f"{name},{self.end},{self.end + seconds}\n"])[-self.buffer.slots:]
+        with open(self.list_path, "w") as f:
+            f.writelines(self.rows)
+        self.end += seconds
+        self.slot = (self.slot + 1) % self.buffer.slots
+        if clock:
+            clock.now += seconds
+        self.seen = self.buffer._read_list(self.list_path, self.seen)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(timeshift_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def buffer():
+    # 30 s window in 10 s parts: 3 slots plus 2 spare
+    return TimeshiftBuffer("News HD", "http://stream", window=30, segment_seconds=10)
+
+
+def slots(buffer):
+    return [os.path.basename(path) for path in buffer.parts]
+
+
+def test_slots_are_reused_and_the_oldest_part_evicted(clock, buffer):
+    assert buffer.slots == 5
+    ring = Ring(buffer)
+    for _ in range(5):
+        ring.write_part(10, clock)
+    assert slots(buffer) == ["slot_000.mkv", "slot_001.mkv", "slot_002.mkv", "slot_003.mkv", "slot_004.mkv"]
+    assert buffer._next_slot == 0
+
+    # Wrapping around overwrites slot 0; its old part is gone
+    ring.write_part(10, clock)
+    assert slots(buffer) == ["slot_001.mkv", "slot_002.mkv", "slot_003.mkv", "slot_004.mkv", "slot_000.mkv"]
+    assert buffer.parts[os.path.join(buffer.directory, "slot_000.mkv")]['start'] == 50.0
+    assert buffer.oldest == 1010.0
+    assert buffer._next_slot == 1
+
+
+def test_overwritten_slots_are_not_intact(clock, buffer):
+    ring = Ring(buffer)
+    for _ in range(5):
+        ring.write_part(10, clock)
+    first, second = list(buffer.parts.values())[:2]
+    # ffmpeg is writing slot 0 again
+    assert not buffer._intact(first)
+    assert buffer._intact(second)
+
+    ring.write_part(10, clock)
+    assert not buffer._intact(first)
+    assert buffer._intact(buffer.parts[first['path']])
+    assert not buffer._intact(second)  # Slot 1 is next now
+
+
+def test_record_copies_the_backlog_then_follows_the_live_edge(clock, buffer, tmp_path):
+    ring = Ring(buffer)
+    for _ in range(3):
+        ring.write_part(10, clock)  # Wall clock 990-1020
+    delivered = []
+
+    async def on_segment(segment):
+        with open(segment['path']) as f:
+            segment['content'] = f.read()
+        delivered.append(segment)
+        if len(delivered) == 2:
+            # The live edge moves on while the backlog is copied
+            ring.write_part(10, clock)
+
+    since = clock.now - parse_rewind("--from=-00:15")
+    seconds = asyncio.run(
+        buffer.record(since, 25, str(tmp_path / "copy_%03d.mkv"), on_segment)
+    )
+
+    assert seconds == 30
+    assert [segment['content'] for segment in delivered] == ["10.0", "20.0", "30.0"]
+    assert [(segment['start'], segment['end']) for segment in delivered] == [(0.0, 5.0), (5.0, 15.0), (15.0, 25.0)]
+    assert [segment['index'] for segment in delivered] == [0, 1, 2]
+    assert buffer._subscribers == []
+
+
+def test_record_skips_parts_overwritten_before_they_were_copied(clock, buffer, tmp_path):
+    ring = Ring(buffer)
+    for _ in range(5):
+        ring.write_part(10, clock)
+    delivered = []
+
+    async def on_segment(segment):
+        delivered.append(segment)
+
+    # Slot 0 holds the oldest part but is being written again
+    asyncio.run(buffer.record(clock.now - 50, 20, str(tmp_path / "copy_%03d.mkv"), on_segment))
+    assert [segment['duration'] for segment in delivered] == [10.0]
+    # The copied part starts 10 s into the requested window
+    assert (delivered[0]['start'], delivered[0]['end']) == (10.0, 20.0)
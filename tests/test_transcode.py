@@ -0,0 +1,109 @@
+import asyncio
+import os
+
+import pytest
+
+import recorders.transcode as transcode
+
+
+def test_fit_video_bitrate_leaves_room_for_audio_and_container():
+    # 100 MB over 800 s: 1 MB/s in total, of which 3% goes to the container
+    bitrate = transcode.fit_video_bitrate(100_000_000, 800, audio_bitrate=128_000)
+    assert bitrate == int(1_000_000 * transcode.CONTAINER_OVERHEAD) - 128_000
+    assert (bitrate + 128_000) * 800 / 8 <= 100_000_000
+
+
+def test_fit_video_bitrate_has_a_floor():
+    assert transcode.fit_video_bitrate(1_000_000, 3600) == transcode.MIN_VIDEO_BITRATE
+    # A zero duration must not divide by zero
+    assert transcode.fit_video_bitrate(1_000_000, 0) > 0
+
+
+class FakeProcess:
+    def __init__(self, returncode):
+        self.returncode = returncode
+
+    async def communicate(self):
+        return b"", b"boom" if self.returncode else b""
+
+
+def fake_ffmpeg(monkeypatch, chunks=3, fail=None):
+    """Record every ffmpeg command line and create the files it would write"""
+    commands = []
+
+    async def create_subprocess_exec(*cmd, **kwargs):
+        commands.append(list(cmd))
+        output = cmd[-1]
+        if "segment" in cmd:
+            for index in range(chunks):
+                open(output % index, "wb").close()
+        elif fail and fail in cmd:
+            return FakeProcess(1)
+        else:
+            open(output, "wb").close()
+        return FakeProcess(0)
+
+    monkeypatch.setattr(transcode.asyncio, "create_subprocess_exec", create_subprocess_exec)
+    monkeypatch.setattr(transcode, "TRANSCODE_WORKERS", 2)
+    monkeypatch.setattr(transcode, "_encode_slots", asyncio.Semaphore(2))
+    return commands
+
+
+def run(path, output, duration=600, target=50_000_000):
+    asyncio.run(transcode.transcode_to_fit(path, output, duration, target))
+
+
+def test_chunks_are_encoded_at_the_fitted_bitrate_and_joined(monkeypatch, tmp_path):
+    commands = fake_ffmpeg(monkeypatch, chunks=3)
+    output = str(tmp_path / "fitted.mkv")
+    work_dir = output + ".work"
+    run("in.mkv", output)
+
+    split, *encodes, join = commands
+    # Two chunks per worker: 600 s over 2 workers beats the 60 s minimum
+    assert split[split.index("-segment_time") + 1] == str(600 / (2 * 2))
+    assert split[-1] == os.path.join(work_dir, "chunk_%04d.mkv")
+
+    bitrate = str(transcode.fit_video_bitrate(50_000_000, 600))
+    video = [cmd for cmd in encodes if "libx264" in cmd]
+    audio = [cmd for cmd in encodes if "aac" in cmd]
+    assert len(audio) == 1 and audio[0][-1] == os.path.join(work_dir, "audio.mka")
+    assert sorted(cmd[cmd.index("-i") + 1] for cmd in video) == [
+        os.path.join(work_dir, f"chunk_{index:04d}.mkv") for index in range(3)
+    ]
+    assert all(cmd[cmd.index("-b:v") + 1] == bitrate and cmd[-1].startswith(os.path.join(work_dir, "encoded_"))
+               for cmd in video)
+
+    assert join[join.index("-f") + 1] == "concat"
+    assert join[join.index("-map") + 1:join.index("-map") + 4] == ["0:v", "-map", "1:a"]
+    assert join[-1] == output
+    assert not os.path.exists(work_dir)
+
+
+def test_concat_list_names_the_encoded_chunks_in_order(monkeypatch, tmp_path):
+    commands = fake_ffmpeg(monkeypatch, chunks=2)
+    lists = []
+    real_exec = transcode.asyncio.create_subprocess_exec
+
+    async def capture_list(*cmd, **kwargs):
+        if "concat" in cmd:
+            with open(cmd[cmd.index("concat") + 4]) as f:
+                lists.append(f.read())
+        return await real_exec(*cmd, **kwargs)
+
+    monkeypatch.setattr(transcode.asyncio, "create_subprocess_exec", capture_list)
+    output = str(tmp_path / "it's.mkv")
+    run("in.mkv", output)
+
+    escaped = (output + ".work").replace("'", "'\\''")
+    assert lists == [f"file '{escaped}/encoded_0000.mkv'\nfile '{escaped}/encoded_0001.mkv'\n"]
+    assert len(commands) == 5
+
+
+def test_failed_audio_encode_fails_the_transcode(monkeypatch, tmp_path):
+    commands = fake_ffmpeg(monkeypatch, chunks=2, fail="aac")
+    output = str(tmp_path / "fitted.mkv")
+    with pytest.raises(RuntimeError, match="audio encode"):
+        run("in.mkv", output)
+    assert not any("concat" in cmd for cmd in commands)
+    assert not os.path.exists(output + ".work")
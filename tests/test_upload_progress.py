@@ -0,0 +1,102 @@
+import math
+
+import pytest
+
+import uploader.upload_progress as upload_progress
+from uploader.upload_progress import RATE_TIME_CONSTANT, UploadProgress
+from utils.metrics import gauge
+
+MB = 1024 * 1024
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(upload_progress.time, "monotonic", clock)
+    return clock
+
+
+def test_first_sample_only_sets_the_baseline(clock):
+    progress = UploadProgress("video.mp4", 100 * MB)
+    progress.update(40 * MB, 100 * MB)  # Resumed parts
+    progress.sample()
+    assert progress.rate == 0
+    assert progress.eta is None
+    assert "ETA:* …" in progress.render()
+
+
+def test_steady_rate_and_eta(clock):
+    progress = UploadProgress("video.mp4", 100 * MB)
+    progress.sample()
+    clock.now += 10
+    progress.update(20 * MB, 100 * MB)
+    progress.sample()
+    assert progress.rate == 2 * MB
+    assert progress.eta == 40
+
+    # Samples closer together than MIN_SAMPLE_INTERVAL are skipped
+    clock.now += 0.1
+    progress.update(30 * MB, 100 * MB)
+    progress.sample()
+    assert progress.rate == 2 * MB
+
+
+def test_rate_is_smoothed(clock):
+    progress = UploadProgress("video.mp4", 100 * MB)
+    progress.sample()
+    clock.now += 5
+    progress.update(10 * MB, 100 * MB)
+    progress.sample()
+    clock.now += 5
+    progress.update(40 * MB, 100 * MB)
+    progress.sample()
+
+    weight = 1 - math.exp(-5 / RATE_TIME_CONSTANT)
+    assert progress.rate == pytest.approx(2 * MB + weight * (6 * MB - 2 * MB))
+    assert 2 * MB < progress.rate < 6 * MB
+
+
+def test_counter_drop_rebaselines(clock):
+    progress = UploadProgress("video.mp4", 100 * MB)
+    progress.sample()
+    clock.now += 10
+    progress.update(50 * MB, 100 * MB)
+    progress.sample()
+    rate = progress.rate
+
+    clock.now += 10
+    progress.update(5 * MB, 100 * MB)  # Started again on another session
+    progress.sample()
+    assert progress.rate == rate
+    clock.now += 10
+    progress.update(15 * MB, 100 * MB)
+    progress.sample()
+    assert rate > progress.rate > MB
+
+
+def test_gauges_follow_active_uploads(clock):
+    first = UploadProgress("a.mp4", 100 * MB)
+    second = UploadProgress("b.mp4", 100 * MB)
+    for progress in (first, second):
+        progress.start()
+        progress.sample()
+    clock.now += 10
+    first.update(10 * MB, 100 * MB)
+    second.update(30 * MB, 100 * MB)
+    first.sample()
+    second.sample()
+    assert gauge("uploads_active") == 2
+    assert gauge("upload_bytes_per_second") == 4 * MB
+
+    first.close()
+    second.close()
+    assert gauge("uploads_active") == 0
+    assert gauge("upload_bytes_per_second") == 0
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+import uploader.resumable_upload as resumable_upload
+from config import UPLOAD_STATE_TTL
+from uploader.resumable_upload import BIG_FILE_SIZE, PART_SIZE, UploadStateStore, upload_parts
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStateStore(directory=str(tmp_path / "state"))
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"\0" * (PART_SIZE * 2 + 1))
+    return str(path)
+
+
+def test_state_round_trip(store, video):
+    state = store.new(video, "uploader_1", {'chat_id': 42})
+    state['acked'] = [0, 2]
+    store.save(state)
+
+    loaded = store.load(video)
+    assert loaded == state
+    assert loaded['parts'] == 3
+    assert loaded['chat_id'] == 42
+    assert store.pending() == [state]
+
+
+def test_changed_file_invalidates_state(store, video):
+    store.new(video, "uploader_1", {})
+    with open(video, "ab") as f:
+        f.write(b"more")
+
+    assert store.load(video) is None
+    assert os.listdir(store.directory) == []
+
+
+def test_pending_prunes_expired_and_missing(store, video, tmp_path):
+    expired = store.new(video, "uploader_1", {})
+    expired['created_at'] = time.time() - UPLOAD_STATE_TTL - 1
+    store.save(expired)
+    gone = tmp_path / "gone.mp4"
+    gone.write_bytes(b"x")
+    store.new(str(gone), "uploader_1", {})
+    gone.unlink()
+    kept = tmp_path / "kept.mp4"
+    kept.write_bytes(b"y")
+    state = store.new(str(kept), "uploader_1", {})
+
+    assert store.pending() == [state]
+    assert len(os.listdir(store.directory)) == 1
+
+
+class FakeApp:
+    """Acknowledges parts after a short delay; fails the listed ones"""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.received = {}
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    async def invoke(self, request):
+        self.in_flight += 1
+        self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            if request.file_part in self.fail:
+                await asyncio.sleep(0.02)
+                raise ConnectionError("connection lost")
+            await asyncio.sleep(0.001 * (request.file_part % 3))
+            self.received[request.file_part] = request.bytes
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def big_video(tmp_path, store, monkeypatch):
+    monkeypatch.setattr(resumable_upload, "upload_states", store)
+    path = tmp_path / "big.mp4"
+    path.write_bytes(os.urandom(BIG_FILE_SIZE + PART_SIZE * 3 + 7))
+    return str(path)
+
+
+def test_big_file_parts_go_up_concurrently(store, big_video):
+    state = store.new(big_video, "uploader_1", {})
+    state['acked'] = [0, 5]
+    app = FakeApp()
+    progress = []
+
+    result = asyncio.run(upload_parts(app, state, lambda done, total: progress.append(done), in_flight=4))
+
+    assert result.parts == state['parts']
+    assert app.most_in_flight == 4
+    assert sorted(app.received) == [part for part in range(state['parts']) if part not in (0, 5)]
+    assert store.load(big_video)['acked'] == list(range(state['parts']))
+    assert progress[-1] == os.path.getsize(big_video)
+
+
+def test_failed_part_keeps_the_others_acknowledged(store, big_video):
+    state = store.new(big_video, "uploader_1", {})
+    app = FakeApp(fail={6})
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(upload_parts(app, state, in_flight=4))
+
+    saved = store.load(big_video)['acked']
+    assert 6 not in saved
+    assert set(saved) == set(app.received)
+    # Parts after the failed one were acknowledged out of order and are kept
+    assert max(saved) > 6
@@ -0,0 +1,98 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+from config import UPLOADER_HEALTH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class PooledClient:
+    """
+    One long-lived MTProto client.
+
+    The client is created and connected on first use and then kept, so an
+    upload does not pay for a connect, session load and DC handshake. A failed
+    health check (or a caller that hit a connection error) resets it; the next
+    `get` connects a fresh one.
+    """
+
+    ping_timeout = 15
+
+    def __init__(self, name: str, create: Callable[[], Awaitable[Any]],
+                 ping: Callable[[Any], Awaitable[Any]], stop: Callable[[Any], Awaitable[Any]]):
+        self.name = name
+        self._create = create
+        self._ping = ping
+        self._stop = stop
+        self.client: Any = None
+        self.healthy_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Any:
+        async with self._lock:
+            if self.client is None:
+                started = time.monotonic()
+                self.client = await self._create()
+                self.healthy_at = time.time()
+                logger.info(f"Uploader client {self.name} connected in {time.monotonic() - started:.1f}s")
+            return self.client
+
+    async def check(self):
+        """Ping the client if it is connected; reset it when it does not answer"""
+        if self.client is None or self._lock.locked():
+            return
+        try:
+            await asyncio.wait_for(self._ping(self.client), timeout=self.ping_timeout)
+            self.healthy_at = time.time()
+        except Exception as e:
+            logger.warning(f"Uploader client {self.name} failed its health check ({e!r}), reconnecting")
+            await self.reset()
+            try:
+                await self.get()
+            except Exception as e:
+                logger.error(f"Uploader client {self.name} could not reconnect: {e}")
+
+    async def reset(self):
+        async with self._lock:
+            client, self.client = self.client, None
+        if client is not None:
+            try:
+                await self._stop(client)
+            except Exception:
+                pass  # Already broken; it only has to go away
+
+
+class ClientPool:
+    """The uploader clients of the process, pinged every UPLOADER_HEALTH_INTERVAL seconds"""
+
+    def __init__(self):
+        self.clients: Dict[str, PooledClient] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, client: PooledClient):
+        self.clients[client.name] = client
+
+    async def get(self, name: str) -> Any:
+        return await self.clients[name].get()
+
+    async def reset(self, name: str):
+        await self.clients[name].reset()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(UPLOADER_HEALTH_INTERVAL)
+            await asyncio.gather(*(client.check() for client in self.clients.values()))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await asyncio.gather(*(client.reset() for client in self.clients.values()))
+
+
+client_pool = ClientPool()
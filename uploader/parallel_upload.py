@@ -0,0 +1,160 @@
+import os
+import math
+import random
+import asyncio
+import inspect
+import logging
+from typing import Callable, List, Optional
+from telethon import TelegramClient, utils
+from telethon.errors import FloodWaitError
+from telethon.network import MTProtoSender
+from telethon.tl.functions.upload import SaveBigFilePartRequest
+from telethon.tl.types import InputFileBig
+from config import PARALLEL_UPLOAD_CONNECTIONS, PARALLEL_UPLOAD_MAX_IN_FLIGHT, PARALLEL_UPLOAD_PART_RETRIES
+
+logger = logging.getLogger(__name__)
+
+
+async def open_sender(client: TelegramClient) -> MTProtoSender:
+    """
+    A second connection to the client's own DC, authorized with its auth key.
+
+    Telethon has no public API for this, so every private member the parallel
+    upload relies on is used here and nowhere else: `_get_dc`, `_connection`,
+    `_log`, `_proxy` and `_local_addr`. Checked against Telethon 1.45.0; a
+    Telethon that renamed them fails here with AttributeError.
+    """
+    dc = await client._get_dc(client.session.dc_id)
+    sender = MTProtoSender(client.session.auth_key, loggers=client._log)
+    await sender.connect(client._connection(
+        dc.ip_address, dc.port, dc.id, loggers=client._log, proxy=client._proxy,
+        local_addr=client._local_addr
+    ))
+    return sender
+
+
+class InFlightWindow:
+    """
+    How many parts may be on the wire at once, adjusted AIMD style.
+
+    Every acknowledged part grows the window by 1/size (about one more part
+    per round trip). A failed or flood-limited part halves it, so the uploader
+    settles near what the link and Telegram's DC accept.
+    """
+
+    def __init__(self, start: int, maximum: int):
+        self.size = float(start)
+        self.maximum = maximum
+        self.in_flight = 0
+        self._changed = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < int(self.size))
+            self.in_flight += 1
+
+    async def release(self, ok: bool):
+        async with self._changed:
+            self.in_flight -= 1
+            if ok:
+                self.size = min(self.maximum, self.size + 1 / self.size)
+            else:
+                self.size = max(1.0, self.size / 2)
+            self._changed.notify_all()
+
+
+class ParallelUploader:
+    """
+    Upload a big file as SaveBigFilePart chunks over several connections.
+
+    `client.upload_file` sends one part after another over the client's single
+    connection. Here PARALLEL_UPLOAD_CONNECTIONS extra senders are opened to
+    the session's own DC with its auth key. Parts are pushed over them with an
+    adaptive in-flight window. A part that fails is retried on its own; the
+    rest of the file is not sent again.
+    """
+
+    def __init__(self, client: TelegramClient, connections: int = PARALLEL_UPLOAD_CONNECTIONS,
+                 max_in_flight: int = PARALLEL_UPLOAD_MAX_IN_FLIGHT):
+        self.client = client
+        self.connections = connections
+        self.max_in_flight = max_in_flight
+
+    async def upload(self, file_path: str, progress_callback: Optional[Callable] = None) -> InputFileBig:
+        file_size = os.path.getsize(file_path)
+        part_size = utils.get_appropriated_part_size(file_size) * 1024
+        part_count = math.ceil(file_size / part_size)
+        file_id = random.getrandbits(63)
+
+        senders: List[MTProtoSender] = await asyncio.gather(
+            *(open_sender(self.client) for _ in range(self.connections))
+        )
+        window = InFlightWindow(start=self.connections, maximum=self.max_in_flight)
+        pending: asyncio.Queue = asyncio.Queue()
+        for part in range(part_count):
+            pending.put_nowait(part)
+        attempts = [0] * part_count
+        uploaded = 0
+        flood_until = 0.0  # Loop time before which no worker sends
+        loop = asyncio.get_running_loop()
+        fd = os.open(file_path, os.O_RDONLY)
+
+        async def send_parts(sender: MTProtoSender):
+            nonlocal uploaded, flood_until
+            while True:
+                try:
+                    part = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                if flood_until > loop.time():
+                    await asyncio.sleep(flood_until - loop.time())
+                data = await asyncio.to_thread(os.pread, fd, part_size, part * part_size)
+                await window.acquire()
+                ok = False
+                flood_wait = None
+                try:
+                    await sender.send(SaveBigFilePartRequest(file_id, part, part_count, data))
+                    ok = True
+                except FloodWaitError as e:
+                    flood_wait = e.seconds
+                except Exception as e:
+                    logger.warning(f"Part {part} of {file_path} failed: {e!r}")
+                finally:
+                    await window.release(ok)
+
+                if flood_wait is not None:
+                    # Not the part's fault: every worker pauses (holding no window
+                    # slot) and the part is sent again without using up a retry
+                    flood_until = max(flood_until, loop.time() + flood_wait)
+                    pending.put_nowait(part)
+                    continue
+                if not ok:
+                    attempts[part] += 1
+                    if attempts[part] > PARALLEL_UPLOAD_PART_RETRIES:
+                        raise RuntimeError(f"part {part} failed {attempts[part]} times")
+                    pending.put_nowait(part)
+                    continue
+
+                uploaded += len(data)
+                if progress_callback:
+                    result = progress_callback(uploaded, file_size)
+                    if inspect.isawaitable(result):
+                        await result
+
+        try:
+            # Several workers per connection keep each one busy while parts are in flight
+            workers = [
+                asyncio.create_task(send_parts(senders[i % len(senders)]))
+                for i in range(self.max_in_flight)
+            ]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                for worker in workers:
+                    worker.cancel()
+                raise
+        finally:
+            os.close(fd)
+            await asyncio.gather(*(sender.disconnect() for sender in senders), return_exceptions=True)
+
+        return InputFileBig(id=file_id, parts=part_count, name=os.path.basename(file_path))
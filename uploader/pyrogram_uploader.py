@@ -1,15 +1,65 @@
 import os
+import time
 import asyncio
 from typing import Optional, List, Dict
 from pyrogram import Client
 from pyrogram.errors import FloodWait
-from telegram import Bot, Message
-from config import API_ID, API_HASH, SESSION_NAME, STORE_CHANNEL_ID, BOT_TOKEN
+from telegram import Message
+from utils.bot_client import get_bot
+from features.progress_ticker import progress_ticker
+from config import (
+    API_ID, API_HASH, SESSION_NAME, SESSION_STRING, SESSION_STRINGS, UPLOADS_PER_SESSION,
+    STORE_CHANNEL_ID, BOT_TOKEN, UPLOAD_RETRIES
+)
 from captions import caption_uploaded
+from uploader.client_pool import client_pool, PooledClient
+from uploader.resumable_upload import upload_states, upload_parts, send_uploaded_video
+from uploader.upload_progress import UploadProgress
+
+class UploadSession:
+    """One uploader account, with its own flood wait and concurrent upload budget"""
+
+    def __init__(self, name: str, session_string: Optional[str], session_dir: str):
+        self.name = name
+        self.session_string = session_string
+        self.session_dir = session_dir
+        self.active = 0            # Uploads running on this session
+        self.flood_until = 0.0     # Telegram asked this session to wait until then
+        client_pool.add(PooledClient(
+            name, self._create_client,
+            ping=lambda app: app.get_me(),
+            stop=lambda app: app.stop()
+        ))
+
+    async def _create_client(self) -> Client:
+        # With a session string the session lives in memory only: no sqlite file
+        # to open on connect or to lock against other processes
+        app = Client(
+            name=self.name,
+            api_id=API_ID,
+            api_hash=API_HASH,
+            session_string=self.session_string,
+            in_memory=bool(self.session_string),
+            workdir=self.session_dir
+        )
+        await app.start()
+        return app
+
+    def ready(self, now: float) -> bool:
+        return self.flood_until <= now and self.active < UPLOADS_PER_SESSION
+
 
 class UploadManager:
+    """
+    Uploads spread over every configured session.
+
+    Each upload goes to the least busy session that is not in a flood wait and
+    has fewer than UPLOADS_PER_SESSION uploads running. A FloodWait only
+    benches the session that got it, and the upload moves on to another one,
+    so total throughput grows with the number of sessions.
+    """
+
     _instance = None
-    _lock = asyncio.Lock()
     
     def __new__(cls):
         if cls._instance is None:
@@ -24,189 +74,139 @@ class UploadManager:
 
     def __init__(self):
         if not hasattr(self, 'bot'):
-            self.bot = Bot(token=BOT_TOKEN)
-            self.progress_data = {}  # {chat_id: {'msg_id': int, 'user_msg_id': int, 'file': str}}
-            self.last_update = {}
-            self.loop = asyncio.get_event_loop()
-
-    def upload_progress_callback(self, current: int, total: int, chat_id: int, file_name: str):
-        """Wrapper to safely call async progress updates from sync context"""
-        self.loop.call_soon_threadsafe(
-            lambda: asyncio.create_task(
-                self.async_upload_progress_callback(current, total, chat_id, file_name)
-            )
-        )
+            self.bot = get_bot()
+            strings = SESSION_STRINGS or [SESSION_STRING or None]
+            self.sessions = [
+                UploadSession(SESSION_NAME if i == 0 else f"{SESSION_NAME}_{i}", string, self.session_dir)
+                for i, string in enumerate(strings)
+            ]
+            self._changed = asyncio.Event()
 
-    async def async_upload_progress_callback(self, current: int, total: int, chat_id: int, file_name: str):
-        """Enhanced progress callback with better error handling"""
-        current_time = asyncio.get_event_loop().time()
-        
-        # Throttle updates to every 2 seconds
-        if chat_id in self.last_update and current_time - self.last_update[chat_id] < 2:
-            return
-        
-        self.last_update[chat_id] = current_time
-        percent = min(100, (current / total) * 100)
-        uploaded_mb = current / 1024 / 1024
-        total_mb = total / 1024 / 1024
-
-        # Visual progress bar
-        bar = '⬢' * int(percent/5) + '⬡' * (20 - int(percent/5))
-        
-        progress_text = (
-            f"*📤 Uploading:* `{file_name}`\n"
-            f"*📊 Progress:* {percent:.1f}%\n"
-            f"🔹 {uploaded_mb:.1f}MB / {total_mb:.1f}MB\n"
-            f"{bar}\n"
-            f"*⚡ Status:* Uploading..."
-        )
+    async def connect(self) -> Client:
+        """Connect every uploader session; returns the first one's client"""
+        clients = await asyncio.gather(*(client_pool.get(session.name) for session in self.sessions))
+        return clients[0]
 
-        try:
-            if chat_id not in self.progress_data:
-              #  message_id = update.message.message_id
-                # First progress update - send new message
-                message = await self.bot.send_message(
-                    chat_id=chat_id,
-                    text=progress_text,
-                    reply_to_message_id=self.progress_data.get(chat_id, {}).get('user_msg_id'),
-                    parse_mode="Markdown",
-                 #   reply_to_message_id=message_id
-                )
-                self.progress_data[chat_id] = {
-                    'msg_id': message.message_id,
-                    'user_msg_id': self.progress_data.get(chat_id, {}).get('user_msg_id'),
-                    'file': file_name
-                }
-            else:
-                # Subsequent updates - edit existing message
-                try:
-                    await self.bot.edit_message_text(
-                        chat_id=chat_id,
-                        message_id=self.progress_data[chat_id]['msg_id'],
-                        text=progress_text,
-                        parse_mode="Markdown"
-                    )
-                except Exception as edit_err:
-                    # If edit fails, send new message and update reference
-                    print(f"Progress edit failed, sending new: {edit_err}")
-                    new_msg = await self.bot.send_message(
-                        chat_id=chat_id,
-                        text=progress_text,
-                        reply_to_message_id=self.progress_data[chat_id]['user_msg_id'],
-                        parse_mode="Markdown"
-                    )
-                    self.progress_data[chat_id]['msg_id'] = new_msg.message_id
-        except Exception as e:
-            print(f"Progress update failed: {e}")
+    async def _acquire(self, prefer: Optional[str] = None) -> UploadSession:
+        """Wait for the least loaded session that may upload now (`prefer` first if it may)"""
+        while True:
+            # Cleared before checking, so a release during the checks is not missed
+            self._changed.clear()
+            now = time.time()
+            ready = [session for session in self.sessions if session.ready(now)]
+            if ready:
+                preferred = [session for session in ready if session.name == prefer]
+                session = preferred[0] if preferred else min(ready, key=lambda s: s.active)
+                session.active += 1
+                return session
+            waits = [session.flood_until - now for session in self.sessions if session.flood_until > now]
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=min(waits) if waits else None)
+            except asyncio.TimeoutError:
+                pass
 
-    async def send_uploaded_message(self, chat_id: int, file_name: str, success: bool = True, error_msg: str = None):
-        """Enhanced final message with better formatting"""
-        try:
-            if chat_id not in self.progress_data:
-                return
-
-            if success:
-                final_text = (
-                    f"📂 *File:* `{file_name}`\n"
-                    "✅ *Uploaded Successfully!*\n"
-                    "🎉 *Status:* Completed"
-                ).format(file_name=file_name)
-            else:
-                final_text = (
-                    f"📂 *File:* `{file_name}`\n"
-                    "❌ *Upload Failed!*\n"
-                    f"⚠️ *Reason:* {error_msg or 'Unknown error'}"
-                ).format(file_name=file_name, error_msg=error_msg or 'Unknown error')
+    def _release(self, session: UploadSession):
+        session.active -= 1
+        self._changed.set()
 
-            try:
-                await self.bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=self.progress_data[chat_id]['msg_id'],
-                    text=final_text,
-                    parse_mode="Markdown" 
-                )
-            except Exception as edit_err:
-                # If edit fails, send new final message
-                print(f"Final message edit failed: {edit_err}")
-                await self.bot.send_message(
-                    chat_id=chat_id,
-                    text=final_text,
-                    reply_to_message_id=self.progress_data[chat_id]['user_msg_id'],
-                    parse_mode="Markdown"
-                )
-        except Exception as e:
-            print(f"Final message error: {e}")
-        finally:
-            # Clean up tracking data
-            self.progress_data.pop(chat_id, None)
-            self.last_update.pop(chat_id, None)
-            
-            
-            
+    @staticmethod
+    def progress_job_id(chat_id: int, file_name: str) -> str:
+        return f"upload:{chat_id}:{file_name}"
 
-            
-            
-            
+    async def send_uploaded_message(self, chat_id: int, file_name: str, success: bool = True, error_msg: str = None):
+        """Enhanced final message with better formatting"""
+        if success:
+            final_text = (
+                f"📂 *File:* `{file_name}`\n"
+                "✅ *Uploaded Successfully!*\n"
+                "🎉 *Status:* Completed"
+            )
+        else:
+            final_text = (
+                f"📂 *File:* `{file_name}`\n"
+                "❌ *Upload Failed!*\n"
+                f"⚠️ *Reason:* {error_msg or 'Unknown error'}"
+            )
+        progress_ticker.finish(self.progress_job_id(chat_id, file_name), final_text)
 
     async def send_video_pyrogram(self, file_path: str, caption: str, thumbnail: Optional[str] = None, 
                                 duration: Optional[int] = None, chat_id: int = 0, 
                                 user_msg_id: int = None) -> Optional[int]:
         """Core upload function with all requested improvements"""
-        async with self._lock:
+        file_name = os.path.basename(file_path)
+        job_id = self.progress_job_id(chat_id, file_name)
+        # Initialize progress tracking
+        progress_ticker.add(job_id, chat_id, text=f"*📤 Preparing upload:* `{file_name}`", reply_to=user_msg_id)
+
+        # Check file existence and size
+        if not os.path.exists(file_path):
+            await self.send_uploaded_message(chat_id, file_name, False, "File not found")
+            return None
+
+        file_size = os.path.getsize(file_path)
+        if file_size > 2 * 1024 * 1024 * 1024:  # 2GB limit
+            await self.send_uploaded_message(chat_id, file_name, False, "File too large (>2GB)")
+            return None
+
+        # The ticker samples this counter; the upload itself only stores the byte count
+        progress = UploadProgress(file_name, file_size)
+        progress.start()
+        try:
+            return await self._upload(file_path, caption, thumbnail, duration, chat_id, user_msg_id, progress)
+        finally:
+            progress.close()
+
+    async def _upload(self, file_path: str, caption: str, thumbnail: Optional[str], duration: Optional[int],
+                      chat_id: int, user_msg_id: Optional[int], progress: UploadProgress) -> Optional[int]:
+        file_name = os.path.basename(file_path)
+        job_id = self.progress_job_id(chat_id, file_name)
+        failures = 0
+        while True:
+            # Parts acknowledged earlier (this run or before a restart) are not sent again,
+            # but they only count on the session that uploaded them
+            state = upload_states.load(file_path)
+            session = await self._acquire(prefer=state['session'] if state else None)
             try:
-                # Initialize progress tracking
-                self.progress_data[chat_id] = {
-                    'msg_id': None,
-                    'user_msg_id': user_msg_id,
-                    'file': os.path.basename(file_path)
-                }
-
-                # Check file existence and size
-                if not os.path.exists(file_path):
-                    await self.send_uploaded_message(chat_id, os.path.basename(file_path), False, "File not found")
-                    return None
-
-                file_size = os.path.getsize(file_path)
-                if file_size > 2 * 1024 * 1024 * 1024:  # 2GB limit
-                    await self.send_uploaded_message(chat_id, os.path.basename(file_path), False, "File too large (>2GB)")
-                    return None
-
-                async with Client(
-                    name=SESSION_NAME,
-                    api_id=API_ID,
-                    api_hash=API_HASH,
-                    workdir=self.session_dir
-                ) as app:
-                    # Upload with progress tracking
-                    message = await app.send_video(
-                        chat_id=STORE_CHANNEL_ID,
-                        video=file_path,
-                        caption=caption,
-                        thumb=thumbnail if thumbnail and os.path.exists(thumbnail) else None,
-                        progress=lambda curr, tot: self.upload_progress_callback(curr, tot, chat_id, os.path.basename(file_path)),
-                        duration=duration,
-                        reply_to_message_id=user_msg_id
-                    )
-                    
-                    await self.send_uploaded_message(chat_id, os.path.basename(file_path), True)
-                    return message.id
+                app = await client_pool.get(session.name)
+                if state is None or state['session'] != session.name:
+                    state = upload_states.new(file_path, session.name, {
+                        'caption': caption, 'duration': duration, 'chat_id': chat_id
+                    })
+                elif state['acked']:
+                    print(f"[Uploader] Resuming {file_name} at part {len(state['acked'])}/{state['parts']}")
 
-            except FloodWait as e:
-                # Handle flood waits properly
-                wait_msg = await self.bot.send_message(
-                    chat_id=chat_id,
-                    text=f"⏳ Flood wait: Sleeping for {e.value} seconds...",
-                    reply_to_message_id=user_msg_id
+                # Upload with progress tracking
+                progress_ticker.set_render(job_id, progress.render)
+                input_file = await upload_parts(app, state, progress.update)
+                message_id = await send_uploaded_video(
+                    app, input_file, caption, thumbnail, duration, file_name, reply_to=user_msg_id
                 )
-                await asyncio.sleep(e.value)
-                await self.bot.delete_message(chat_id, wait_msg.message_id)
-                return await self.send_video_pyrogram(file_path, caption, thumbnail, duration, chat_id, user_msg_id)
-                
+                upload_states.remove(file_path)
+
+                await self.send_uploaded_message(chat_id, file_name, True)
+                return message_id
+
+            except FloodWait as e:
+                # Only this session has to sit it out; the upload is retried on the next free one
+                session.flood_until = time.time() + e.value
+                print(f"[Uploader] Session {session.name} must wait {e.value}s, moving {file_name} on")
+                progress_ticker.set_text(job_id, f"*⏳ Flood wait:* `{file_name}` is waiting for a free session...")
+
             except Exception as e:
+                if isinstance(e, (ConnectionError, OSError)):
+                    # Don't leave a dead connection in the pool for the next part
+                    await client_pool.reset(session.name)
+                    failures += 1
+                    if failures <= UPLOAD_RETRIES:
+                        print(f"[Uploader] {file_name} lost its connection ({e}), resuming ({failures}/{UPLOAD_RETRIES})")
+                        continue
                 error_msg = str(e).replace(BOT_TOKEN, "***")  # Redact bot token
-                await self.send_uploaded_message(chat_id, os.path.basename(file_path), False, error_msg)
+                await self.send_uploaded_message(chat_id, file_name, False, error_msg)
                 return None
 
+            finally:
+                self._release(session)
+
     async def upload_sequence(self, video_list: List[Dict[str, str]], chat_id: int, user_msg_id: int) -> List[int]:
         """Process multiple videos in sequence"""
         results = []
@@ -241,6 +241,40 @@ async def send_video_pyrogram(file_path: str, caption: str, thumbnail: Optional[
         user_msg_id=user_msg_id
     )
 
+async def connect_uploader():
+    """Public interface to open the uploader session ahead of the first upload"""
+    await upload_manager.connect()
+
+async def resume_pending_uploads():
+    """
+    Finish uploads that a restart cut off, from their last acknowledged part.
+
+    The finished video is copied to the chat the upload was for, and the
+    local file is removed as the recorder would have done.
+    """
+    bot = get_bot()
+    for state in upload_states.pending():
+        file_path = state['file_path']
+        print(f"[Uploader] Resuming interrupted upload of {os.path.basename(file_path)}")
+        message_id = await upload_manager.send_video_pyrogram(
+            file_path, state['caption'], duration=state['duration'], chat_id=state['chat_id']
+        )
+        if not message_id:
+            continue
+        try:
+            await bot.copy_message(chat_id=state['chat_id'], from_chat_id=STORE_CHANNEL_ID, message_id=message_id)
+        except Exception as e:
+            print(f"[Uploader] Could not deliver {os.path.basename(file_path)}: {e}")
+        os.remove(file_path)
+
+async def warm_up_uploader(at: float):
+    """Make sure the uploader session is connected by `at` (a unix timestamp)"""
+    await asyncio.sleep(max(0.0, at - time.time()))
+    try:
+        await upload_manager.connect()
+    except Exception as e:
+        print(f"[Uploader] Warm-up failed: {e}")
+
 async def upload_videos(video_list: List[Dict[str, str]], chat_id: int, user_msg_id: int) -> List[int]:
     """Public interface for batch upload"""
     return await upload_manager.upload_sequence(video_list, chat_id, user_msg_id)
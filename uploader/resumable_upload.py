@@ -0,0 +1,192 @@
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import asyncio
+from typing import Callable, Dict, List, Optional, Union
+from pyrogram import Client, raw, utils as pyrogram_utils
+from config import UPLOAD_STATE_DIR, UPLOAD_STATE_TTL, UPLOAD_PARTS_IN_FLIGHT, STORE_CHANNEL_ID
+
+PART_SIZE = 512 * 1024  # The largest part Telegram accepts
+BIG_FILE_SIZE = 10 * 1024 * 1024  # Above this, parts go up as SaveBigFilePart
+SAVE_INTERVAL = 2  # Seconds between writes of the acknowledged parts
+
+
+class UploadStateStore:
+    """
+    Upload progress per file, kept on disk so an upload can pick up where it stopped.
+
+    A state names the session that uploaded the parts (Telegram binds them to
+    it), the upload's file id, part size, the parts Telegram acknowledged, and
+    what the finished upload is for. It is dropped when the file changes or the
+    parts are older than UPLOAD_STATE_TTL, since Telegram forgets them by then.
+    """
+
+    def __init__(self, directory: str = UPLOAD_STATE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, file_path: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def _valid(self, state: Dict) -> bool:
+        try:
+            stat = os.stat(state['file_path'])
+        except OSError:
+            return False
+        return (stat.st_size == state['size'] and stat.st_mtime_ns == state['mtime']
+                and time.time() - state['created_at'] < UPLOAD_STATE_TTL)
+
+    def load(self, file_path: str) -> Optional[Dict]:
+        try:
+            with open(self._path(file_path), "r") as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not self._valid(state):
+            self.remove(file_path)
+            return None
+        return state
+
+    def save(self, state: Dict):
+        path = self._path(state['file_path'])
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+    def remove(self, file_path: str):
+        try:
+            os.remove(self._path(file_path))
+        except FileNotFoundError:
+            pass
+
+    def pending(self) -> List[Dict]:
+        """Unfinished uploads whose file is still there; stale states are removed"""
+        states = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r") as f:
+                    state = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if self._valid(state):
+                states.append(state)
+            else:
+                os.remove(os.path.join(self.directory, name))
+        return states
+
+    def new(self, file_path: str, session: str, meta: Dict) -> Dict:
+        stat = os.stat(file_path)
+        state = {
+            'file_path': file_path,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'session': session,
+            'file_id': random.getrandbits(63),
+            'part_size': PART_SIZE,
+            'parts': max(1, math.ceil(stat.st_size / PART_SIZE)),
+            'acked': [],
+            'created_at': time.time(),
+            **meta,
+        }
+        self.save(state)
+        return state
+
+
+upload_states = UploadStateStore()
+
+
+async def upload_parts(app: Client, state: Dict,
+                       progress: Optional[Callable[[int, int], None]] = None,
+                       in_flight: int = UPLOAD_PARTS_IN_FLIGHT
+                       ) -> Union[raw.types.InputFile, raw.types.InputFileBig]:
+    """
+    Send the parts of `state` that Telegram has not acknowledged yet.
+
+    Like pyrogram's save_file, big files keep `in_flight` parts on the wire at
+    once; small ones go up one part at a time. Each part is recorded as
+    acknowledged when its own call returns, so a resume skips every part that
+    made it, whatever the order.
+    """
+    file_path, size, part_size, parts = state['file_path'], state['size'], state['part_size'], state['parts']
+    big = size > BIG_FILE_SIZE
+    acked = set(state['acked'])
+    done = sum(min(part_size, size - part * part_size) for part in acked)
+    saved_at = time.monotonic()
+    # One iterator shared by the workers, so every part is taken exactly once
+    pending = iter([part for part in range(parts) if part not in acked])
+    fd = os.open(file_path, os.O_RDONLY)
+
+    async def send_parts():
+        nonlocal done, saved_at
+        for part in pending:
+            data = await asyncio.to_thread(os.pread, fd, part_size, part * part_size)
+            if big:
+                request = raw.functions.upload.SaveBigFilePart(
+                    file_id=state['file_id'], file_part=part, file_total_parts=parts, bytes=data
+                )
+            else:
+                request = raw.functions.upload.SaveFilePart(
+                    file_id=state['file_id'], file_part=part, bytes=data
+                )
+            await app.invoke(request)
+
+            acked.add(part)
+            done += len(data)
+            if progress:
+                progress(done, size)
+            if time.monotonic() - saved_at >= SAVE_INTERVAL:
+                state['acked'] = sorted(acked)
+                upload_states.save(state)
+                saved_at = time.monotonic()
+
+    try:
+        workers = [asyncio.create_task(send_parts()) for _ in range(in_flight if big else 1)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+    finally:
+        os.close(fd)
+        state['acked'] = sorted(acked)
+        upload_states.save(state)
+
+    name = os.path.basename(file_path)
+    if big:
+        return raw.types.InputFileBig(id=state['file_id'], parts=parts, name=name)
+    return raw.types.InputFile(id=state['file_id'], parts=parts, name=name, md5_checksum="")
+
+
+async def send_uploaded_video(app: Client, input_file, caption: str, thumbnail: Optional[str],
+                              duration: Optional[int], file_name: str,
+                              reply_to: Optional[int] = None) -> int:
+    """Post an uploaded file to the store channel as a streamable video; returns the message id"""
+    mime_type = "video/mp4" if file_name.endswith(".mp4") else "video/x-matroska"
+    media = raw.types.InputMediaUploadedDocument(
+        mime_type=mime_type,
+        file=input_file,
+        thumb=await app.save_file(thumbnail) if thumbnail and os.path.exists(thumbnail) else None,
+        attributes=[
+            raw.types.DocumentAttributeVideo(supports_streaming=True, duration=duration or 0, w=0, h=0),
+            raw.types.DocumentAttributeFilename(file_name=file_name),
+        ],
+    )
+    updates = await app.invoke(raw.functions.messages.SendMedia(
+        peer=await app.resolve_peer(STORE_CHANNEL_ID),
+        media=media,
+        random_id=app.rnd_id(),
+        reply_to_msg_id=reply_to,
+        **await pyrogram_utils.parse_text_entities(app, caption, None, None),
+    ))
+    for update in updates.updates:
+        if isinstance(update, (raw.types.UpdateNewChannelMessage, raw.types.UpdateNewMessage)):
+            return update.message.id
+    raise RuntimeError("Telegram did not return the sent message")
@@ -2,15 +2,33 @@ import os
 import asyncio
 from typing import Optional, List, Dict
 from telethon.sync import TelegramClient
+from telethon.sessions import StringSession
 from telethon.tl.types import DocumentAttributeVideo
-from config import API_ID, API_HASH, BOT_TOKEN, STORE_CHANNEL_ID
+from config import (
+    API_ID, API_HASH, BOT_TOKEN, STORE_CHANNEL_ID, TELETHON_SESSION_STRING, PARALLEL_UPLOAD_CONNECTIONS
+)
 from captions import caption_uploaded
+from uploader.client_pool import client_pool, PooledClient
+from uploader.parallel_upload import ParallelUploader
+
+BIG_FILE_SIZE = 10 * 1024 * 1024  # Telegram takes files above this as SaveBigFilePart uploads
 
 
 class TelethonUploader:
     def __init__(self):
-        self.client = TelegramClient('telethon_bot', API_ID, API_HASH)
         self.lock = asyncio.Lock()
+        client_pool.add(PooledClient(
+            "telethon", self._create_client,
+            ping=lambda client: client.get_me(),
+            stop=lambda client: client.disconnect()
+        ))
+
+    @staticmethod
+    async def _create_client() -> TelegramClient:
+        session = StringSession(TELETHON_SESSION_STRING) if TELETHON_SESSION_STRING else 'telethon_bot'
+        client = TelegramClient(session, API_ID, API_HASH)
+        await client.start(bot_token=BOT_TOKEN)
+        return client
 
     async def upload_progress(self, current, total):
         percent = current * 100 / total
@@ -28,18 +46,21 @@ class TelethonUploader:
                     print(f"[Error] File too large: {file_path}")
                     return None
 
-                await self.client.start(bot_token=BOT_TOKEN)
+                client = await client_pool.get("telethon")
 
                 thumb = thumbnail if thumbnail and os.path.exists(thumbnail) else None
 
-                result = await self.client.upload_file(
-                    file=file_path,
-                    progress_callback=self.upload_progress
-                )
+                if file_size > BIG_FILE_SIZE and PARALLEL_UPLOAD_CONNECTIONS > 1:
+                    result = await ParallelUploader(client).upload(file_path, self.upload_progress)
+                else:
+                    result = await client.upload_file(
+                        file=file_path,
+                        progress_callback=self.upload_progress
+                    )
 
-                entity = await self.client.get_entity(STORE_CHANNEL_ID)
+                entity = await client.get_entity(STORE_CHANNEL_ID)
 
-                message = await self.client.send_message(
+                message = await client.send_message(
                     entity=entity,
                     message=caption,
                     file=result,
@@ -58,6 +79,8 @@ class TelethonUploader:
                 return message.id
 
             except Exception as e:
+                if isinstance(e, (ConnectionError, OSError)):
+                    await client_pool.reset("telethon")
                 print(f"[Upload Error] {str(e)}")
                 return None
 
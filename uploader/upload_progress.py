@@ -0,0 +1,92 @@
+import math
+import time
+from typing import Optional, Set
+from utils.metrics import set_gauge
+
+RATE_TIME_CONSTANT = 10.0  # Seconds over which the throughput average settles
+MIN_SAMPLE_INTERVAL = 0.5  # Renders closer together than this reuse the last sample
+
+_active: Set["UploadProgress"] = set()
+
+
+class UploadProgress:
+    """
+    Progress of one upload, read by the progress ticker instead of pushed to it.
+
+    The upload's progress callback only stores the byte count, so a part costs
+    no task, closure or message. Each render samples that counter and folds the
+    rate since the previous sample into an exponentially weighted average. The
+    time constant is RATE_TIME_CONSTANT, so the throughput and ETA shown do not
+    jump around with every part. The summed rate of all running uploads is kept
+    in the metrics gauges.
+    """
+
+    def __init__(self, file_name: str, total: int):
+        self.file_name = file_name
+        self.total = total
+        self.current = 0
+        self.rate = 0.0  # Bytes per second, smoothed
+        self._sampled_at: Optional[float] = None
+        self._sampled_bytes = 0
+
+    def update(self, current: int, total: int):
+        """Progress callback for the uploader; a plain store, safe per part"""
+        self.current = current
+
+    def start(self):
+        _active.add(self)
+
+    def close(self):
+        _active.discard(self)
+        _publish()
+
+    def sample(self):
+        now = time.monotonic()
+        current = self.current
+        if self._sampled_at is None or current < self._sampled_bytes:
+            # First sample (or a restart on another session) only sets the baseline;
+            # parts resumed from an earlier run are not throughput of this one
+            self._sampled_at, self._sampled_bytes = now, current
+            return
+        elapsed = now - self._sampled_at
+        if elapsed < MIN_SAMPLE_INTERVAL:
+            return
+        instant = (current - self._sampled_bytes) / elapsed
+        weight = 1 - math.exp(-elapsed / RATE_TIME_CONSTANT)
+        self.rate = instant if self.rate == 0 else self.rate + weight * (instant - self.rate)
+        self._sampled_at, self._sampled_bytes = now, current
+        _publish()
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds until the upload is through, or None while the rate is unknown"""
+        if self.rate <= 0:
+            return None
+        return max(0, self.total - self.current) / self.rate
+
+    def render(self) -> str:
+        self.sample()
+        percent = min(100, (self.current / self.total) * 100) if self.total else 0
+        uploaded_mb = self.current / 1024 / 1024
+        total_mb = self.total / 1024 / 1024
+
+        # Visual progress bar
+        bar = '⬢' * int(percent/5) + '⬡' * (20 - int(percent/5))
+
+        eta = self.eta
+        speed = (
+            f"*⚡ Speed:* {self.rate / 1024 / 1024:.1f} MB/s | *⏳ ETA:* "
+            + (f"{int(eta) // 60}m {int(eta) % 60:02d}s" if eta is not None else "…")
+        )
+        return (
+            f"*📤 Uploading:* `{self.file_name}`\n"
+            f"*📊 Progress:* {percent:.1f}%\n"
+            f"🔹 {uploaded_mb:.1f}MB / {total_mb:.1f}MB\n"
+            f"{bar}\n"
+            f"{speed}"
+        )
+
+
+def _publish():
+    set_gauge("uploads_active", len(_active))
+    set_gauge("upload_bytes_per_second", sum(progress.rate for progress in _active))
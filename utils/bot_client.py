@@ -0,0 +1,52 @@
+import httpx
+from typing import Optional
+from telegram.ext import ExtBot
+from telegram.request import HTTPXRequest
+from config import BOT_TOKEN, BOT_POOL_SIZE, BOT_KEEPALIVE_SECONDS
+from utils.metrics import Timer
+
+
+class TimedRequest(HTTPXRequest):
+    """HTTPXRequest with a sized keep-alive pool that times every Bot API call"""
+
+    def __init__(self, connection_pool_size: int, keepalive_expiry: float, **kwargs):
+        # httpx only keeps idle connections for 5 seconds by default, which is
+        # shorter than the gap between two progress edits. A longer expiry lets
+        # edits reuse an open TLS connection (httpx_kwargs needs PTB 21.6+).
+        super().__init__(
+            connection_pool_size=connection_pool_size,
+            httpx_kwargs={'limits': httpx.Limits(
+                max_connections=connection_pool_size,
+                max_keepalive_connections=connection_pool_size,
+                keepalive_expiry=keepalive_expiry,
+            )},
+            **kwargs
+        )
+
+    async def do_request(self, url, method, *args, **kwargs):
+        with Timer(f"bot.{url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, method, *args, **kwargs)
+
+
+_bot: Optional[ExtBot] = None
+
+
+def get_bot() -> ExtBot:
+    """The process-wide Bot shared by the application, recorder, uploader and logging"""
+    global _bot
+    if _bot is None:
+        _bot = ExtBot(
+            token=BOT_TOKEN,
+            request=TimedRequest(
+                connection_pool_size=BOT_POOL_SIZE,
+                keepalive_expiry=BOT_KEEPALIVE_SECONDS,
+                pool_timeout=10.0,
+            ),
+            # Long polling holds its connection open, so it gets its own small pool
+            get_updates_request=TimedRequest(
+                connection_pool_size=1,
+                keepalive_expiry=BOT_KEEPALIVE_SECONDS,
+                read_timeout=30.0,
+            ),
+        )
+    return _bot
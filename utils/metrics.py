@@ -0,0 +1,55 @@
+import time
+from typing import Dict
+
+# In-process counters shown by /latency; reset on restart
+_latencies: Dict[str, Dict[str, float]] = {}
+
+
+def record_latency(name: str, seconds: float, ok: bool = True):
+    """Add one timed call to the counters for `name`"""
+    entry = _latencies.setdefault(name, {'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0})
+    entry['count'] += 1
+    entry['total'] += seconds
+    entry['max'] = max(entry['max'], seconds)
+    if not ok:
+        entry['errors'] += 1
+
+
+def latency_summary() -> Dict[str, Dict[str, float]]:
+    """Per-name call count, error count, average and max latency in seconds"""
+    return {
+        name: {
+            'count': entry['count'],
+            'errors': entry['errors'],
+            'avg': entry['total'] / entry['count'] if entry['count'] else 0.0,
+            'max': entry['max'],
+        }
+        for name, entry in _latencies.items()
+    }
+
+
+class Timer:
+    """Context manager that records the wrapped block under `name`"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_latency(self.name, time.perf_counter() - self.started, ok=exc_type is None)
+        return False
+
+
+# Latest value of things that go up and down, e.g. current upload throughput
+_gauges: Dict[str, float] = {}
+
+
+def set_gauge(name: str, value: float):
+    _gauges[name] = value
+
+
+def gauge(name: str, default: float = 0.0) -> float:
+    return _gauges.get(name, default)
@@ -2,6 +2,8 @@ import os
 import asyncio
 from datetime import timedelta
 from typing import List
+from recorders.segments import container_args
+from recorders.media_probe import media_probe
 import aiofiles
 
 async def format_bytes(size: int) -> str:
@@ -55,20 +57,10 @@ async def get_video_duration(file_path: str) -> float:
     Returns:
         Duration in seconds.
     """
-    duration_cmd = [
-        "ffprobe", "-v", "error", "-show_entries",
-        "format=duration", "-of",
-        "default=noprint_wrappers=1:nokey=1", file_path
-    ]
-    proc = await asyncio.create_subprocess_exec(
-        *duration_cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await proc.communicate()
-    if proc.returncode != 0:
-        raise RuntimeError(f"ffprobe error: {stderr.decode()}")
-    return float(stdout.decode().strip())
+    duration = await media_probe.duration(file_path)
+    if duration is None:
+        raise RuntimeError(f"ffprobe could not read the duration of {file_path}")
+    return duration
 
 async def split_video(file_path: str, max_size: int = 2 * 1024 * 1024 * 1024) -> List[str]:
     """
@@ -88,7 +80,10 @@ async def split_video(file_path: str, max_size: int = 2 * 1024 * 1024 * 1024) ->
     if size <= max_size:
         return [file_path]
 
-    base_name = os.path.splitext(file_path)[0]
+    base_name, extension = os.path.splitext(file_path)
+    extension = extension or ".mkv"
+    # ffmpeg and the `%` lookup below both read `%%` as a literal percent sign
+    pattern = f"{base_name.replace('%', '%%')}_part%02d{extension}"
     parts = []
 
     try:
@@ -96,22 +91,30 @@ async def split_video(file_path: str, max_size: int = 2 * 1024 * 1024 * 1024) ->
         num_parts = (size // max_size) + 1
         part_duration = total_duration / num_parts
 
-        for i in range(num_parts):
-            start = i * part_duration
-            out_file = f"{base_name}_part{i+1}.mp4"
-            cmd = [
-                "ffmpeg", "-i", file_path, "-ss", str(int(start)), "-t",
-                str(int(part_duration)), "-c", "copy", out_file
-            ]
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            await proc.communicate()
-            if proc.returncode != 0:
-                raise RuntimeError(f"ffmpeg error while splitting part {i+1}")
-            parts.append(out_file)
+        # A single pass through the segment muxer reads the input once and
+        # cuts on keyframes, instead of one decode-from-start run per part.
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error", "-i", file_path,
+            "-map", "0", "-c", "copy",
+            "-f", "segment", "-segment_time", f"{part_duration:.3f}",
+            *container_args(segmented=True),
+            "-segment_start_number", "1", "-reset_timestamps", "1",
+            pattern
+        ]
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await proc.communicate()
+
+        index = 1
+        while os.path.exists(pattern % index):
+            parts.append(pattern % index)
+            index += 1
+
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg error while splitting: {stderr.decode().strip()}")
 
         return parts
     except Exception as e: